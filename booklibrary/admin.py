@@ -1,20 +1,45 @@
 """
 Admin configuration for the booklibrary app.
+
+Changelists are built to stay at a constant number of queries however many
+rows there are: related rows are joined (list_select_related) or prefetched
+in get_queryset(), foreign keys and many-to-many fields use autocomplete
+widgets instead of full <select>s, the unfiltered total is not counted
+(show_full_result_count = False), and large unfiltered tables are paged from
+the database's row estimate (EstimatedCountPaginator).
+
+The BookInstance changelist has bulk actions that move copies to a
+location, change their status or reassign their owner.  The target is
+chosen in the fields next to the action menu, and each action is one
+UPDATE through services.update_instances(), including "select all" across
+a filtered changelist.
 """
 
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 
 from booklibrary.models import (
-    Author, Book, BookInstance, Genre, Keywords, Language, Location, Series,
+    Author, Book, BookInstance, Genre, GoogleVolume, Keywords, Language, Loan, Location, Series,
 )
+from booklibrary.forms import InventoryChangeForm
+from booklibrary.services import update_instances
+from booklibrary.utils.db import EstimatedCountPaginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Base ModelAdmin for tables that can grow to 100k+ rows."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
-# Simple models with no custom admin behaviour.
-admin.site.register(Genre)
-admin.site.register(Language)
-admin.site.register(Location)
-admin.site.register(Series)
-admin.site.register(Keywords)
+@admin.register(Genre, Keywords, Language, Location, Series)
+class LookupAdmin(admin.ModelAdmin):
+    """Name-only lookup tables; searchable so other admins can autocomplete them."""
+
+    list_display = ("name",)
+    search_fields = ("name",)
+    ordering = ("name",)
 
 
 class BookInstanceInline(admin.TabularInline):
@@ -22,28 +47,87 @@ class BookInstanceInline(admin.TabularInline):
 
     model = BookInstance
     extra = 0
+    autocomplete_fields = ("location", "owner")
 
 
 @admin.register(Author)
-class AuthorAdmin(admin.ModelAdmin):
+class AuthorAdmin(LargeTableAdmin):
     """Author admin: shows name and life-dates; groups date fields side-by-side."""
 
     list_display = ("last_name", "first_name", "date_of_birth", "date_of_death")
+    search_fields = ("last_name", "first_name", "full_name")
     # Tuple groups the date fields side-by-side on the detail page.
     fields = ["first_name", "last_name", ("date_of_birth", "date_of_death")]
 
 
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
+class BookAdmin(LargeTableAdmin):
     """Book admin: shows title, authors, and genre; embeds BookInstance inline."""
 
     list_display = ("title", "display_authors", "display_genre")
+    search_fields = ("title",)
+    autocomplete_fields = ("authors", "genre", "keywords", "language", "series")
     inlines = [BookInstanceInline]
 
+    def get_queryset(self, request):
+        # display_authors() and display_genre() slice these prefetched lists.
+        return super().get_queryset(request).prefetch_related("authors", "genre")
+
+
+class InventoryActionForm(ActionForm, InventoryChangeForm):
+    """Action menu plus the new location / status / owner for the bulk actions."""
+
 
 @admin.register(BookInstance)
-class BookInstanceAdmin(admin.ModelAdmin):
-    """BookInstance admin: filterable by location and status."""
+class BookInstanceAdmin(LargeTableAdmin):
+    """BookInstance admin: filterable by location and status, with bulk inventory actions."""
 
     list_display = ("book", "id", "status", "location")
     list_filter = ("status", "location")
+    list_select_related = ("book", "location")
+    search_fields = ("book__title",)
+    autocomplete_fields = ("book", "location", "owner")
+    action_form = InventoryActionForm
+    actions = ["move_to_location", "set_status", "reassign_owner"]
+
+    def _update(self, request, queryset, field):
+        """Apply the action form's value for field to queryset in one UPDATE."""
+        form = self.action_form(request.POST)
+        form.is_valid()
+        value = form.changes().get(field)
+        if value is None:
+            self.message_user(
+                request, f"Choose a new {field} next to the action menu.", messages.WARNING)
+            return
+        count = update_instances(queryset, **{field: value})
+        self.message_user(request, f"Updated {count} cop{'y' if count == 1 else 'ies'}.")
+
+    @admin.action(description="Move selected copies to the chosen location", permissions=["change"])
+    def move_to_location(self, request, queryset):
+        self._update(request, queryset, "location")
+
+    @admin.action(description="Set the chosen status on selected copies", permissions=["change"])
+    def set_status(self, request, queryset):
+        self._update(request, queryset, "status")
+
+    @admin.action(description="Reassign selected copies to the chosen owner", permissions=["change"])
+    def reassign_owner(self, request, queryset):
+        self._update(request, queryset, "owner")
+
+
+@admin.register(Loan)
+class LoanAdmin(LargeTableAdmin):
+    """Loan admin: open and returned loans, searchable by borrower."""
+
+    list_display = ("instance", "borrower", "lent_on", "due_back", "returned_at")
+    list_select_related = ("instance__book",)
+    search_fields = ("borrower", "instance__book__title")
+    autocomplete_fields = ("instance",)
+
+
+@admin.register(GoogleVolume)
+class GoogleVolumeAdmin(LargeTableAdmin):
+    """GoogleVolume admin: read-mostly view of the local Google Books volume store."""
+
+    list_display = ("volume_id", "isbn_13", "isbn_10", "fetched_at")
+    search_fields = ("volume_id", "isbn_10", "isbn_13")
@@ -2,7 +2,22 @@
 REST API views for the booklibrary app.
 
 BookViewSet exposes the full CRUD surface for the Book model, restricted
-to authenticated users.
+to authenticated users.  The list is paginated (?page=N, API_PAGE_SIZE
+books a page, as {"count", "next", "previous", "results"}), and a page
+costs the same few queries whatever the size of the catalogue.
+
+ScanSessionViewSet lets a scanning client relocate copies in bulk (see
+utils/scan_sessions.py); booklibrary/urls.py routes it under api/:
+
+  POST api/scan-sessions/                {"location": pk}  open a session
+  GET  api/scan-sessions/<id>/                             current state
+  POST api/scan-sessions/<id>/scans/     {"ids": [...]}    buffer scanned ids
+  POST api/scan-sessions/<id>/close/                       flush and end
+
+Every response is the session state: {"id", "location", "pending" (count
+waiting for the next batch), "moved" (count), "unknown" (ids that matched
+no copy the user may move)}.  A request that finds the session locked by
+another for too long gets 409 Conflict.
 
 Wire up in your URLconf via a DRF router:
 
@@ -12,17 +27,74 @@ Wire up in your URLconf via a DRF router:
     router = DefaultRouter()
     router.register(r"books", BookViewSet, basename="book")
     urlpatterns += router.urls
+
+Configuration
+-------------
+API_PAGE_SIZE  (optional) – books per page of the BookViewSet list (50).
 """
 
-from rest_framework import permissions, viewsets
+from django.conf import settings
+from django.http import Http404
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
 
 from booklibrary.models import Book
-from booklibrary.serializers import BookSerializer
+from booklibrary.serializers import (
+    BookSerializer, ScanBatchSerializer, ScanSessionSerializer, ScanStartSerializer,
+)
+from booklibrary.utils import scan_sessions
+
+
+API_PAGE_SIZE = getattr(settings, "API_PAGE_SIZE", 50)
+
+
+class BookPagination(PageNumberPagination):
+    """API_PAGE_SIZE books per page."""
+
+    page_size = API_PAGE_SIZE
 
 
 class BookViewSet(viewsets.ModelViewSet):
     """Full CRUD API for Book objects. Requires authentication."""
 
-    queryset = Book.objects.all().order_by("title")
+    queryset = Book.objects.prefetch_related("authors", "genre", "keywords").order_by("title")
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = BookSerializer
+    pagination_class = BookPagination
+
+
+class ScanSessionViewSet(viewsets.ViewSet):
+    """Open a scan session, stream scanned copy ids into it, then close it."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def _respond(self, call, *args):
+        try:
+            session = call(*args)
+        except scan_sessions.ScanSessionNotFound:
+            raise Http404("Scan session not found or expired")
+        except scan_sessions.ScanSessionBusy:
+            return Response({"detail": "Scan session is busy; try again."},
+                            status=status.HTTP_409_CONFLICT)
+        return Response(ScanSessionSerializer(session).data)
+
+    def create(self, request):
+        serializer = ScanStartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = scan_sessions.start(request.user, serializer.validated_data["location"])
+        return Response(ScanSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        return self._respond(scan_sessions.get, pk, request.user)
+
+    @action(detail=True, methods=["post"])
+    def scans(self, request, pk=None):
+        serializer = ScanBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self._respond(scan_sessions.add, pk, request.user, serializer.validated_data["ids"])
+
+    @action(detail=True, methods=["post"])
+    def close(self, request, pk=None):
+        return self._respond(scan_sessions.close, pk, request.user)
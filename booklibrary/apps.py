@@ -12,3 +12,8 @@ class BooklibraryConfig(AppConfig):
 
     def ready(self):
         import booklibrary.signals  # noqa: F401 — registers signal handlers
+
+        from django.conf import settings
+        if getattr(settings, "SLOW_QUERY_MS", None) is not None:
+            from booklibrary.utils import slow_queries
+            slow_queries.install()
@@ -1,15 +1,132 @@
 """
 Forms for the booklibrary app.
 
-SearchForm  – simple single-field search used by BookSearchView.
+SearchForm  – simple single-field search used by BookSearchView, plus a
+              hidden page number for paging through Google results.
+ShelvingForm – the user's local choices (genre, location, series, keywords)
+              shared by AddForm and BulkAddForm.
 AddForm     – captures the user's local choices (genre, location, series,
               keywords) when adding a book sourced from Google Books results.
               Hidden fields carry book metadata for validation but the actual
               data used to create the Book record is always read from the
               server-side session, not from cleaned_data.
+BulkAddForm – the same choices applied to several selected search results,
+              identified by their indices into the session results.
+BookForm    – edits a Book's metadata (BookUpdate).
+InventoryFilterForm – narrows the staff inventory view to some copies.
+InventoryChangeForm – new location, status and/or owner for a batch of
+              copies; shared by the inventory view and the admin actions.
+ScanStartForm / ScanForm – target location and scanned ids for a scan
+              session (utils/scan_sessions.py).
+LoanForm    – borrower and due date when lending a copy.
+
+The shelving choice fields render their options from lookup_cache, so a
+results page showing the form once per result costs no lookup-table
+queries once the cache is warm.  Submitted values are still validated
+against the database.
+
+Large choice fields (authors, genres, keywords, locations, series) use the
+autocomplete widgets below: only the selected options are rendered, and
+static/booklibrary/js/autocomplete.js fetches the rest from the
+booklibrary:autocomplete JSON endpoint as the user types.
 """
 from django import forms
-from booklibrary.models import Genre, Keywords, Location, Series
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.forms.models import ModelChoiceIterator
+from django.urls import reverse
+from django.utils import timezone
+
+from booklibrary.models import Book, BookInstance, Genre, Keywords, Loan, Location, Series
+from booklibrary.utils import lookup_cache
+
+
+class CachedModelChoiceIterator(ModelChoiceIterator):
+    """Yield the field's choices from lookup_cache instead of its queryset."""
+
+    def _rows(self):
+        return lookup_cache.get_all(self.queryset.model)
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in self._rows():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self._rows()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self._rows())
+
+    def choices_for(self, values):
+        """Return the choices for the given primary keys, skipping unknown ones."""
+        model = self.queryset.model
+        rows = (lookup_cache.get(model, value) for value in values)
+        return [self.choice(obj) for obj in rows if obj is not None]
+
+
+class CachedModelChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField over a whole lookup table, rendered from lookup_cache."""
+
+    iterator = CachedModelChoiceIterator
+
+
+class CachedModelMultipleChoiceField(forms.ModelMultipleChoiceField):
+    """ModelMultipleChoiceField over a whole lookup table, rendered from lookup_cache."""
+
+    iterator = CachedModelChoiceIterator
+
+
+class AutocompleteMixin:
+    """
+    Select widget that renders only the selected options.
+
+    ``kind`` names the booklibrary:autocomplete endpoint that
+    autocomplete.js queries for the other options.
+    """
+
+    def __init__(self, kind, attrs=None):
+        self.kind = kind
+        super().__init__(attrs)
+
+    class Media:
+        js = ['booklibrary/js/autocomplete.js']
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['class'] = f"{attrs.get('class', '')} js-autocomplete".strip()
+        attrs['data-autocomplete-url'] = reverse('booklibrary:autocomplete', args=[self.kind])
+        return attrs
+
+    def selected_choices(self, values):
+        """Return (value, label) pairs for the selected primary keys only."""
+        values = [str(v) for v in values if str(v).isdigit()]
+        if not values:
+            return []
+        if hasattr(self.choices, 'choices_for'):
+            return self.choices.choices_for(values)
+        return [self.choices.choice(obj) for obj in self.choices.queryset.filter(pk__in=values)]
+
+    def optgroups(self, name, value, attrs=None):
+        options = []
+        empty_label = getattr(getattr(self.choices, 'field', None), 'empty_label', None)
+        if not self.allow_multiple_selected and empty_label is not None:
+            options.append(self.create_option(
+                name, '', empty_label, not any(value), 0, attrs=attrs))
+        for option_value, label in self.selected_choices(value):
+            options.append(self.create_option(
+                name, option_value, label, True, len(options), attrs=attrs))
+        return [(None, options, 0)]
+
+
+class AutocompleteSelect(AutocompleteMixin, forms.Select):
+    """Single-choice autocomplete widget."""
+
+
+class AutocompleteSelectMultiple(AutocompleteMixin, forms.SelectMultiple):
+    """Multiple-choice autocomplete widget."""
 
 
 class SearchForm(forms.Form):
@@ -21,42 +138,56 @@ class SearchForm(forms.Form):
             'placeholder': 'search for a book',
         })
     )
+    page = forms.IntegerField(
+        widget=forms.HiddenInput(), required=False, min_value=1, max_value=100,
+    )
 
 
-class AddForm(forms.Form):
+class ShelvingForm(forms.Form):
     """
-    User-supplied choices when adding a book from Google Books search results.
-
-    The four choice fields (book_genre, book_location, book_series,
-    book_keywords) capture the user's local shelving preferences.
+    The user's local shelving choices for a book added from search results.
 
-    The hidden fields carry book metadata submitted by the template and are
-    validated server-side, but the actual data used to create the Book record
-    is read from the session (not from cleaned_data) to prevent tampering.
+    Base class for AddForm (one result) and BulkAddForm (several results).
     """
 
-    # ── User-supplied choice fields ────────────────────────────────────────────
-
-    book_genre = forms.ModelMultipleChoiceField(
+    book_genre = CachedModelMultipleChoiceField(
         queryset=Genre.objects.all(),
         required=False,
+        widget=AutocompleteSelectMultiple('genre'),
     )
-    book_location = forms.ModelChoiceField(
+    book_location = CachedModelChoiceField(
         queryset=Location.objects.all(),
         required=False,
+        widget=AutocompleteSelect('location'),
         empty_label='— select location —',
     )
-    book_series = forms.ModelChoiceField(
+    book_series = CachedModelChoiceField(
         queryset=Series.objects.all(),
         required=False,
+        widget=AutocompleteSelect('series'),
         empty_label='— select series —',
     )
-    book_keywords = forms.ModelMultipleChoiceField(
+    book_keywords = CachedModelMultipleChoiceField(
         queryset=Keywords.objects.all(),
         required=False,
+        widget=AutocompleteSelectMultiple('keywords'),
         help_text='Keywords (up to 3)',
     )
 
+
+class AddForm(ShelvingForm):
+    """
+    User-supplied choices when adding a book from Google Books search results.
+
+    The four choice fields inherited from ShelvingForm (book_genre,
+    book_location, book_series, book_keywords) capture the user's local
+    shelving preferences.
+
+    The hidden fields carry book metadata submitted by the template and are
+    validated server-side, but the actual data used to create the Book record
+    is read from the session (not from cleaned_data) to prevent tampering.
+    """
+
     # ── Hidden book-metadata fields (validated; values read from session) ──────
 
     title = forms.CharField(
@@ -98,3 +229,134 @@ class AddForm(forms.Form):
     status = forms.CharField(
         widget=forms.HiddenInput(), max_length=50, strip=False,
     )
+
+
+class BulkAddForm(ShelvingForm):
+    """
+    Shelving choices applied to several search results at once.
+
+    ``book_indices`` holds the selected positions in
+    ``request.session['google_books_results']``; pass ``num_results`` (the
+    length of that list) so out-of-range indices fail validation.  The book
+    data itself is read from the session, as with AddForm.
+    """
+
+    book_indices = forms.TypedMultipleChoiceField(
+        coerce=int,
+        widget=forms.CheckboxSelectMultiple,
+        error_messages={'required': 'Select at least one book to add.'},
+    )
+
+    def __init__(self, *args, num_results=0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['book_indices'].choices = [(i, i) for i in range(num_results)]
+
+
+class BookForm(forms.ModelForm):
+    """Book metadata edited by BookUpdate; the many-valued fields autocomplete."""
+
+    class Meta:
+        model = Book
+        fields = ['title', 'authors', 'summary', 'genre', 'language', 'publisher',
+                  'publishedDate', 'keywords', 'series']
+        widgets = {
+            'authors': AutocompleteSelectMultiple('author'),
+            'genre': AutocompleteSelectMultiple('genre'),
+            'keywords': AutocompleteSelectMultiple('keywords'),
+            'series': AutocompleteSelect('series'),
+        }
+
+
+class InventoryFilterForm(forms.Form):
+    """GET filters selecting which copies the inventory view lists and changes."""
+
+    q = forms.CharField(required=False, label='Title contains')
+    location = CachedModelChoiceField(
+        queryset=Location.objects.all(), required=False, empty_label='— any location —',
+    )
+    status = forms.ChoiceField(
+        choices=[('', '— any status —')] + BookInstance.LOAN_STATUS, required=False,
+    )
+    owner = forms.ModelChoiceField(
+        queryset=get_user_model().objects.order_by('username'),
+        required=False, empty_label='— any owner —',
+    )
+
+    def filter(self, queryset):
+        """Return queryset narrowed by the valid, non-empty filters."""
+        if not self.is_valid():
+            return queryset
+        cd = self.cleaned_data
+        if cd['q']:
+            queryset = queryset.filter(book__title__icontains=cd['q'])
+        for field in ('location', 'status', 'owner'):
+            if cd[field]:
+                queryset = queryset.filter(**{field: cd[field]})
+        return queryset
+
+
+class InventoryChangeForm(forms.Form):
+    """
+    New values for a batch of copies; blank fields are left unchanged.
+
+    Also mixed into the BookInstance admin's action form, so its field names
+    must not clash with ActionForm's ``action`` and ``select_across``.
+    """
+
+    new_location = CachedModelChoiceField(
+        queryset=Location.objects.all(), required=False, empty_label='— location —',
+    )
+    new_status = forms.ChoiceField(
+        choices=[('', '— status —')] + BookInstance.LOAN_STATUS, required=False,
+    )
+    new_owner = forms.ModelChoiceField(
+        queryset=get_user_model().objects.order_by('username'),
+        required=False, empty_label='— owner —',
+    )
+
+    def changes(self):
+        """Return {field: value} for the fields given, named as on BookInstance."""
+        return {
+            name[len('new_'):]: self.cleaned_data[name]
+            for name in ('new_location', 'new_status', 'new_owner')
+            if self.cleaned_data.get(name) not in (None, '')
+        }
+
+
+class ScanStartForm(forms.Form):
+    """Target location for a scan session (see utils/scan_sessions.py)."""
+
+    location = CachedModelChoiceField(
+        queryset=Location.objects.all(), widget=AutocompleteSelect('location'),
+    )
+
+
+class ScanForm(forms.Form):
+    """One or more scanned copy ids, separated by whitespace or commas."""
+
+    codes = forms.CharField(
+        label='Scan', max_length=10000,
+        widget=forms.TextInput(attrs={'autofocus': True, 'autocomplete': 'off'}),
+    )
+
+    def clean_codes(self):
+        return self.cleaned_data['codes'].replace(',', ' ').split()
+
+
+class LoanForm(forms.ModelForm):
+    """Who is borrowing a copy and when it is due back."""
+
+    class Meta:
+        model = Loan
+        fields = ['borrower', 'borrower_email', 'due_back']
+        widgets = {'due_back': forms.DateInput(attrs={'type': 'date'})}
+
+    def __init__(self, *args, loan_period_days=28, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['due_back'].initial = timezone.localdate() + timedelta(days=loan_period_days)
+
+    def clean_due_back(self):
+        due_back = self.cleaned_data['due_back']
+        if due_back < timezone.localdate():
+            raise forms.ValidationError('The due date cannot be in the past.')
+        return due_back
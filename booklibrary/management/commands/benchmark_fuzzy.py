@@ -0,0 +1,80 @@
+"""
+Time fuzzy search against a synthetic catalogue.
+
+    python manage.py benchmark_fuzzy --titles 100000 --queries 200
+
+Inserts --titles generated titles and indexes them, runs --queries searches
+for those titles with their long words misspelled (two adjacent letters
+swapped) and reports latency percentiles and how often the source title
+ranked first.  The generated vocabulary is small, so every word occurs in
+thousands of titles: real catalogues search faster than this.
+Everything runs in a transaction that is rolled back, so it can be pointed
+at a real database without leaving rows behind.
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from booklibrary.models import Book, SearchPosting
+from booklibrary.utils import fuzzy
+
+WORDS = (
+    "shadow silver winter kingdom river forest garden empire secret night dragon "
+    "island mirror voyage crown stone harbour summer letters ashes glass wolves "
+    "orchard lantern tempest meridian cathedral horizon labyrinth chronicle "
+    "whisper ember thunder compass serpent falcon willow prophecy citadel"
+).split()
+
+
+def _misspell(word, rng):
+    i = rng.randrange(len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+class Command(BaseCommand):
+    help = "Benchmark fuzzy search against a generated catalogue (rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--titles", type=int, default=100000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, titles, queries, seed, **options):
+        rng = random.Random(seed)
+        with transaction.atomic():
+            start = time.perf_counter()
+            corpus = [
+                f"The {' '.join(rng.sample(WORDS, rng.randint(2, 4)))} {n}".title()
+                for n in range(titles)
+            ]
+            books = Book.objects.bulk_create(
+                [Book(title=title, uniqueID=f"bench-{n}") for n, title in enumerate(corpus)],
+                batch_size=2000,
+            )
+            if books and books[0].pk is None:
+                books = list(Book.objects.filter(uniqueID__startswith="bench-").only("pk", "title"))
+            for i in range(0, len(books), 2000):
+                fuzzy.index(SearchPosting.BOOK, books[i:i + 2000])
+            self.stdout.write(f"Indexed {len(books)} titles in {time.perf_counter() - start:.1f}s")
+
+            timings, hits = [], 0
+            for _ in range(queries):
+                book = rng.choice(books)
+                query = " ".join(
+                    _misspell(w.lower(), rng) if w.isalpha() and len(w) > 4 else w
+                    for w in book.title.split())
+                start = time.perf_counter()
+                results = fuzzy.search(SearchPosting.BOOK, query, limit=10)
+                timings.append((time.perf_counter() - start) * 1000)
+                hits += bool(results and results[0][0] == book.pk)
+
+            timings.sort()
+            self.stdout.write(
+                f"{queries} queries: p50 {statistics.median(timings):.1f} ms, "
+                f"p95 {timings[int(len(timings) * 0.95) - 1]:.1f} ms, "
+                f"max {timings[-1]:.1f} ms; source title first in {hits / queries:.0%}"
+            )
+            transaction.set_rollback(True)
@@ -0,0 +1,92 @@
+"""
+Benchmark the main views against a synthetic catalogue.
+
+    python manage.py benchmark_views --books 20000 --seed 0
+    python manage.py benchmark_views --books 20000 --write-baseline
+
+Generates the catalogue (utils/catalogue.py), requests every scenario in
+utils/benchmarks.py with Google answered by a local stand-in server, and
+prints wall time, query count and peak memory per scenario.  The results
+are compared with the baseline stored for the same --books and --seed;
+any scenario making more queries, or taking --time-factor times longer or
+--memory-factor times more memory, fails the command.  --write-baseline
+stores the results as the new baseline instead.  Query counts hold on any
+machine; times and memory do not, so compare those against a baseline
+written on the same machine.  Scenarios over their memory budget are run
+once more under the memory profiler (utils/profiling.py), and the lines
+holding the most memory are printed; --memory-report does this for every
+scenario.
+
+Everything runs in a transaction that is rolled back, so it can be pointed
+at a real database without leaving rows behind.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from booklibrary.utils import benchmarks, catalogue
+
+
+class Command(BaseCommand):
+    help = "Benchmark views against a generated catalogue and compare with the baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, default=20000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--budget", type=float, default=10.0,
+                            help="Seconds after which a scenario stops repeating.")
+        parser.add_argument("--only", action="append", default=[],
+                            help="Run only this scenario (repeatable).")
+        parser.add_argument("--baseline", default=benchmarks.BASELINE_PATH)
+        parser.add_argument("--write-baseline", action="store_true")
+        parser.add_argument("--time-factor", type=float, default=2.0)
+        parser.add_argument("--memory-factor", type=float, default=2.0)
+        parser.add_argument("--memory-report", action="store_true",
+                            help="Print the top allocating lines of every scenario.")
+
+    def handle(self, *args, books, seed, repeat, budget, only, baseline, write_baseline,
+               time_factor, memory_factor, memory_report, **options):
+        key = f"{books}-{seed}"
+        stored = benchmarks.load_baseline(key, baseline)
+        reports = {}
+        # The test client sends Host: testserver.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]), \
+                transaction.atomic():
+            try:
+                catalogue.generate(books, seed=seed, index=True)
+            except ValueError as exc:
+                raise CommandError(exc)
+            user = get_user_model().objects.create(username="benchmark", is_staff=True)
+            scenarios = [s for s in benchmarks.scenarios(user) if not only or s.name in only]
+            with benchmarks.google_stand_in():
+                results = benchmarks.run(scenarios, user, repeat=repeat, budget=budget)
+                for scenario in scenarios:
+                    if memory_report or benchmarks.memory_regressed(
+                            results[scenario.name], stored.get(scenario.name), memory_factor):
+                        profile = benchmarks.memory_profile(scenario, user)
+                        reports[scenario.name] = profile.report(limit=15, sql=False)
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{'scenario':<28}{'ms':>9}{'max ms':>9}{'queries':>9}{'peak KB':>9}"
+                          f"   baseline ms / queries / KB")
+        for name, result in results.items():
+            base = stored.get(name)
+            against = (f"   {base['ms']} / {base['queries']} / {base['peak_kb']}"
+                       if base else "   -")
+            self.stdout.write(f"{name:<28}{result['ms']:>9.1f}{result['ms_max']:>9.1f}"
+                              f"{result['queries']:>9}{result['peak_kb']:>9}{against}")
+        for name, report in reports.items():
+            self.stdout.write(f"\n{name}: {report}")
+
+        if write_baseline:
+            benchmarks.save_baseline(key, {**stored, **results}, baseline)
+            self.stdout.write(f"Baseline {key} written to {baseline}")
+            return
+        problems = benchmarks.compare(results, stored, time_factor, memory_factor)
+        if problems:
+            raise CommandError("Slower than the baseline:\n  " + "\n  ".join(problems))
+        if not stored:
+            self.stdout.write(f"No baseline for {key}; run with --write-baseline to store one.")
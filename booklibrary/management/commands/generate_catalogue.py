@@ -0,0 +1,48 @@
+"""
+Fill the database with a synthetic catalogue for benchmarks.
+
+    python manage.py generate_catalogue --books 100000 --seed 1
+
+See utils/catalogue.py for what is generated.  Point it at a scratch
+database: the rows are real and are not removed afterwards.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from booklibrary.utils import catalogue
+
+
+class Command(BaseCommand):
+    help = "Insert a synthetic catalogue of --books books, generated from --seed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, default=100000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--owner", action="append", default=[],
+                            help="Username to own the copies (repeatable); "
+                                 "default: five synthetic-owner-<n> users.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--index", action="store_true",
+                            help="Add the books to the fuzzy-search index as well (slower).")
+
+    def handle(self, *args, books, seed, owner, batch_size, index, **options):
+        User = get_user_model()
+        owners = list(User.objects.filter(username__in=owner))
+        missing = set(owner) - {user.username for user in owners}
+        if missing:
+            raise CommandError(f"No such user: {', '.join(sorted(missing))}")
+
+        start = time.perf_counter()
+        try:
+            counts = catalogue.generate(books, seed=seed, owners=owners,
+                                        batch_size=batch_size, index=index)
+        except ValueError as exc:
+            raise CommandError(exc)
+        self.stdout.write(
+            f"Generated {counts['books']} books, {counts['authors']} authors and "
+            f"{counts['copies']} copies ({counts['author_links']} author, "
+            f"{counts['genre_links']} genre and {counts['keyword_links']} keyword links) "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
@@ -0,0 +1,104 @@
+"""
+Replay a scripted mix of users against a server and report throughput and latency.
+
+    python manage.py loadtest --serve --users 1,2,4,8 --seconds 30
+    python manage.py loadtest --url http://127.0.0.1:8000 --username alice --password …
+    python manage.py loadtest --url http://127.0.0.1:8000 --standin-port 8765
+
+See utils/loadtest.py for the mix.  --url targets a server started
+separately (runserver, gunicorn library.wsgi, uvicorn library.asgi); for
+its Google searches to work, pass --standin-port and set that server's
+GOOGLE_BOOKS_API_BASE to http://127.0.0.1:<port>.  --serve runs the
+application in this process on a threaded WSGI server with Google already
+answered by a stand-in, and without --username logs in as a temporary user
+that is deleted afterwards (with its copies; the books it added remain).
+
+Adds and edits are real writes: point the server at a scratch database,
+for example one filled by generate_catalogue.
+"""
+import contextlib
+import secrets
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from booklibrary.utils import benchmarks, loadtest
+from booklibrary.utils.standin import StandInServer
+
+
+def _mix(text):
+    try:
+        mix = {name: int(weight) for name, weight in
+               (item.split("=") for item in text.split(","))}
+    except ValueError:
+        raise CommandError(f"--mix should look like browse=35,search=20, not {text!r}")
+    unknown = set(mix) - set(loadtest.MIX)
+    if unknown:
+        raise CommandError(f"Unknown action: {', '.join(sorted(unknown))}")
+    return mix
+
+
+class Command(BaseCommand):
+    help = "Load-test a server with a scripted mix of users, ramping concurrency in stages."
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument("--url", help="Base URL of a running server.")
+        target.add_argument("--serve", action="store_true",
+                            help="Serve the application from this process.")
+        parser.add_argument("--users", default="1,2,4,8",
+                            help="Comma-separated concurrent users, one stage each.")
+        parser.add_argument("--seconds", type=float, default=30, help="Length of each stage.")
+        parser.add_argument("--think", type=float, default=0.0,
+                            help="Mean seconds a user waits between actions.")
+        parser.add_argument("--mix", type=_mix, default=None,
+                            help="Action weights, e.g. browse=35,search=20,detail=30,"
+                                 "google=5,add=5,edit=5.")
+        parser.add_argument("--username")
+        parser.add_argument("--password")
+        parser.add_argument("--standin-port", type=int,
+                            help="With --url, run the Google stand-in on this port.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, url, serve, users, seconds, think, mix, username, password,
+               standin_port, seed, **options):
+        try:
+            counts = [int(n) for n in users.split(",")]
+        except ValueError:
+            raise CommandError(f"--users should be comma-separated numbers, not {users!r}")
+        if username and password is None:
+            raise CommandError("--username needs --password.")
+
+        with contextlib.ExitStack() as stack:
+            if serve:
+                stack.enter_context(override_settings(
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "127.0.0.1"]))
+                stack.enter_context(benchmarks.google_stand_in(loadtest.google_volumes))
+                url = stack.enter_context(loadtest.serve())
+                if not username:
+                    username, password = self._temporary_user(stack)
+            elif standin_port:
+                server = stack.enter_context(
+                    StandInServer(loadtest.google_volumes, port=standin_port))
+                self.stdout.write(f"Google stand-in at {server.url}")
+
+            self.stdout.write(f"Load-testing {url}" + (f" as {username}" if username else
+                                                       " anonymously (no adds or edits)"))
+            try:
+                stages = loadtest.run(url, counts, seconds, mix=mix, think=think,
+                                      username=username, password=password, seed=seed,
+                                      log=self.stdout.write)
+            except (RuntimeError, ValueError) as exc:
+                raise CommandError(exc)
+
+        errors = sum(stage["total"]["errors"] for stage in stages if stage["total"])
+        if errors:
+            self.stderr.write(f"{errors} requests failed.")
+
+    def _temporary_user(self, stack):
+        username, password = f"loadtest-{secrets.token_hex(4)}", secrets.token_urlsafe(16)
+        user = get_user_model().objects.create_user(username, password=password)
+        stack.callback(user.delete)
+        return username, password
@@ -0,0 +1,39 @@
+"""
+Run another management command under the profiler.
+
+    python manage.py profile_command --mode memory rebuild_fuzzy_index
+    python manage.py profile_command --mode cprofile --save /tmp/profiles \
+        generate_catalogue --books 10000
+
+Everything after the command name is passed to it.  Its output comes
+first, then the report from utils/profiling.py: for --mode memory (the
+default) the peak allocation and the lines still holding the most memory
+when it returned; for sample or cprofile, the busiest functions.  The SQL
+is listed only with --sql.  --save also writes the profile to a directory,
+as ProfilingMiddleware does with PROFILE_DIR.
+"""
+import argparse
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from booklibrary.utils import profiling
+
+
+class Command(BaseCommand):
+    help = "Run a management command under the memory, sampling or cProfile profiler."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=["memory", "sample", "cprofile"], default="memory")
+        parser.add_argument("--limit", type=int, default=25, help="Lines or functions to list.")
+        parser.add_argument("--sql", action="store_true", help="List the SQL as well.")
+        parser.add_argument("--save", metavar="DIRECTORY")
+        parser.add_argument("command_name")
+        parser.add_argument("command_args", nargs=argparse.REMAINDER)
+
+    def handle(self, *args, mode, limit, sql, save, command_name, command_args, **options):
+        profile = profiling.run(call_command, command_name, *command_args, mode=mode,
+                                stdout=self.stdout, stderr=self.stderr)
+        self.stdout.write(profile.report(limit=limit, sql=sql))
+        if save:
+            self.stdout.write(f"Saved to {profile.save(save, command_name)}.*")
@@ -0,0 +1,22 @@
+"""
+Rebuild the index behind fuzzy title / author search.
+
+    python manage.py rebuild_fuzzy_index
+
+Needed once after migrating an existing catalogue; afterwards the index is
+kept up to date as books and authors are saved (see utils/fuzzy.py).
+"""
+from django.core.management.base import BaseCommand
+
+from booklibrary.utils import fuzzy
+
+
+class Command(BaseCommand):
+    help = "Rebuild the index used by fuzzy search."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, batch_size, **options):
+        rows = fuzzy.rebuild(batch_size=batch_size)
+        self.stdout.write(f"Indexed {rows} postings.")
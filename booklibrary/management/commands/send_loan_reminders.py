@@ -0,0 +1,21 @@
+"""
+E-mail reminders to the borrowers of overdue loans.
+
+Run daily from cron:
+
+    python manage.py send_loan_reminders
+
+Each borrower is reminded at most every LOAN_REMINDER_INTERVAL_DAYS; see
+services.send_loan_reminders().
+"""
+from django.core.management.base import BaseCommand
+
+from booklibrary.services import send_loan_reminders
+
+
+class Command(BaseCommand):
+    help = "E-mail the borrowers of overdue loans."
+
+    def handle(self, *args, **options):
+        sent = send_loan_reminders()
+        self.stdout.write(f"Sent {sent} reminder{'' if sent == 1 else 's'}.")
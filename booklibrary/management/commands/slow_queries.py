@@ -0,0 +1,58 @@
+"""
+Summarise the slow-query log written by utils/slow_queries.py.
+
+    python manage.py slow_queries [--log PATH ...] [--top 10] [--explain]
+
+Ranks query shapes by the total time their slow occurrences took, with how
+often each was slow, its worst time, the views, templates and code that ran
+it, and (with --explain) the plan captured for it.  Several logs, e.g. one
+per host, can be summarised together.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from booklibrary.utils import slow_queries
+
+
+def _most_common(counter):
+    return ", ".join(f"{name} ({n})" for name, n in counter.most_common(3)) or "-"
+
+
+class Command(BaseCommand):
+    help = "List the query shapes that spent the most time over the slow-query threshold."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--log", action="append", dest="logs",
+                            help="Log file to read (repeatable); default SLOW_QUERY_LOG.")
+        parser.add_argument("--top", type=int, default=10)
+        parser.add_argument("--explain", action="store_true", help="Show the captured plans.")
+
+    def handle(self, *args, logs, top, explain, **options):
+        logs = logs or [getattr(settings, "SLOW_QUERY_LOG", None)]
+        if not all(logs):
+            raise CommandError("No log given and SLOW_QUERY_LOG is not set.")
+
+        def records():
+            for path in logs:
+                try:
+                    yield from slow_queries.read(path)
+                except OSError as exc:
+                    raise CommandError(f"Cannot read {path}: {exc}")
+
+        entries = slow_queries.summarise(records(), top=top)
+        if not entries:
+            self.stdout.write("No slow queries logged.")
+            return
+        for rank, entry in enumerate(entries, 1):
+            self.stdout.write(
+                f"{rank}. {entry['shape']}  {entry['count']}× slow, "
+                f"{entry['total_ms'] / 1000:.2f} s total, "
+                f"{entry['total_ms'] / entry['count']:.1f} ms mean, {entry['max_ms']:.1f} ms max"
+            )
+            self.stdout.write(f"   {entry['sql'] or '(SQL not captured)'}")
+            self.stdout.write(f"   views: {_most_common(entry['views'])}")
+            self.stdout.write(f"   templates: {_most_common(entry['templates'])}")
+            self.stdout.write(f"   code: {_most_common(entry['callers'])}")
+            if explain and entry["explain"]:
+                for line in entry["explain"]:
+                    self.stdout.write(f"     | {line}")
@@ -0,0 +1,229 @@
+"""
+Middleware for the booklibrary app.
+
+ServerTimingMiddleware
+    Measures each request with utils/timing.py and reports where the time
+    went, both to the browser and to the log:
+
+        Server-Timing: db;dur=12.4;desc="9 queries", tpl;dur=30.2,
+                       google;dur=410.7, total;dur=463.0
+
+    db is the time spent in queries on every configured database, tpl the
+    time spent rendering templates, google the time spent in
+    google_books.search_books(), and total the time from this middleware
+    to the response.  The same figures are logged at INFO on the
+    "booklibrary.middleware" logger, as a key=value message and as a
+    ``timing`` dict in the record's extra for structured handlers.
+
+    Add "booklibrary.middleware.ServerTimingMiddleware" at the top of
+    MIDDLEWARE, so total covers the other middleware too (sessions are
+    saved there), and set SERVER_TIMING = True.  With the setting off the
+    middleware removes itself from the stack (MiddlewareNotUsed), so it
+    costs nothing.  The header tells any client how long the database and
+    Google took; leave it off on public sites that should not share that.
+
+MetricsMiddleware
+    Records every request in utils/metrics.py: latency and query count per
+    URL name (namespace:name; "unresolved" for 404s), responses by status,
+    and the size of the session cookie whenever one is set.  Exported at
+    /metrics.  Enable with METRICS = True; like ServerTimingMiddleware it
+    removes itself when off, and the two share one timer when both are on.
+
+SlowQueryMiddleware
+    Tells the slow-query log (utils/slow_queries.py) which view is running,
+    so its records name the URL.  Active only when SLOW_QUERY_MS is set.
+
+ProfilingMiddleware
+    Runs requests under utils/profiling.py, on demand or by sampling.
+
+    On demand: a staff user adds ?profile=<mode> to any URL (or sends an
+    X-Profile: <mode> header) and gets the profile back as text/plain
+    instead of the page:
+
+        ?profile=1 / sample  sampling-profiler report: busiest functions, SQL
+        ?profile=folded      the sampled stacks, for flamegraph.pl/speedscope
+        ?profile=cprofile    cProfile report (cumulative time), SQL
+        ?profile=memory      tracemalloc: peak allocation, the lines holding
+                             the most memory at the end, SQL
+
+    Sampled: PROFILE_SAMPLE_RATE of all requests run under the sampling
+    profiler, and those slower than PROFILE_SLOW_MS are saved to
+    PROFILE_DIR (<stem>.folded plus <stem>.json with the SQL) and logged.
+    Faster ones are discarded; the caller sees the normal response either
+    way.  On-demand profiles are saved there too when PROFILE_DIR is set.
+
+    Place it after AuthenticationMiddleware (the switch needs request.user)
+    and set PROFILING = True; off, it removes itself.
+
+Configuration
+-------------
+SERVER_TIMING        (optional) – measure requests and add the header.  Default False.
+METRICS              (optional) – record request metrics.  Default False.
+SLOW_QUERY_MS        (optional) – see utils/slow_queries.py.
+PROFILING            (optional) – enable ProfilingMiddleware.  Default False.
+PROFILE_SAMPLE_RATE  (optional) – fraction of requests profiled automatically (0.0).
+PROFILE_SLOW_MS      (optional) – keep sampled profiles at least this slow (1000).
+PROFILE_DIR          (optional) – directory profiles are saved to; unset, the
+                     sampled captures are off and on-demand ones are only returned.
+"""
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+
+from .utils import metrics, profiling, slow_queries, timing
+
+logger = logging.getLogger(__name__)
+
+# Server-Timing metric names, in header order; "total" is added last.
+_SPANS = ("db", "tpl", "google")
+
+
+class ServerTimingMiddleware:
+    """Report per-request DB, template and Google Books time (see module docstring)."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "SERVER_TIMING", False):
+            raise MiddlewareNotUsed
+        timing.instrument_templates()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with timing.request_timer() as timer:
+            response = self.get_response(request)
+        total = timer.elapsed_ms()
+
+        entries = []
+        for name in _SPANS:
+            ms = timer.spans.get(name, (0.0, 0))[0]
+            if name == "db":
+                entries.append(f'db;dur={ms:.1f};desc="{timer.queries} queries"')
+            elif name in timer.spans:
+                entries.append(f"{name};dur={ms:.1f}")
+        entries.append(f"total;dur={total:.1f}")
+        response["Server-Timing"] = ", ".join(entries)
+
+        fields = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "total_ms": round(total, 1),
+            "queries": timer.queries,
+            **{f"{name}_ms": round(timer.spans.get(name, (0.0, 0))[0], 1) for name in _SPANS},
+        }
+        logger.info(" ".join(f"{key}={value}" for key, value in fields.items()),
+                    extra={"timing": fields})
+        return response
+
+
+_REQUEST_SECONDS = metrics.histogram(
+    "booklibrary_request_duration_seconds", "Time to respond, by URL name.", ["view", "method"])
+_REQUESTS = metrics.counter(
+    "booklibrary_requests_total", "Responses, by URL name and status.", ["view", "method", "status"])
+_REQUEST_QUERIES = metrics.histogram(
+    "booklibrary_request_queries", "Database queries per request, by URL name.", ["view"],
+    buckets=metrics.COUNT_BUCKETS)
+_SESSION_COOKIE_BYTES = metrics.histogram(
+    "booklibrary_session_cookie_bytes", "Size of the session cookie when it is set.",
+    buckets=metrics.SIZE_BUCKETS)
+
+
+class MetricsMiddleware:
+    """Record request latency, query counts and session cookie size (see module docstring)."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with timing.request_timer() as timer:
+            queries = timer.queries
+            response = self.get_response(request)
+            queries = timer.queries - queries
+        seconds = time.perf_counter() - start
+
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "unresolved"
+        _REQUEST_SECONDS.observe(seconds, view=view, method=request.method)
+        _REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        _REQUEST_QUERIES.observe(queries, view=view)
+        cookie = response.cookies.get(settings.SESSION_COOKIE_NAME)
+        if cookie is not None and cookie.value:
+            _SESSION_COOKIE_BYTES.observe(len(cookie.key) + 1 + len(cookie.value))
+        return response
+
+
+class SlowQueryMiddleware:
+    """Name the current view in slow-query records (see utils/slow_queries.py)."""
+
+    def __init__(self, get_response):
+        if getattr(settings, "SLOW_QUERY_MS", None) is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = slow_queries.view.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            slow_queries.view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        slow_queries.view.set(request.resolver_match.view_name)
+
+
+# ?profile= values: (profiling mode, what to return).
+_PROFILE_REQUESTS = {
+    "1": ("sample", "report"),
+    "sample": ("sample", "report"),
+    "folded": ("sample", "folded"),
+    "cprofile": ("cprofile", "report"),
+    "memory": ("memory", "report"),
+}
+
+
+class ProfilingMiddleware:
+    """Profile requests for staff on demand, and a sample of slow ones (see module docstring)."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "PROFILE_SAMPLE_RATE", 0.0)
+        self.slow_ms = getattr(settings, "PROFILE_SLOW_MS", 1000)
+        self.directory = getattr(settings, "PROFILE_DIR", None)
+
+    def __call__(self, request):
+        asked = request.GET.get("profile") or request.headers.get("X-Profile")
+        user = getattr(request, "user", None)
+        if asked in _PROFILE_REQUESTS and user is not None and user.is_staff:
+            mode, output = _PROFILE_REQUESTS[asked]
+            profile = profiling.run(self.get_response, request, mode=mode)
+            if self.directory:
+                self._save(request, profile)
+            body = profile.folded() if output == "folded" else profile.report()
+            return HttpResponse(body, content_type="text/plain; charset=utf-8")
+
+        if self.directory and self.sample_rate and random.random() < self.sample_rate:
+            profile = profiling.run(self.get_response, request)
+            if profile.elapsed_ms >= self.slow_ms:
+                stem = self._save(request, profile)
+                logger.info("Profiled slow request %s %s (%.0f ms, %d queries): %s",
+                            request.method, request.path, profile.elapsed_ms,
+                            len(profile.queries), stem)
+            return profile.result
+        return self.get_response(request)
+
+    def _save(self, request, profile):
+        match = getattr(request, "resolver_match", None)
+        label = match.view_name if match else "unresolved"
+        try:
+            return profile.save(self.directory, label)
+        except OSError:
+            logger.exception("Could not save a profile to %s", self.directory)
+            return None
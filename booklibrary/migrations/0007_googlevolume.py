@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booklibrary", "0006_merge_20260311_2152"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GoogleVolume",
+            fields=[
+                (
+                    "volume_id",
+                    models.CharField(max_length=200, primary_key=True, serialize=False),
+                ),
+                (
+                    "data",
+                    models.JSONField(
+                        help_text="Raw volume resource as returned by Google Books"
+                    ),
+                ),
+                (
+                    "isbn_10",
+                    models.CharField(blank=True, db_index=True, max_length=10, null=True),
+                ),
+                (
+                    "isbn_13",
+                    models.CharField(blank=True, db_index=True, max_length=13, null=True),
+                ),
+                (
+                    "fetched_at",
+                    models.DateTimeField(
+                        help_text="When this volume was last fetched from Google"
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-fetched_at"],
+            },
+        ),
+    ]
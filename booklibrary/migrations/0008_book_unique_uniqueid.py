@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:02
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_books(apps, schema_editor):
+    """Fold Books sharing a uniqueID into the oldest one before it becomes unique."""
+    Book = apps.get_model("booklibrary", "Book")
+    BookInstance = apps.get_model("booklibrary", "BookInstance")
+
+    Book.objects.filter(uniqueID="").update(uniqueID=None)
+    duplicates = (
+        Book.objects.exclude(uniqueID=None)
+        .values("uniqueID")
+        .annotate(copies=Count("id"), keep=Min("id"))
+        .filter(copies__gt=1)
+    )
+    for row in duplicates:
+        keep = Book.objects.get(pk=row["keep"])
+        others = Book.objects.filter(uniqueID=row["uniqueID"]).exclude(pk=keep.pk)
+        for other in others:
+            BookInstance.objects.filter(book=other).update(book=keep)
+            keep.authors.add(*other.authors.all())
+            keep.genre.add(*other.genre.all())
+            keep.keywords.add(*other.keywords.all())
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booklibrary", "0007_googlevolume"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_books, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="book",
+            constraint=models.UniqueConstraint(
+                fields=("uniqueID",), name="unique_book_uniqueid"
+            ),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:41
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+# Lookup model -> (model, field) pairs that point at it.
+REFERENCES = {
+    "Genre": [("Book", "genre")],
+    "Keywords": [("Book", "keywords")],
+    "Language": [("Book", "language")],
+    "Location": [("BookInstance", "location")],
+    "Series": [("Book", "series")],
+}
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Fold lookup rows whose names differ only in case into the oldest one."""
+    for model_name, references in REFERENCES.items():
+        model = apps.get_model("booklibrary", model_name)
+        groups = {}
+        for pk, name in model.objects.order_by("pk").values_list("pk", "name"):
+            groups.setdefault((name or "").lower(), []).append(pk)
+
+        for keep, *duplicates in groups.values():
+            if not duplicates:
+                continue
+            for owner_name, field_name in references:
+                owner = apps.get_model("booklibrary", owner_name)
+                field = owner._meta.get_field(field_name)
+                if field.many_to_many:
+                    through = field.remote_field.through
+                    column = field.m2m_reverse_field_name() + "_id"
+                    owner_column = field.m2m_field_name() + "_id"
+                    owner_ids = through.objects.filter(
+                        **{f"{column}__in": duplicates}
+                    ).values_list(owner_column, flat=True)
+                    through.objects.bulk_create(
+                        [through(**{owner_column: o, column: keep}) for o in set(owner_ids)],
+                        ignore_conflicts=True,
+                    )
+                else:
+                    owner.objects.filter(**{f"{field_name}__in": duplicates}).update(
+                        **{field_name: keep}
+                    )
+            model.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booklibrary", "0008_book_unique_uniqueid"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="genre",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower("name"),
+                name="unique_genre_name_ci",
+                violation_error_message="A genre with this name already exists.",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="keywords",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower("name"),
+                name="unique_keywords_name_ci",
+                violation_error_message="A keyword with this name already exists.",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="language",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower("name"),
+                name="unique_language_name_ci",
+                violation_error_message="A language with this name already exists.",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="location",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower("name"),
+                name="unique_location_name_ci",
+                violation_error_message="A location with this name already exists.",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="series",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower("name"),
+                name="unique_series_name_ci",
+                violation_error_message="A series with this name already exists.",
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:37
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booklibrary", "0009_lookup_names_unique_ci"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(
+                django.db.models.functions.text.Lower("last_name"),
+                name="author_last_name_lower_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="author",
+            index=models.Index(
+                django.db.models.functions.text.Lower("full_name"),
+                name="author_full_name_lower_idx",
+            ),
+        ),
+    ]
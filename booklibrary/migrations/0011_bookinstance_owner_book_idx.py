@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booklibrary", "0010_author_lower_name_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bookinstance",
+            index=models.Index(
+                fields=["owner", "book"], name="bookinstance_owner_book_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booklibrary", "0011_bookinstance_owner_book_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Loan",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "borrower",
+                    models.CharField(help_text="Who has the copy", max_length=100),
+                ),
+                (
+                    "borrower_email",
+                    models.EmailField(
+                        blank=True,
+                        help_text="Where overdue reminders are sent",
+                        max_length=254,
+                    ),
+                ),
+                (
+                    "lent_on",
+                    models.DateField(default=django.utils.timezone.localdate),
+                ),
+                ("due_back", models.DateField()),
+                ("returned_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "reminded_on",
+                    models.DateField(
+                        blank=True,
+                        help_text="When the last overdue reminder was sent",
+                        null=True,
+                    ),
+                ),
+                (
+                    "instance",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="loans",
+                        to="booklibrary.bookinstance",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["due_back"],
+                "indexes": [
+                    models.Index(
+                        fields=["returned_at", "due_back"], name="loan_open_due_idx"
+                    ),
+                    models.Index(
+                        fields=["returned_at", "borrower"],
+                        name="loan_open_borrower_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.urls import reverse
 from django.core.validators import MinLengthValidator
 from django.conf import settings
+from django.utils import timezone
 import uuid
 
 
@@ -13,6 +15,15 @@ class Genre(models.Model):
         help_text="Enter a book genre (e.g. Science Fiction, French Poetry etc.)",
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                Lower('name'),
+                name='unique_genre_name_ci',
+                violation_error_message='A genre with this name already exists.',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -25,6 +36,15 @@ class Keywords(models.Model):
         help_text="Enter key words (e.g. Climbing, Knitting, etc.)",
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                Lower('name'),
+                name='unique_keywords_name_ci',
+                violation_error_message='A keyword with this name already exists.',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -38,6 +58,15 @@ class Language(models.Model):
         default='English',
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                Lower('name'),
+                name='unique_language_name_ci',
+                violation_error_message='A language with this name already exists.',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -50,6 +79,15 @@ class Location(models.Model):
         help_text="Enter a location where the book is stored",
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                Lower('name'),
+                name='unique_location_name_ci',
+                violation_error_message='A location with this name already exists.',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -62,6 +100,15 @@ class Series(models.Model):
         help_text="Enter a series name that the book is part of",
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                Lower('name'),
+                name='unique_series_name_ci',
+                violation_error_message='A series with this name already exists.',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -118,6 +165,10 @@ class Book(models.Model):
 
     class Meta:
         ordering = ['title']
+        constraints = [
+            # services.create_books_from_google_data() upserts on this.
+            models.UniqueConstraint(fields=['uniqueID'], name='unique_book_uniqueid'),
+        ]
 
     def display_genre(self):
         """Return up to three genre names as a comma-separated string (used in admin)."""
@@ -178,12 +229,60 @@ class BookInstance(models.Model):
 
     class Meta:
         ordering = ['location']
+        indexes = [
+            # "My library": EXISTS (owner, book) lookups and per-owner counts.
+            models.Index(fields=['owner', 'book'], name='bookinstance_owner_book_idx'),
+        ]
 
     def __str__(self):
         title = self.book.title if self.book_id else 'No book'
         return f'{self.id} ({title}) — {self.get_status_display()}'
 
 
+class LoanManager(models.Manager):
+    """Queries over open loans, served by the (returned_at, ...) indexes."""
+
+    def open(self):
+        """Loans not yet returned."""
+        return self.filter(returned_at__isnull=True)
+
+    def overdue(self, on=None):
+        """Open loans due back before ``on`` (default: today)."""
+        return self.open().filter(due_back__lt=on or timezone.localdate())
+
+
+class Loan(models.Model):
+    """A copy lent to someone; the loan is open until returned_at is set."""
+
+    instance = models.ForeignKey('BookInstance', on_delete=models.CASCADE, related_name='loans')
+    borrower = models.CharField(max_length=100, help_text='Who has the copy')
+    borrower_email = models.EmailField(blank=True, help_text='Where overdue reminders are sent')
+    lent_on = models.DateField(default=timezone.localdate)
+    due_back = models.DateField()
+    returned_at = models.DateTimeField(null=True, blank=True)
+    reminded_on = models.DateField(
+        null=True, blank=True, help_text='When the last overdue reminder was sent',
+    )
+
+    objects = LoanManager()
+
+    class Meta:
+        ordering = ['due_back']
+        indexes = [
+            # Open loans are returned_at IS NULL; leading on it keeps the
+            # overdue scan and per-borrower lookups off returned loans on
+            # every backend (MySQL has no partial indexes).
+            models.Index(fields=['returned_at', 'due_back'], name='loan_open_due_idx'),
+            models.Index(fields=['returned_at', 'borrower'], name='loan_open_borrower_idx'),
+        ]
+
+    def is_overdue(self):
+        return self.returned_at is None and self.due_back < timezone.localdate()
+
+    def __str__(self):
+        return f'{self.instance_id} to {self.borrower}, due {self.due_back}'
+
+
 class Author(models.Model):
     """A book author."""
 
@@ -195,6 +294,11 @@ class Author(models.Model):
 
     class Meta:
         ordering = ['last_name', 'first_name']
+        indexes = [
+            # Prefix matches for the author autocomplete endpoint.
+            models.Index(Lower('last_name'), name='author_last_name_lower_idx'),
+            models.Index(Lower('full_name'), name='author_full_name_lower_idx'),
+        ]
 
     def get_absolute_url(self):
         return reverse('booklibrary:author-detail', args=[str(self.id)])
@@ -203,3 +307,81 @@ class Author(models.Model):
         if self.last_name:
             return f'{self.last_name}, {self.first_name}'
         return self.first_name
+
+
+class GoogleVolume(models.Model):
+    """
+    A local copy of a Google Books volume, keyed by Google's volume id.
+
+    Every search stores the raw volume JSON here, so repeat lookups and
+    re-imports can be served without another round trip to Google, and
+    BookSearchView can fall back to it when the API is unavailable.
+    """
+
+    volume_id = models.CharField(max_length=200, primary_key=True)
+    data = models.JSONField(help_text="Raw volume resource as returned by Google Books")
+    isbn_10 = models.CharField(max_length=10, null=True, blank=True, db_index=True)
+    isbn_13 = models.CharField(max_length=13, null=True, blank=True, db_index=True)
+    fetched_at = models.DateTimeField(help_text="When this volume was last fetched from Google")
+
+    class Meta:
+        ordering = ['-fetched_at']
+
+    def __str__(self):
+        title = (self.data.get('volumeInfo') or {}).get('title') or 'Untitled'
+        return f'{title} ({self.volume_id})'
+
+
+class SearchWord(models.Model):
+    """
+    A distinct normalised word of the Book titles and Author names, for
+    typo-tolerant search (utils/fuzzy.py).
+
+    Misspelled query words are matched against this vocabulary through
+    SearchWordTrigram, then to books and authors through SearchPosting.
+    """
+
+    word = models.CharField(max_length=64, unique=True)
+    trigram_count = models.PositiveSmallIntegerField()
+
+    def __str__(self):
+        return self.word
+
+
+class SearchWordTrigram(models.Model):
+    """One trigram of a SearchWord."""
+
+    word = models.ForeignKey(SearchWord, on_delete=models.CASCADE, related_name='trigrams')
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        constraints = [
+            # Also the index for looking up the words sharing a trigram.
+            models.UniqueConstraint(fields=['trigram', 'word'], name='unique_searchword_trigram'),
+        ]
+
+    def __str__(self):
+        return f'{self.word_id}:{self.trigram}'
+
+
+class SearchPosting(models.Model):
+    """A SearchWord occurring in one Book title or Author name."""
+
+    BOOK = 'b'
+    AUTHOR = 'a'
+    KINDS = [(BOOK, 'Book title'), (AUTHOR, 'Author name')]
+
+    kind = models.CharField(max_length=1, choices=KINDS)
+    object_id = models.PositiveBigIntegerField()
+    word = models.ForeignKey(SearchWord, on_delete=models.CASCADE, related_name='postings')
+
+    class Meta:
+        indexes = [
+            # Ranking: the postings of the candidate words, grouped by object.
+            models.Index(fields=['kind', 'word', 'object_id'], name='searchposting_word_idx'),
+            # Re-indexing one object.
+            models.Index(fields=['kind', 'object_id'], name='searchposting_object_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind}:{self.object_id}:{self.word_id}'
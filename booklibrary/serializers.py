@@ -4,7 +4,7 @@ DRF serializers for the booklibrary app.
 
 from rest_framework import serializers
 
-from booklibrary.models import Book
+from booklibrary.models import Book, Location
 
 
 class BookSerializer(serializers.ModelSerializer):
@@ -29,3 +29,30 @@ class BookSerializer(serializers.ModelSerializer):
             "contentType",
         ]
         read_only_fields = ["id"]
+
+
+class ScanStartSerializer(serializers.Serializer):
+    """Target location for a new scan session."""
+
+    location = serializers.PrimaryKeyRelatedField(queryset=Location.objects.all())
+
+
+class ScanBatchSerializer(serializers.Serializer):
+    """Copy ids scanned since the client's last request."""
+
+    ids = serializers.ListField(
+        child=serializers.CharField(max_length=64), allow_empty=False, max_length=1000,
+    )
+
+
+class ScanSessionSerializer(serializers.Serializer):
+    """State of a scan session, as returned by utils/scan_sessions.py."""
+
+    id = serializers.CharField()
+    location = serializers.IntegerField(source="location_id")
+    pending = serializers.SerializerMethodField()
+    moved = serializers.IntegerField()
+    unknown = serializers.ListField(child=serializers.CharField())
+
+    def get_pending(self, session):
+        return len(session["pending"])
@@ -6,15 +6,76 @@ Public interface
 create_book_from_google_data(book_data, cleaned_data, user)
     Create (or locate) a Book from a Google Books volume dict and an
     AddForm's cleaned_data, then attach a BookInstance owned by user.
-    Returns (Book, created: bool).
+    Returns (Book, created: bool).  A single-item batch of
+    create_books_from_google_data().
+
+create_books_from_google_data(books_data, cleaned_data, user)
+    Persist several Google Books results with the same shelving choices in
+    one transaction.  Genres, languages and authors are resolved once for the
+    whole batch.  Returns a list of (Book, created) in input order.
+
+update_instances(instances, **changes)
+    Set location, status and/or owner on every BookInstance in a queryset
+    with one UPDATE, and send bookinstances_changed once for the batch.
+    Returns the number of rows updated.
+
+resolve_names(model, names)
+    Map names onto rows of a lookup model (Genre, Keywords, Language,
+    Location, Series), matching case-insensitively and inserting the missing
+    ones in a single statement.  Returns {name: instance}.
+
+import_volume(volume_id, cleaned_data, user)
+    Like create_book_from_google_data(), but starting from a Google volume
+    id.  The volume data comes from the local GoogleVolume table, so
+    re-cataloguing a volume that has been seen before never goes back to
+    Google.
+
+Loans
+-----
+lend_copy(instance, borrower, due_back, borrower_email="")
+    Open a Loan and mark the copy On loan in one transaction.  The status
+    change is a conditional UPDATE, so two people cannot lend the same copy.
+    Raises LoanError if the copy is not available.
+
+return_copy(instance)
+    Close the copy's open loan and mark it Available.  Raises LoanError if
+    the copy is not on loan.
+
+send_loan_reminders(today=None)
+    E-mail the borrower of every overdue loan not reminded in the last
+    LOAN_REMINDER_INTERVAL days, over one SMTP connection, and record the
+    reminder with one UPDATE.  Only open loans are scanned.  Returns the
+    number of reminders sent.
+
+Concurrency
+-----------
+Books are matched on their unique uniqueID (the Google volume id) and
+inserted with an upsert, and the many-to-many rows with ignore_conflicts, so
+two users adding the same volume at once end up sharing one Book instead of
+one of them failing or creating a duplicate.
+
+Configuration
+-------------
+LOAN_PERIOD_DAYS             (optional) – default loan length offered (28).
+LOAN_REMINDER_INTERVAL_DAYS  (optional) – days between reminders (7).
 """
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import unidecode
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
 from nameparser import HumanName
 
-from booklibrary.models import Author, Book, BookInstance, Genre, Language
+from booklibrary.models import Author, Book, BookInstance, Genre, Language, Loan, SearchPosting
+from booklibrary.signals import bookinstances_changed
+from booklibrary.utils import fuzzy, lookup_cache, typeahead
+from booklibrary.utils.db import bulk_upsert
+from booklibrary.utils.google_books import get_volume
 
 logger = logging.getLogger(__name__)
 
@@ -37,14 +98,83 @@ def _parse_published_date(value):
 
 def _get_or_create_author(full_name):
     """Look up or create an Author by full name, normalising accented characters."""
+    return _resolve_authors([full_name])[full_name]
+
+
+def resolve_names(model, names):
+    """
+    Return {name: instance} for the non-empty names of a lookup model.
+
+    model is one of Genre, Keywords, Language, Location or Series, whose names
+    are unique regardless of case: "sci-fi" resolves to an existing "Sci-Fi"
+    row.  Costs one select, plus one insert and one select when some names
+    are new (and one more per name the database and Python lower-case
+    differently, such as "ÉTUDES" on SQLite).  Rows a concurrent request inserts first are picked up by the
+    second select rather than raising IntegrityError.  The rows returned are
+    about to be written to, so the first select always goes to the database:
+    lookup_cache may still hold a row another process has deleted.
+    """
+    wanted = {name: name.lower() for name in names if name}
+    if not wanted:
+        return {}
+
+    def lookup(keys, spellings):
+        rows = model.objects.alias(lower_name=Lower("name")).filter(
+            Q(lower_name__in=keys) | Q(name__in=spellings))
+        return {obj.name.lower(): obj for obj in rows}
+
+    found = lookup(set(wanted.values()), set(wanted))
+    missing = {}
+    for name, key in wanted.items():
+        if key not in found:
+            missing.setdefault(key, name)
+    if missing:
+        model.objects.bulk_create(
+            [model(name=name) for name in missing.values()], ignore_conflicts=True)
+        lookup_cache.note_change(model)
+        # bulk_create() does not return primary keys on every backend.
+        found.update(lookup(set(missing), set(missing.values())))
+        typeahead.update_later([found[key] for key in missing if key in found])
+        # The database may fold case differently from str.lower() (SQLite's
+        # LOWER() folds ASCII only), so an insert can conflict with a row
+        # neither select matched; ask for those by the database's own rule.
+        for key, name in missing.items():
+            if key not in found:
+                row = model.objects.filter(name__iexact=name).first()
+                if row is not None:
+                    found[key] = row
+    return {name: found[key] for name, key in wanted.items() if key in found}
+
+
+def _author_fields(full_name):
+    """Return the (full_name, first_name, last_name) an Author is stored under."""
     parsed = HumanName(full_name)
-    first = unidecode.unidecode(parsed.first)
-    last = unidecode.unidecode(parsed.last)
-    author, _ = Author.objects.filter(
-        first_name__icontains=first,
-        last_name__icontains=last,
-    ).get_or_create(full_name=full_name, first_name=first, last_name=last)
-    return author
+    return full_name, unidecode.unidecode(parsed.first), unidecode.unidecode(parsed.last)
+
+
+def _resolve_authors(full_names):
+    """Return {full_name: Author} for the non-empty names, inserting missing rows at once."""
+    wanted = {name: _author_fields(name) for name in full_names if name}
+    if not wanted:
+        return {}
+
+    def lookup(keys):
+        query = Q()
+        for full, first, last in keys:
+            query |= Q(full_name=full, first_name=first, last_name=last)
+        return {(a.full_name, a.first_name, a.last_name): a for a in Author.objects.filter(query)}
+
+    found = lookup(set(wanted.values()))
+    missing = set(wanted.values()) - found.keys()
+    if missing:
+        Author.objects.bulk_create([
+            Author(full_name=full, first_name=first, last_name=last)
+            for full, first, last in missing
+        ])
+        found.update(lookup(missing))
+        fuzzy.index_later(SearchPosting.AUTHOR, [found[fields] for fields in missing])
+        typeahead.update_later([found[fields] for fields in missing])
+    return {name: found[fields] for name, fields in wanted.items()}
 
 
 def create_book_from_google_data(book_data, cleaned_data, user):
@@ -67,51 +197,235 @@ def create_book_from_google_data(book_data, cleaned_data, user):
     -------
     (Book, bool)
         The Book instance and a created flag (True = newly inserted row).
+        For an existing Book, language and series are refreshed from the
+        new data.
     """
-    published_on = _parse_published_date(book_data["published_date"])
-
-    book, created = Book.objects.get_or_create(
-        uniqueID=book_data["volume_id"],
-        defaults=dict(
-            title=book_data["title"],
-            summary=book_data["description"],
-            publisher=book_data["publisher"],
-            publishedDate=published_on,
-            previewLink=book_data["preview_link"],
-            imageLink=book_data["image_link"],
-            contentType="PHY",
-        ),
-    )
+    return create_books_from_google_data([book_data], cleaned_data, user)[0]
+
+
+def create_books_from_google_data(books_data, cleaned_data, user):
+    """
+    Persist several Google Books results as Books + BookInstances owned by user.
+
+    Every result gets the same shelving choices from cleaned_data (a
+    BulkAddForm's: book_genre, book_location, book_keywords, book_series).
+    Everything happens in one transaction, and the shared lookups are
+    resolved once for the batch: one query (plus one insert when something
+    is new) each for genres, languages and authors, one insert per
+    many-to-many table, and one insert for all the BookInstances.
+
+    Returns
+    -------
+    list of (Book, bool)
+        One (book, created) pair per entry in books_data, in the same order.
+        A volume selected twice yields the same Book twice (and two copies).
+    """
+    form_genres = list(cleaned_data["book_genre"] or [])
+    form_keywords = list(cleaned_data["book_keywords"] or [])
+    series = cleaned_data["book_series"]
+    location = cleaned_data["book_location"]
+
+    with transaction.atomic():
+        genres = resolve_names(
+            Genre, [d[k] for d in books_data for k in ("genre1", "genre2")])
+        languages = resolve_names(Language, [d["language"] for d in books_data])
+        authors = _resolve_authors(
+            [d[k] for d in books_data for k in ("author1", "author2")])
+
+        volume_ids = {d["volume_id"] for d in books_data}
+        books = {b.uniqueID: b for b in Book.objects.filter(uniqueID__in=volume_ids)}
+        existing = set(books)
+
+        new_books, changed_books = [], {}
+        for data in books_data:
+            language = languages.get(data["language"])
+            book = books.get(data["volume_id"])
+            if book is None:
+                book = Book(
+                    uniqueID=data["volume_id"],
+                    title=data["title"],
+                    summary=data["description"],
+                    publisher=data["publisher"],
+                    publishedDate=_parse_published_date(data["published_date"]),
+                    previewLink=data["preview_link"],
+                    imageLink=data["image_link"],
+                    contentType="PHY",
+                    language=language,
+                    series=series,
+                )
+                books[book.uniqueID] = book
+                new_books.append(book)
+            elif book.uniqueID in existing:
+                # Language and series are refreshed on books already catalogued.
+                if language and language.pk != book.language_id:
+                    book.language = language
+                    changed_books[book.pk] = book
+                if series and series.pk != book.series_id:
+                    book.series = series
+                    changed_books[book.pk] = book
+
+        if new_books:
+            # A concurrent add of the same volume turns the insert into a
+            # no-op update, and the row already there is used instead.
+            bulk_upsert(Book, new_books, unique_fields=["uniqueID"], update_fields=["uniqueID"])
+            if any(b.pk is None for b in new_books):
+                # bulk_create() does not return primary keys on every backend.
+                books.update(
+                    (b.uniqueID, b)
+                    for b in Book.objects.filter(uniqueID__in=[b.uniqueID for b in new_books])
+                )
+            fuzzy.index_later(SearchPosting.BOOK, [books[b.uniqueID] for b in new_books])
+            typeahead.update_later([books[b.uniqueID] for b in new_books])
+        if changed_books:
+            Book.objects.bulk_update(list(changed_books.values()), ["language", "series"])
+
+        author_rows, genre_rows, keyword_rows = set(), set(), set()
+        for data in books_data:
+            book_id = books[data["volume_id"]].pk
+            for key in ("author1", "author2"):
+                if data[key]:
+                    author_rows.add((book_id, authors[data[key]].pk))
+            for key in ("genre1", "genre2"):
+                if data[key] in genres:
+                    genre_rows.add((book_id, genres[data[key]].pk))
+            genre_rows.update((book_id, g.pk) for g in form_genres)
+            keyword_rows.update((book_id, k.pk) for k in form_keywords)
+
+        for through, column, rows in (
+            (Book.authors.through, "author_id", author_rows),
+            (Book.genre.through, "genre_id", genre_rows),
+            (Book.keywords.through, "keywords_id", keyword_rows),
+        ):
+            if rows:
+                through.objects.bulk_create(
+                    [through(book_id=b, **{column: other}) for b, other in rows],
+                    ignore_conflicts=True,
+                )
+
+        BookInstance.objects.bulk_create([
+            BookInstance(owner=user, book=books[d["volume_id"]], location=location)
+            for d in books_data
+        ])
+        _send_instances_changed(
+            {user.pk}, {location.pk if location else None}, ["book", "owner", "location"])
+
+    return [
+        (books[d["volume_id"]], d["volume_id"] not in existing)
+        for d in books_data
+    ]
+
+
+def import_volume(volume_id, cleaned_data, user):
+    """
+    Persist a Google Books volume by id as a Book + BookInstance owned by user.
+
+    The volume is read through get_volume(), which serves it from the local
+    GoogleVolume table when it has been seen before.  Raises GoogleBooksError
+    if the volume is not stored locally and Google cannot be reached.
+    """
+    return create_book_from_google_data(get_volume(volume_id), cleaned_data, user)
+
+
+INSTANCE_UPDATE_FIELDS = ("location", "status", "owner")
+
+
+def _send_instances_changed(owner_ids, location_ids, fields):
+    """Send bookinstances_changed once the current transaction commits."""
+    transaction.on_commit(lambda: bookinstances_changed.send(
+        sender=BookInstance, owner_ids=owner_ids, location_ids=location_ids,
+        fields=list(fields),
+    ))
+
+
+def update_instances(instances, **changes):
+    """
+    Apply changes to every BookInstance in the instances queryset at once.
+
+    changes may set location, status and owner.  The rows are changed by a
+    single UPDATE statement, so post_save does not fire; instead
+    bookinstances_changed is sent once after commit with every owner and
+    location the batch touched (one extra SELECT DISTINCT collects them).
+    Raises ValueError for any other field.  Returns the number of rows
+    updated.
+    """
+    unknown = set(changes) - set(INSTANCE_UPDATE_FIELDS)
+    if unknown:
+        raise ValueError(f"Cannot bulk-update BookInstance fields: {sorted(unknown)}")
+    if not changes:
+        return 0
+
+    with transaction.atomic():
+        touched = set(instances.order_by().values_list("owner_id", "location_id").distinct())
+        count = instances.update(**changes)
+
+    if count:
+        owner_ids = {owner for owner, _ in touched}
+        location_ids = {location for _, location in touched}
+        if "owner" in changes:
+            owner_ids.add(getattr(changes["owner"], "pk", changes["owner"]))
+        if "location" in changes:
+            location_ids.add(getattr(changes["location"], "pk", changes["location"]))
+        _send_instances_changed(owner_ids, location_ids, changes)
+    return count
+
+
+# ── Loans ─────────────────────────────────────────────────────────────────────
+
+LOAN_PERIOD_DAYS = getattr(settings, "LOAN_PERIOD_DAYS", 28)
+LOAN_REMINDER_INTERVAL_DAYS = getattr(settings, "LOAN_REMINDER_INTERVAL_DAYS", 7)
 
-    for name in [book_data["author1"], book_data["author2"]]:
-        if name:
-            book.authors.add(_get_or_create_author(name))
 
-    for genre_name in [book_data["genre1"], book_data["genre2"]]:
-        if genre_name:
-            genre_obj, _ = Genre.objects.get_or_create(name=genre_name)
-            book.genre.add(genre_obj)
+class LoanError(ValueError):
+    """A copy cannot be lent or returned in its current state."""
 
-    if cleaned_data["book_genre"]:
-        book.genre.add(*cleaned_data["book_genre"])
 
-    language = book_data["language"]
-    if language:
-        lang_obj, _ = Language.objects.get_or_create(name=language)
-        book.language = lang_obj
+def lend_copy(instance, borrower, due_back, borrower_email=""):
+    """Lend instance to borrower until due_back; returns the new Loan."""
+    with transaction.atomic():
+        available = BookInstance.objects.filter(pk=instance.pk, status="a")
+        if not update_instances(available, status="o"):
+            raise LoanError("This copy is not available to lend.")
+        loan = Loan.objects.create(
+            instance=instance, borrower=borrower, borrower_email=borrower_email,
+            due_back=due_back,
+        )
+    instance.status = "o"
+    return loan
 
-    if cleaned_data["book_series"]:
-        book.series = cleaned_data["book_series"]
 
-    if cleaned_data["book_keywords"]:
-        book.keywords.add(*cleaned_data["book_keywords"])
+def return_copy(instance):
+    """Close instance's open loan and make it available again."""
+    with transaction.atomic():
+        closed = Loan.objects.open().filter(instance=instance).update(returned_at=timezone.now())
+        if not closed:
+            raise LoanError("This copy is not on loan.")
+        update_instances(BookInstance.objects.filter(pk=instance.pk), status="a")
+    instance.status = "a"
 
-    book.save()
 
-    BookInstance.objects.create(
-        owner=user,
-        book=book,
-        location=cleaned_data["book_location"],
+def send_loan_reminders(today=None):
+    """E-mail the borrowers of overdue loans; returns how many were reminded."""
+    today = today or timezone.localdate()
+    cutoff = today - timedelta(days=LOAN_REMINDER_INTERVAL_DAYS)
+    loans = list(
+        Loan.objects.overdue(today)
+        .exclude(borrower_email="")
+        .filter(Q(reminded_on__isnull=True) | Q(reminded_on__lte=cutoff))
+        .select_related("instance__book")
     )
+    if not loans:
+        return 0
 
-    return book, created
+    send_mass_mail([
+        (
+            f"Overdue: {loan.instance.book or 'a book'}",
+            f"Hello {loan.borrower},\n\n"
+            f"\"{loan.instance.book or 'The book'}\" was due back on "
+            f"{loan.due_back:%d %B %Y}.  Please return it when you can.\n",
+            None,
+            [loan.borrower_email],
+        )
+        for loan in loans
+    ])
+    Loan.objects.filter(pk__in=[loan.pk for loan in loans]).update(reminded_on=today)
+    return len(loans)
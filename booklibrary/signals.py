@@ -2,11 +2,25 @@
 Signal handlers for the booklibrary app.
 
 Registered automatically when BooklibraryConfig.ready() runs.
+
+Custom signals
+--------------
+bookinstances_changed(sender=BookInstance, owner_ids, location_ids, fields)
+    Sent once, after commit, for a set-based change to many BookInstances
+    (services.update_instances() and the batch add path), which bypass
+    post_save.  owner_ids and location_ids hold every owner and location
+    the batch touched, before and after the change; fields names the
+    changed columns.  Connect here anything that counts or caches per owner
+    or per location, so a batch invalidates it once instead of per row.
 """
-from django.db.models.signals import post_delete
-from django.dispatch import receiver
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .models import Author, Book, BookInstance, Genre, Location, SearchPosting, Series
+from .utils import fuzzy, lookup_cache, owner_counts, typeahead
 
-from .models import Book, BookInstance
+bookinstances_changed = Signal()
 
 
 @receiver(post_delete, sender=BookInstance)
@@ -26,3 +40,86 @@ def delete_book_if_last_instance(sender, instance, **kwargs):
         return
     if not BookInstance.objects.filter(book_id=instance.book_id).exists():
         Book.objects.filter(pk=instance.book_id).delete()
+
+
+def invalidate_lookup_cache(sender, **kwargs):
+    """Drop the cached copy of a lookup table when one of its rows changes."""
+    lookup_cache.note_change(sender)
+
+
+# Connected per model: a sender-less post_delete receiver would stop Django
+# from fast-deleting rows of every other model.
+for _model in lookup_cache.LOOKUP_MODELS:
+    post_save.connect(invalidate_lookup_cache, sender=_model)
+    post_delete.connect(invalidate_lookup_cache, sender=_model)
+
+
+@receiver(pre_save, sender=BookInstance)
+def remember_previous_owner(sender, instance, update_fields=None, **kwargs):
+    """Record the stored owner of a copy being saved, in case the save changes it."""
+    instance._previous_owner_id = None
+    if instance._state.adding or (update_fields is not None and "owner" not in update_fields):
+        return
+    instance._previous_owner_id = (
+        BookInstance.objects.filter(pk=instance.pk).values_list("owner_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=BookInstance)
+@receiver(post_delete, sender=BookInstance)
+def invalidate_owner_counts(sender, instance, **kwargs):
+    """Drop the cached counts of the copy's owner (and previous owner) after commit."""
+    owner_ids = {instance.owner_id, getattr(instance, "_previous_owner_id", None)}
+    transaction.on_commit(lambda: owner_counts.invalidate(owner_ids))
+
+
+@receiver(bookinstances_changed, sender=BookInstance)
+def invalidate_owner_counts_for_batch(sender, owner_ids, **kwargs):
+    """Drop the cached counts of every owner a batch change touched."""
+    owner_counts.invalidate(owner_ids)
+
+
+@receiver(post_delete, sender=Location)
+def invalidate_all_owner_counts(sender, **kwargs):
+    """Deleting a location re-points its copies without signals; forget all counts."""
+    transaction.on_commit(owner_counts.invalidate)
+
+
+_FUZZY_KINDS = {Book: SearchPosting.BOOK, Author: SearchPosting.AUTHOR}
+_FUZZY_FIELDS = {"title", "full_name", "first_name", "last_name"}
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+def update_fuzzy_index(sender, instance, update_fields=None, **kwargs):
+    """Re-index a saved title or author name for fuzzy search after commit."""
+    if update_fields is not None and not _FUZZY_FIELDS & set(update_fields):
+        return
+    fuzzy.index_later(_FUZZY_KINDS[sender], [instance])
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+def remove_from_fuzzy_index(sender, instance, **kwargs):
+    """Drop a deleted title or author name from the fuzzy search index."""
+    fuzzy.unindex(_FUZZY_KINDS[sender], [instance.pk])
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Series)
+@receiver(post_save, sender=Genre)
+def update_typeahead(sender, instance, update_fields=None, **kwargs):
+    """Re-key a saved title or name in the typeahead index after commit."""
+    if update_fields is not None and not (_FUZZY_FIELDS | {"name"}) & set(update_fields):
+        return
+    typeahead.update_later([instance])
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Series)
+@receiver(post_delete, sender=Genre)
+def remove_from_typeahead(sender, instance, **kwargs):
+    """Drop a deleted title or name from the typeahead index after commit."""
+    typeahead.remove_later([instance])
@@ -4,6 +4,7 @@ Sitemaps for the booklibrary app.
 Registered in booklibrary/urls.py under /sitemap.xml.
 """
 from django.contrib.sitemaps import Sitemap
+from django.urls import reverse
 
 from .models import Book
 
@@ -15,4 +16,8 @@ class BookSitemap(Sitemap):
     priority = 0.9
 
     def items(self):
-        return Book.objects.all()
+        # Every book is listed, so fetch only the ids, not whole rows.
+        return Book.objects.order_by('pk').values_list('pk', flat=True)
+
+    def location(self, pk):
+        return reverse('booklibrary:book-detail', args=[str(pk)])
@@ -0,0 +1,60 @@
+/*
+ * autocomplete.js — typeahead for the autocomplete widgets in booklibrary/forms.py.
+ *
+ * Every <select class="js-autocomplete" data-autocomplete-url="..."> gets a
+ * search box underneath.  Typing queries the booklibrary:autocomplete JSON
+ * endpoint (Select2 shape: {results: [{id, text}], pagination: {more}}) via
+ * jQuery UI's autocomplete; choosing a suggestion adds it to the <select> as
+ * a selected <option>.  The <select> only ever holds the chosen values, so
+ * the page never has to render the full table.
+ *
+ * Requires jQuery and jQuery UI, loaded by base_menu.html.
+ */
+(function ($) {
+  "use strict";
+
+  function source(url) {
+    return function (request, response) {
+      $.getJSON(url, {q: request.term, page: 1})
+        .done(function (data) {
+          response($.map(data.results, function (row) {
+            return {label: row.text, value: String(row.id)};
+          }));
+        })
+        .fail(function () { response([]); });
+    };
+  }
+
+  function choose($select, item) {
+    if (!$select.prop("multiple")) {
+      $select.find("option").filter(function () { return this.value !== ""; }).remove();
+    }
+    var $option = $select.find("option").filter(function () { return this.value === item.value; });
+    if (!$option.length) {
+      $option = $("<option>").val(item.value).text(item.label).appendTo($select);
+    }
+    $option.prop("selected", true);
+    $select.trigger("change");
+  }
+
+  $(function () {
+    $("select.js-autocomplete").each(function () {
+      var $select = $(this);
+      $('<input type="search" class="form-control form-control-sm mt-1" autocomplete="off">')
+        .attr("placeholder", "Type to search…")
+        .attr("aria-label", "Search " + ($select.attr("name") || ""))
+        .insertAfter($select)
+        .autocomplete({
+          minLength: 1,
+          delay: 200,
+          source: source($select.data("autocomplete-url")),
+          focus: function () { return false; },
+          select: function (event, ui) {
+            choose($select, ui.item);
+            $(this).val("");
+            return false;
+          }
+        });
+    });
+  });
+}(jQuery));
@@ -0,0 +1,50 @@
+/*
+ * typeahead.js — suggestions under the book and author search boxes.
+ *
+ * Every <input data-typeahead-url="..."> queries the booklibrary:typeahead
+ * JSON endpoint ({results: [{kind, id, text, url}]}) as the user types, via
+ * jQuery UI's autocomplete.  An optional data-typeahead-kinds attribute
+ * ("book,author") is passed on as ?kinds=.  Choosing a suggestion opens its
+ * page; pressing Enter without choosing one submits the search form as
+ * before.
+ *
+ * Requires jQuery and jQuery UI, loaded by base_menu.html.
+ */
+(function ($) {
+  "use strict";
+
+  var KIND_LABELS = {book: "Book", author: "Author", series: "Series", genre: "Genre"};
+
+  function source(url, kinds) {
+    var pending = null;
+    return function (request, response) {
+      if (pending) { pending.abort(); }
+      pending = $.getJSON(url, {q: request.term, kinds: kinds || ""})
+        .done(function (data) {
+          response($.map(data.results, function (row) {
+            return {
+              label: row.text + " — " + (KIND_LABELS[row.kind] || row.kind),
+              value: row.text,
+              url: row.url
+            };
+          }));
+        })
+        .fail(function () { response([]); });
+    };
+  }
+
+  $(function () {
+    $("input[data-typeahead-url]").each(function () {
+      var $input = $(this);
+      $input.attr("autocomplete", "off").autocomplete({
+        minLength: 1,
+        delay: 50,
+        source: source($input.data("typeahead-url"), $input.data("typeahead-kinds")),
+        select: function (event, ui) {
+          window.location.href = ui.item.url;
+          return false;
+        }
+      });
+    });
+  });
+}(jQuery));
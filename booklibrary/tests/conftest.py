@@ -8,11 +8,13 @@ from datetime import date
 from django.contrib.auth import get_user_model
 from django.contrib.messages.storage.fallback import FallbackStorage
 from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
 from django.test import RequestFactory
 
 from booklibrary.models import (
     Author, Book, BookInstance, Genre, Keywords, Language, Location, Series,
 )
+from booklibrary.utils import catalogue, lookup_cache, typeahead
 
 User = get_user_model()
 
@@ -30,6 +32,7 @@ class UserFactory(factory.django.DjangoModelFactory):
 class GenreFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = Genre
+        django_get_or_create = ("name",)
 
     name = factory.Sequence(lambda n: f"Genre {n}")
 
@@ -37,6 +40,7 @@ class GenreFactory(factory.django.DjangoModelFactory):
 class KeywordsFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = Keywords
+        django_get_or_create = ("name",)
 
     name = factory.Sequence(lambda n: f"Keyword {n}")
 
@@ -44,6 +48,7 @@ class KeywordsFactory(factory.django.DjangoModelFactory):
 class LanguageFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = Language
+        django_get_or_create = ("name",)
 
     name = "English"
 
@@ -51,6 +56,7 @@ class LanguageFactory(factory.django.DjangoModelFactory):
 class LocationFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = Location
+        django_get_or_create = ("name",)
 
     name = factory.Sequence(lambda n: f"Shelf {n}")
 
@@ -58,6 +64,7 @@ class LocationFactory(factory.django.DjangoModelFactory):
 class SeriesFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = Series
+        django_get_or_create = ("name",)
 
     name = factory.Sequence(lambda n: f"Series {n}")
 
@@ -152,6 +159,23 @@ def setup_request(request, user=None, session_data=None):
 
 # ── Pytest fixtures ───────────────────────────────────────────────────────────
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with empty caches (search pages, rate-limit slots, lookup
+    tables, typeahead index).
+
+    Each test's rows are rolled back afterwards, so cached lookup rows would
+    otherwise outlive them.
+    """
+    cache.clear()
+    lookup_cache.clear()
+    typeahead.clear()
+    yield
+    cache.clear()
+    lookup_cache.clear()
+    typeahead.clear()
+
+
 @pytest.fixture
 def rf():
     return RequestFactory()
@@ -200,3 +224,14 @@ def book(db):
 @pytest.fixture
 def book_instance(db, user):
     return BookInstanceFactory(owner=user)
+
+
+@pytest.fixture
+def make_catalogue(db):
+    """Return make(books=1000, seed=0, **kwargs), inserting a synthetic catalogue.
+
+    See utils/catalogue.py; make() returns the row counts.
+    """
+    def make(books=1000, seed=0, **kwargs):
+        return catalogue.generate(books, seed=seed, **kwargs)
+    return make
@@ -0,0 +1,172 @@
+"""
+Admin tests for the booklibrary app.
+
+Covers the changelist query budget (constant in the number of rows), the
+autocomplete widgets on the Book change page, the BookInstance bulk
+inventory actions, and EstimatedCountPaginator.
+Uses pytest-django's admin_client (a logged-in superuser).
+"""
+import pytest
+from unittest.mock import patch
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from booklibrary.models import Book, BookInstance
+from booklibrary.utils.db import EstimatedCountPaginator
+
+from .conftest import (
+    AuthorFactory,
+    BookFactory,
+    BookInstanceFactory,
+    GenreFactory,
+    LocationFactory,
+    UserFactory,
+)
+
+
+def _add_books(n):
+    for _ in range(n):
+        book = BookFactory()
+        book.authors.set([AuthorFactory(), AuthorFactory()])
+        book.genre.set([GenreFactory(), GenreFactory()])
+        BookInstanceFactory(book=book)
+
+
+def _count_queries(client, url):
+    client.get(url)  # warm the session and content-type caches
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(ctx.captured_queries)
+
+
+# ── Changelists ───────────────────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestChangelistQueries:
+
+    @pytest.mark.parametrize("url", [
+        "/admin/booklibrary/book/",
+        "/admin/booklibrary/bookinstance/",
+        "/admin/booklibrary/author/",
+    ])
+    def test_query_count_independent_of_rows(self, admin_client, url):
+        _add_books(2)
+        few = _count_queries(admin_client, url)
+        _add_books(15)
+        assert _count_queries(admin_client, url) == few
+
+    def test_book_changelist_shows_authors_and_genres(self, admin_client):
+        book = BookFactory()
+        book.authors.set([AuthorFactory(last_name="Herbert")])
+        book.genre.set([GenreFactory(name="Space Opera")])
+        content = admin_client.get("/admin/booklibrary/book/").content.decode()
+        assert "Herbert" in content
+        assert "Space Opera" in content
+
+    def test_full_result_count_not_computed(self, admin_client):
+        BookFactory()
+        response = admin_client.get("/admin/booklibrary/book/?q=zzz")
+        assert response.context["cl"].show_full_result_count is False
+
+
+# ── Change page ───────────────────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestBookChangePage:
+
+    def test_related_fields_use_autocomplete(self, admin_client):
+        others = [AuthorFactory(last_name=f"Unrelated{i}") for i in range(25)]
+        book = BookFactory()
+        book.authors.set([AuthorFactory(last_name="Herbert")])
+        BookInstanceFactory(book=book)
+        content = admin_client.get(f"/admin/booklibrary/book/{book.pk}/change/").content.decode()
+        assert 'data-field-name="authors"' in content
+        assert 'data-field-name="location"' in content
+        assert "Herbert" in content
+        assert not any(a.last_name in content for a in others)
+
+
+# ── BookInstance bulk actions ─────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestInventoryActions:
+
+    URL = "/admin/booklibrary/bookinstance/"
+
+    def test_move_selected_to_location(self, admin_client):
+        target = LocationFactory()
+        chosen = [BookInstanceFactory(), BookInstanceFactory()]
+        other = BookInstanceFactory()
+        response = admin_client.post(self.URL, {
+            "action": "move_to_location",
+            "_selected_action": [str(bi.pk) for bi in chosen],
+            "new_location": target.pk,
+        }, follow=True)
+        assert "Updated 2 copies." in response.content.decode()
+        assert set(BookInstance.objects.filter(location=target)) == set(chosen)
+        other.refresh_from_db()
+        assert other.location != target
+
+    def test_select_across_filtered_changelist(self, admin_client):
+        BookInstanceFactory.create_batch(3, status="a")
+        BookInstanceFactory(status="o")
+        admin_client.post(f"{self.URL}?status__exact=a", {
+            "action": "set_status",
+            "_selected_action": [str(BookInstance.objects.filter(status="a").first().pk)],
+            "select_across": "1",
+            "new_status": "l",
+        })
+        assert BookInstance.objects.filter(status="l").count() == 3
+        assert BookInstance.objects.filter(status="o").count() == 1
+
+    def test_reassign_owner(self, admin_client):
+        new_owner = UserFactory()
+        bi = BookInstanceFactory()
+        admin_client.post(self.URL, {
+            "action": "reassign_owner",
+            "_selected_action": [str(bi.pk)],
+            "new_owner": new_owner.pk,
+        })
+        bi.refresh_from_db()
+        assert bi.owner == new_owner
+
+    def test_missing_target_warns_and_changes_nothing(self, admin_client):
+        bi = BookInstanceFactory()
+        location = bi.location
+        response = admin_client.post(self.URL, {
+            "action": "move_to_location",
+            "_selected_action": [str(bi.pk)],
+        }, follow=True)
+        assert "Choose a new location" in response.content.decode()
+        bi.refresh_from_db()
+        assert bi.location == location
+
+
+# ── EstimatedCountPaginator ───────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestEstimatedCountPaginator:
+
+    def test_exact_count_without_estimate(self):
+        BookFactory.create_batch(3)
+        # SQLite keeps no row estimates.
+        assert EstimatedCountPaginator(Book.objects.all(), 10).count == 3
+
+    @patch("booklibrary.utils.db.estimated_count", return_value=250000)
+    def test_large_unfiltered_table_uses_estimate(self, mock_estimate):
+        assert EstimatedCountPaginator(Book.objects.all(), 100).count == 250000
+        assert EstimatedCountPaginator(Book.objects.all(), 100).num_pages == 2500
+
+    @patch("booklibrary.utils.db.estimated_count", return_value=250000)
+    def test_filtered_queryset_counted_exactly(self, mock_estimate):
+        BookFactory(title="Dune")
+        qs = Book.objects.filter(title="Dune")
+        assert EstimatedCountPaginator(qs, 100).count == 1
+        mock_estimate.assert_not_called()
+
+    @patch("booklibrary.utils.db.estimated_count", return_value=12)
+    def test_small_estimate_counted_exactly(self, mock_estimate):
+        BookFactory.create_batch(2)
+        assert EstimatedCountPaginator(Book.objects.all(), 100).count == 2
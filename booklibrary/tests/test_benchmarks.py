@@ -0,0 +1,167 @@
+"""
+Tests for booklibrary.utils.benchmarks, and the query budgets of the views.
+
+TestQueryBudgets runs every benchmark scenario against a 300-book synthetic
+catalogue and fails when a view makes more queries than the checked-in
+baseline (tests/benchmark_baseline.json); TestFlatQueries fails when a view's
+query count grows with the size of the catalogue (an N+1); TestMemoryBudgets
+fails when a listing's peak memory doubles.  After a change that rightly alters the
+counts, refresh the baseline with:
+
+    python manage.py benchmark_views --books 300 --write-baseline
+"""
+import json
+import math
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from booklibrary.models import Book
+from booklibrary.utils import benchmarks
+
+from .conftest import UserFactory
+
+RESULT = {"ms": 10.0, "ms_max": 12.0, "queries": 5, "peak_kb": 400}
+
+
+class TestCompare:
+
+    def test_within_baseline(self):
+        faster = {**RESULT, "ms": 15.0, "queries": 4, "peak_kb": 700}
+        assert benchmarks.compare({"view": faster}, {"view": RESULT}) == []
+
+    def test_extra_query_fails(self):
+        problems = benchmarks.compare({"view": {**RESULT, "queries": 6}}, {"view": RESULT})
+        assert problems == ["view: 6 queries, baseline 5"]
+
+    def test_doubled_time_and_memory_fail(self):
+        worse = {**RESULT, "ms": 25.0, "peak_kb": 1000}
+        assert benchmarks.compare({"view": worse}, {"view": RESULT}) == [
+            "view: 25.0 ms, baseline 10.0 ms", "view: peak 1000 KB, baseline 400 KB"]
+
+    def test_small_absolute_differences_are_noise(self):
+        tiny = {"ms": 1.0, "ms_max": 1.0, "queries": 1, "peak_kb": 10}
+        noisy = {**tiny, "ms": 4.0, "peak_kb": 100}
+        assert benchmarks.compare({"view": noisy}, {"view": tiny}) == []
+
+    def test_scenarios_without_baseline_are_skipped(self):
+        assert benchmarks.compare({"new": RESULT}, {}) == []
+
+    def test_memory_regressed(self):
+        assert benchmarks.memory_regressed({**RESULT, "peak_kb": 1000}, RESULT)
+        assert not benchmarks.memory_regressed({**RESULT, "peak_kb": 700}, RESULT)
+        assert not benchmarks.memory_regressed(RESULT, None)
+
+
+class TestBaselineFile:
+
+    def test_save_keeps_other_catalogues(self, tmp_path):
+        path = tmp_path / "baseline.json"
+        benchmarks.save_baseline("300-0", {"view": RESULT}, path)
+        benchmarks.save_baseline("20000-0", {"view": RESULT}, path)
+        assert set(json.loads(path.read_text())) == {"300-0", "20000-0"}
+        assert benchmarks.load_baseline("300-0", path) == {"view": RESULT}
+        assert benchmarks.load_baseline("1-1", path) == {}
+        assert benchmarks.load_baseline("300-0", tmp_path / "missing.json") == {}
+
+
+@pytest.mark.django_db
+class TestQueryBudgets:
+
+    def test_views_within_query_baseline(self, make_catalogue):
+        make_catalogue(300, seed=0, index=True)
+        user = UserFactory(is_staff=True)
+        scenarios = benchmarks.scenarios(user)
+        with benchmarks.google_stand_in():
+            results = benchmarks.run(scenarios, user, repeat=1)
+
+        baseline = benchmarks.load_baseline("300-0")
+        assert set(results) == set(baseline), "refresh benchmark_baseline.json (see above)"
+        assert benchmarks.compare(results, baseline, math.inf, math.inf) == []
+
+    def test_write_rolls_back(self, make_catalogue):
+        make_catalogue(50)
+        user = UserFactory()
+        add = next(s for s in benchmarks.scenarios(user) if s.name == "add_book")
+        with benchmarks.google_stand_in():
+            benchmarks.run([add], user, repeat=2)
+        assert not Book.objects.filter(uniqueID="standin-0").exists()
+
+
+@pytest.mark.django_db
+class TestFlatQueries:
+
+    def test_queries_do_not_grow_with_catalogue(self, make_catalogue):
+        # The same scenarios (same rows, same search words) before and after
+        # the catalogue grows tenfold, so only per-row queries can differ.
+        make_catalogue(50, seed=0, index=True)
+        user = UserFactory(is_staff=True)
+        scenarios = benchmarks.scenarios(user)
+        with benchmarks.google_stand_in():
+            small = benchmarks.run(scenarios, user, repeat=1)
+        make_catalogue(500, seed=1, index=True)
+        with benchmarks.google_stand_in():
+            large = benchmarks.run(scenarios, user, repeat=1)
+
+        grown = {name: (small[name]["queries"], large[name]["queries"])
+                 for name in small if large[name]["queries"] > small[name]["queries"]}
+        assert grown == {}
+
+    def test_baselines_are_flat(self):
+        small = benchmarks.load_baseline("300-0")
+        large = benchmarks.load_baseline("20000-0")
+        assert set(small) == set(large)
+        assert {name: large[name]["queries"] for name in large
+                if large[name]["queries"] > small[name]["queries"]} == {}
+
+
+@pytest.mark.django_db
+class TestMemoryBudgets:
+
+    def test_listings_within_memory_baseline(self, make_catalogue):
+        make_catalogue(300, seed=0, index=True)
+        user = UserFactory(is_staff=True)
+        scenarios = [s for s in benchmarks.scenarios(user) if s.name in benchmarks.LISTINGS]
+        assert {s.name for s in scenarios} == benchmarks.LISTINGS
+        results = benchmarks.run(scenarios, user, repeat=1)
+        baseline = benchmarks.load_baseline("300-0")
+        assert benchmarks.compare(results, baseline, time_factor=math.inf) == []
+
+    def test_memory_profile_names_the_lines(self, make_catalogue):
+        make_catalogue(50)
+        user = UserFactory(is_staff=True)
+        sitemap = next(s for s in benchmarks.scenarios(user) if s.name == "sitemap")
+        profile = benchmarks.memory_profile(sitemap, user)
+        assert profile.result[0].status_code == 200
+        assert profile.memory["peak_kb"] > 0 and profile.memory["lines"]
+
+
+@pytest.mark.django_db
+class TestCommand:
+
+    def test_reports_and_compares(self, tmp_path):
+        path = str(tmp_path / "baseline.json")
+        out = StringIO()
+        call_command("benchmark_views", books=40, repeat=1, only=["book_list", "book_detail"],
+                     baseline=path, write_baseline=True, stdout=out)
+        assert "Baseline 40-0 written" in out.getvalue()
+        assert not Book.objects.exists()  # rolled back
+
+        stored = json.loads(open(path).read())
+        stored["40-0"]["book_list"]["queries"] -= 1
+        open(path, "w").write(json.dumps(stored))
+        with pytest.raises(CommandError, match="book_list: .* queries, baseline"):
+            call_command("benchmark_views", books=40, repeat=1, only=["book_list"],
+                         baseline=path, stdout=StringIO())
+
+    def test_memory_regressions_are_profiled(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(benchmarks, "MEMORY_FLOOR_KB", 0)
+        path = tmp_path / "baseline.json"
+        path.write_text(json.dumps({"40-0": {"sitemap": {**RESULT, "ms": 1e6, "peak_kb": 0}}}))
+        out = StringIO()
+        with pytest.raises(CommandError, match="sitemap: peak .* KB, baseline 0 KB"):
+            call_command("benchmark_views", books=40, repeat=1, only=["sitemap"],
+                         baseline=str(path), memory_factor=1, stdout=out)
+        assert "sitemap: memory profile," in out.getvalue()
@@ -0,0 +1,104 @@
+"""
+Tests for booklibrary.utils.catalogue and the generate_catalogue command.
+"""
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.db.models import Count
+
+from booklibrary.models import Author, Book, BookInstance, SearchPosting
+from booklibrary.utils import fuzzy, owner_counts, typeahead
+
+from .conftest import UserFactory
+
+
+def _snapshot():
+    return [
+        (b.uniqueID, b.title, b.summary, b.publishedDate, b.language.name,
+         b.series.name if b.series else None,
+         sorted(a.full_name for a in b.authors.all()), sorted(g.name for g in b.genre.all()),
+         sorted(k.name for k in b.keywords.all()),
+         sorted((i.location.name, i.owner.username, i.status) for i in b.bookinstance_set.all()))
+        for b in Book.objects.order_by("uniqueID").select_related("language", "series")
+        .prefetch_related("authors", "genre", "keywords", "bookinstance_set__location",
+                          "bookinstance_set__owner")
+    ]
+
+
+@pytest.mark.django_db
+class TestGenerate:
+
+    def test_counts_and_shape(self, make_catalogue):
+        counts = make_catalogue(400, seed=3)
+        assert counts["books"] == Book.objects.count() == 400
+        assert counts["authors"] == Author.objects.count() == 100
+        assert counts["copies"] == BookInstance.objects.count() >= 400
+        assert counts["author_links"] == Book.authors.through.objects.count()
+        # Every book has an author, a genre and a copy; a minority are in a series.
+        assert not Book.objects.filter(authors=None).exists()
+        assert not Book.objects.filter(genre=None).exists()
+        assert not Book.objects.annotate(n=Count("bookinstance")).filter(n=0).exists()
+        assert 60 < Book.objects.exclude(series=None).count() < 180
+        assert Book.objects.filter(language__name="English").count() > 300
+        busiest = Author.objects.annotate(n=Count("books")).order_by("-n").first()
+        assert busiest.n >= 10
+
+    def test_deterministic_for_a_seed(self, make_catalogue):
+        with transaction.atomic():
+            make_catalogue(150, seed=7)
+            first = _snapshot()
+            transaction.set_rollback(True)
+        make_catalogue(150, seed=7)
+        assert _snapshot() == first
+        assert first[0][0] == "synthetic-7-0"
+
+    def test_seed_used_once(self, make_catalogue):
+        make_catalogue(10, seed=1)
+        with pytest.raises(ValueError):
+            make_catalogue(10, seed=1)
+        assert make_catalogue(10, seed=2)["books"] == 10
+
+    def test_given_owners_and_index(self, make_catalogue):
+        owner = UserFactory()
+        make_catalogue(50, owners=[owner], index=True)
+        assert set(BookInstance.objects.values_list("owner", flat=True)) == {owner.pk}
+        book = Book.objects.first()
+        assert SearchPosting.objects.filter(kind=SearchPosting.BOOK, object_id=book.pk).exists()
+        assert book.pk in [pk for pk, _ in fuzzy.search_books(book.title)]
+
+    def test_typeahead_reloads_after_commit(self, make_catalogue, django_capture_on_commit_callbacks):
+        typeahead.suggest("a")  # load the index before the catalogue exists
+        with django_capture_on_commit_callbacks(execute=True):
+            make_catalogue(30)
+        title = Book.objects.first().title
+        assert any(s["text"] == title for s in typeahead.suggest(title, kinds=["book"], limit=50))
+
+    def test_owner_counts_invalidated_after_commit(self, make_catalogue,
+                                                  django_capture_on_commit_callbacks):
+        owner = UserFactory()
+        assert owner_counts.get(owner.pk)["copies"] == 0
+        with django_capture_on_commit_callbacks(execute=True):
+            make_catalogue(30, owners=[owner])
+        assert owner_counts.get(owner.pk)["copies"] == BookInstance.objects.count()
+
+
+@pytest.mark.django_db
+class TestCommand:
+
+    def test_generates_and_reports(self):
+        out = StringIO()
+        call_command("generate_catalogue", books=20, seed=4, stdout=out)
+        assert out.getvalue().startswith("Generated 20 books, 5 authors and ")
+        assert Book.objects.filter(uniqueID__startswith="synthetic-4-").count() == 20
+
+    def test_unknown_owner(self):
+        with pytest.raises(CommandError, match="No such user: nobody"):
+            call_command("generate_catalogue", books=5, owner=["nobody"])
+
+    def test_repeated_seed(self):
+        call_command("generate_catalogue", books=5, seed=9, stdout=StringIO())
+        with pytest.raises(CommandError, match="seed 9 already exists"):
+            call_command("generate_catalogue", books=5, seed=9, stdout=StringIO())
@@ -0,0 +1,121 @@
+"""
+Unit tests for booklibrary.utils.facets.
+
+The autouse clear_cache fixture empties the facet and lookup caches around
+every test.  TestFacetsAtScale checks FACET_TIME_BUDGET against a
+100,000-book synthetic catalogue (about 15 seconds).
+"""
+import time
+
+import pytest
+from datetime import date
+from unittest.mock import patch
+
+from django.db import connection
+
+from booklibrary.models import Book
+from booklibrary.utils import facets, lookup_cache
+
+from .conftest import BookFactory, BookInstanceFactory, GenreFactory, LocationFactory
+
+
+@pytest.mark.django_db
+class TestFacets:
+
+    def test_counts_each_facet(self):
+        poetry, drama = GenreFactory(name="Poetry"), GenreFactory(name="Drama")
+        attic = LocationFactory(name="Attic")
+        odes = BookFactory(genre=[poetry, drama], publishedDate=date(1995, 5, 1))
+        BookFactory(genre=[poetry], publishedDate=date(2004, 1, 1))
+        BookInstanceFactory.create_batch(2, book=odes, location=attic, status="o")
+
+        counts = facets.compute(Book.objects.all())
+        assert counts["genre"] == [(poetry.pk, "Poetry", 2), (drama.pk, "Drama", 1)]
+        assert counts["location"] == [(attic.pk, "Attic", 1)]   # books, not copies
+        assert counts["status"] == [("o", "On loan", 1)]
+        assert counts["decade"] == [(2000, "2000s", 1), (1990, "1990s", 1)]
+        assert counts["language"][0][2] == 2
+
+    def test_counts_only_the_result_set(self):
+        poetry = GenreFactory(name="Poetry")
+        BookFactory(title="Odes", genre=[poetry])
+        BookFactory(title="Dune", genre=[GenreFactory(name="SF")])
+        counts = facets.compute(Book.objects.filter(title="Odes"))
+        assert counts["genre"] == [(poetry.pk, "Poetry", 1)]
+
+    def test_bounded_queries_then_cached(self, django_assert_num_queries):
+        for _ in range(3):
+            BookInstanceFactory(book=BookFactory(genre=[GenreFactory()]))
+        lookup_cache.clear()
+        # One grouped query per facet, plus genre, language, series and
+        # location names each loaded once into lookup_cache.
+        with django_assert_num_queries(len(facets.FACETS) + 4):
+            facets.compute(Book.objects.filter(title__startswith="Book"))
+        with django_assert_num_queries(0):
+            facets.compute(Book.objects.filter(title__startswith="Book"))
+
+    def test_time_budget_drops_remaining_facets(self):
+        BookFactory()
+        with patch.object(facets, "TIME_BUDGET", -1):
+            assert facets.compute(Book.objects.all()) == {}
+
+    def test_partial_counts_cached_briefly(self):
+        BookFactory()
+        with patch.object(facets, "TIME_BUDGET", -1), \
+                patch.object(facets, "PARTIAL_CACHE_TIMEOUT", 0):
+            facets.compute(Book.objects.all())
+        assert list(facets.compute(Book.objects.all())) == list(facets.FACETS)
+
+    def test_apply_filters_and_ignores_invalid(self):
+        poetry = GenreFactory(name="Poetry")
+        attic = LocationFactory()
+        odes = BookFactory(genre=[poetry], publishedDate=date(1995, 1, 1))
+        BookInstanceFactory(book=odes, location=attic)
+        BookFactory(publishedDate=date(2004, 1, 1))
+
+        qs, selected = facets.apply(Book.objects.all(), {
+            "genre": str(poetry.pk), "location": str(attic.pk), "decade": "1990", "series": "x",
+        })
+        assert list(qs) == [odes]
+        assert selected == {"genre": str(poetry.pk), "location": str(attic.pk), "decade": "1990"}
+
+    def test_slow_facet_query_is_cut_off_at_the_budget(self):
+        BookFactory()
+
+        def slow(books):
+            # Counts to 10**8, many seconds on any machine.
+            with connection.cursor() as cursor:
+                cursor.execute("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n)"
+                               " SELECT COUNT(*) FROM (SELECT i FROM n LIMIT 100000000)")
+            return []
+
+        with patch.dict(facets._COUNTERS, language=slow), patch.object(facets, "TIME_BUDGET", 0.2):
+            start = time.perf_counter()
+            found = facets.compute(Book.objects.all())
+            elapsed = time.perf_counter() - start
+        assert list(found) == ["genre"]
+        assert elapsed < 1
+
+
+@pytest.mark.django_db
+class TestFacetsAtScale:
+
+    def test_time_budget_holds_for_a_large_catalogue(self, make_catalogue):
+        make_catalogue(100_000)
+        books = Book.objects.filter(title__icontains="a")
+
+        def timed(name):
+            start = time.perf_counter()
+            facets._COUNTERS[name](books.order_by().values("pk"))
+            return time.perf_counter() - start
+
+        # With a budget of the slowest facet, some facets must be left out,
+        # and the facet running at the deadline is cut off there.
+        slowest = max(timed(name) for name in facets.FACETS)
+        with patch.object(facets, "TIME_BUDGET", slowest):
+            start = time.perf_counter()
+            found = facets.compute(books)
+            elapsed = time.perf_counter() - start
+        assert 0 < len(found) < len(facets.FACETS)
+        assert list(found) == list(facets.FACETS[:len(found)])
+        assert elapsed < 2.5 * slowest
@@ -1,5 +1,6 @@
 """
-Form tests for SearchForm and AddForm.
+Form tests for SearchForm, AddForm, BulkAddForm, BookForm and the
+autocomplete widgets.
 
 AddForm uses ModelMultipleChoiceField / ModelChoiceField for its four
 user-facing choice fields, so those fields reflect live DB state.
@@ -8,7 +9,17 @@ optional fields, so forms can still be valid).
 """
 import pytest
 from django import forms as django_forms
-from booklibrary.forms import SearchForm, AddForm
+from booklibrary.forms import SearchForm, AddForm, BookForm, BulkAddForm
+
+from .conftest import (
+    AuthorFactory,
+    BookFactory,
+    GenreFactory,
+    KeywordsFactory,
+    LanguageFactory,
+    LocationFactory,
+    SeriesFactory,
+)
 
 
 # ── SearchForm ────────────────────────────────────────────────────────────────
@@ -44,6 +55,15 @@ class TestSearchForm:
         widget_attrs = SearchForm().fields["search"].widget.attrs
         assert "form-control" in widget_attrs.get("class", "")
 
+    def test_page_is_optional(self):
+        form = SearchForm(data={"search": "Dune"})
+        assert form.is_valid()
+        assert form.cleaned_data["page"] is None
+
+    def test_page_must_be_positive(self):
+        assert not SearchForm(data={"search": "Dune", "page": "0"}).is_valid()
+        assert SearchForm(data={"search": "Dune", "page": "2"}).is_valid()
+
     def test_long_search_term_is_valid(self):
         form = SearchForm(data={"search": "a" * 500})
         assert form.is_valid()
@@ -184,3 +204,97 @@ class TestAddFormStructure:
         form = AddForm(data=data)
         assert not form.is_valid()
         assert "uniqueID" in form.errors
+
+
+
+# ── BulkAddForm ───────────────────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestBulkAddForm:
+
+    def test_indices_coerced_to_int(self):
+        form = BulkAddForm(data={"book_indices": ["0", "2"]}, num_results=3)
+        assert form.is_valid()
+        assert form.cleaned_data["book_indices"] == [0, 2]
+
+    def test_index_out_of_range_invalid(self):
+        form = BulkAddForm(data={"book_indices": ["3"]}, num_results=3)
+        assert not form.is_valid()
+        assert "book_indices" in form.errors
+
+    def test_selection_required(self):
+        form = BulkAddForm(data={}, num_results=3)
+        assert not form.is_valid()
+        assert form.errors["book_indices"] == ["Select at least one book to add."]
+
+    def test_shared_choices_validated(self):
+        genre = GenreFactory()
+        location = LocationFactory()
+        form = BulkAddForm(
+            data={
+                "bulk-book_indices": ["1"],
+                "bulk-book_genre": [str(genre.pk)],
+                "bulk-book_location": str(location.pk),
+            },
+            prefix="bulk", num_results=2,
+        )
+        assert form.is_valid()
+        assert list(form.cleaned_data["book_genre"]) == [genre]
+        assert form.cleaned_data["book_location"] == location
+
+
+# ── Autocomplete widgets ──────────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestAutocompleteWidgets:
+
+    def test_only_selected_genre_rendered(self):
+        genres = [GenreFactory() for _ in range(5)]
+        html = str(AddForm(initial={"book_genre": [genres[2].pk]})["book_genre"])
+        assert html.count("<option") == 1
+        assert genres[2].name in html
+        assert "/booklibrary/autocomplete/genre/" in html
+        assert "js-autocomplete" in html
+
+    def test_single_select_keeps_empty_option(self):
+        location = LocationFactory()
+        LocationFactory()
+        html = str(AddForm(initial={"book_location": location})["book_location"])
+        assert html.count("<option") == 2
+        assert "select location" in html
+        assert f'value="{location.pk}" selected' in html
+
+    def test_nothing_selected_renders_no_rows(self):
+        GenreFactory()
+        assert "<option" not in str(AddForm()["book_genre"])
+
+    def test_invalid_submitted_value_ignored_when_rendering(self):
+        form = AddForm(data={"book_genre": ["abc"]})
+        assert "<option" not in str(form["book_genre"])
+
+    def test_media_includes_script(self):
+        assert "booklibrary/js/autocomplete.js" in str(AddForm().media)
+
+    def test_book_form_renders_only_the_books_authors(self):
+        for _ in range(30):
+            AuthorFactory()
+        author = AuthorFactory(first_name="Frank", last_name="Herbert")
+        book = BookFactory()
+        book.authors.set([author])
+        form = BookForm(instance=book)
+        html = str(form["authors"])
+        assert html.count("<option") == 1
+        assert "Herbert, Frank" in html
+        assert "/booklibrary/autocomplete/author/" in html
+
+    def test_book_form_saves_submitted_authors(self):
+        author = AuthorFactory()
+        book = BookFactory()
+        form = BookForm(instance=book, data={
+            "title": book.title, "authors": [author.pk], "summary": "s",
+            "genre": [GenreFactory().pk], "keywords": [KeywordsFactory().pk],
+            "language": LanguageFactory().pk, "series": SeriesFactory().pk,
+        })
+        assert form.is_valid(), form.errors
+        form.save()
+        assert list(book.authors.all()) == [author]
@@ -0,0 +1,105 @@
+"""
+Unit tests for booklibrary.utils.fuzzy and its management commands.
+"""
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from booklibrary.models import SearchPosting, SearchWord
+from booklibrary.utils import fuzzy
+
+from .conftest import AuthorFactory, BookFactory
+
+
+def _books(text):
+    return [pk for pk, _ in fuzzy.search_books(text)]
+
+
+class TestTrigrams:
+
+    def test_padded_like_pg_trgm(self):
+        assert fuzzy.trigrams("cat") == {"__c", "_ca", "cat", "at_"}
+
+    def test_words_are_normalised(self):
+        assert fuzzy._words("Dostoévsky's  DOSTOÉVSKY, 1984") == ["dostoevsky", "s", "1984"]
+
+
+@pytest.mark.django_db
+class TestSearch:
+
+    def test_misspelt_author_finds_their_books(self):
+        tolkien = AuthorFactory(first_name="J. R. R.", last_name="Tolkien", full_name="J. R. R. Tolkien")
+        hobbit = BookFactory(title="The Hobbit", authors=[tolkien])
+        BookFactory(title="Dune")
+        fuzzy.rebuild()
+        assert _books("Tolkein") == [hobbit.pk]
+
+    def test_transliterated_title(self):
+        karamazov = BookFactory(title="The Brothers Karamazov")
+        BookFactory(title="Brothers in Arms")
+        fuzzy.rebuild()
+        assert _books("brothers karamasov")[0] == karamazov.pk
+        assert fuzzy.search(SearchPosting.BOOK, "Karamazof")[0][0] == karamazov.pk
+
+    def test_closer_match_ranks_first(self):
+        dostoevsky = AuthorFactory(first_name="Fyodor", last_name="Dostoevsky", full_name="Fyodor Dostoevsky")
+        BookFactory(title="Crime and Punishment", authors=[dostoevsky])
+        AuthorFactory(first_name="Leo", last_name="Tolstoy", full_name="Leo Tolstoy")
+        fuzzy.rebuild()
+        results = fuzzy.search(SearchPosting.AUTHOR, "Dostoyevsky")
+        assert [pk for pk, _ in results] == [dostoevsky.pk]
+        assert 0.3 <= results[0][1] < 1
+
+    def test_nothing_similar(self):
+        BookFactory(title="The Hobbit")
+        fuzzy.rebuild()
+        assert _books("zzyzx") == []
+        assert _books("   ") == []
+
+    def test_query_cost_does_not_grow_with_catalogue(self, django_assert_num_queries):
+        for n in range(30):
+            BookFactory(title=f"Winter Garden {n}")
+        fuzzy.rebuild()
+        # One query per word to correct it, one to rank titles, and the same
+        # again for author names.
+        with django_assert_num_queries(6):
+            fuzzy.search_books("wintre gardn")
+
+
+@pytest.mark.django_db
+class TestIndexMaintenance:
+
+    def test_save_and_delete_update_the_index(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            book = BookFactory(title="Neuromancer")
+        assert _books("Neuromancr") == [book.pk]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            book.title = "Count Zero"
+            book.save()
+        assert _books("Neuromancr") == []
+        assert _books("Cuont Zero") == [book.pk]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            book.delete()
+        assert not SearchPosting.objects.filter(kind=SearchPosting.BOOK, object_id=book.pk).exists()
+
+    def test_unrelated_update_fields_skip_reindexing(self, django_capture_on_commit_callbacks):
+        book = BookFactory(title="Neuromancer")
+        with django_capture_on_commit_callbacks() as callbacks:
+            book.save(update_fields=["publisher"])
+        assert callbacks == []
+
+    def test_rebuild_command(self):
+        BookFactory(title="Solaris")
+        out = StringIO()
+        call_command("rebuild_fuzzy_index", stdout=out)
+        assert "postings" in out.getvalue()
+        assert SearchWord.objects.filter(word="solaris").exists()
+
+    def test_benchmark_command_rolls_back(self):
+        out = StringIO()
+        call_command("benchmark_fuzzy", titles=200, queries=5, stdout=out)
+        assert "p50" in out.getvalue()
+        assert not SearchPosting.objects.exists()
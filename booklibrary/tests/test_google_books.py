@@ -1,18 +1,23 @@
 """
 Unit tests for booklibrary/utils/google_books.py.
 
-All HTTP calls are mocked so these tests run offline.
+All HTTP calls are mocked so these tests run offline.  Tests touching the
+local GoogleVolume table are marked django_db.
 """
 import pytest
 from unittest.mock import MagicMock, patch
 
+from booklibrary.models import GoogleVolume
 from booklibrary.utils.google_books import (
     GoogleBooksAuthError,
     GoogleBooksBadRequest,
     GoogleBooksError,
     GoogleBooksQuotaError,
     _map_error,
+    _store_volumes,
+    get_volume,
     search_books,
+    search_cached_volumes,
 )
 
 
@@ -310,3 +315,109 @@ class TestSearchBooks:
         search_books("test")
         _, kwargs = mock_get.call_args
         assert kwargs.get("timeout") == 5
+
+    @patch("booklibrary.utils.google_books.requests.get")
+    def test_isbns_captured(self, mock_get):
+        volume = _make_volume()
+        volume["volumeInfo"]["industryIdentifiers"] = [
+            {"type": "ISBN_10", "identifier": "0441013597"},
+            {"type": "ISBN_13", "identifier": "9780441013593"},
+        ]
+        mock_get.return_value = _mock_response(200, {"items": [volume], "totalItems": 1})
+
+        results, _ = search_books("test")
+        assert results[0]["isbn_10"] == "0441013597"
+        assert results[0]["isbn_13"] == "9780441013593"
+
+    @patch("booklibrary.utils.google_books.requests.get")
+    def test_results_stored_in_volume_table(self, mock_get):
+        volume = _make_volume(title="Dune", volume_id="dune-1")
+        mock_get.return_value = _mock_response(200, {"items": [volume], "totalItems": 1})
+
+        search_books("Dune")
+        stored = GoogleVolume.objects.get(pk="dune-1")
+        assert stored.data == volume
+
+    @patch("booklibrary.utils.google_books.requests.get")
+    def test_repeat_search_refreshes_stored_volume(self, mock_get):
+        mock_get.return_value = _mock_response(
+            200, {"items": [_make_volume(title="Old", volume_id="v1")], "totalItems": 1})
+        search_books("test")
+        mock_get.return_value = _mock_response(
+            200, {"items": [_make_volume(title="New", volume_id="v1")], "totalItems": 1})
+        search_books("test")
+
+        assert GoogleVolume.objects.count() == 1
+        assert GoogleVolume.objects.get(pk="v1").data["volumeInfo"]["title"] == "New"
+
+
+# ── get_volume ────────────────────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestGetVolume:
+
+    @patch("booklibrary.utils.google_books.requests.get")
+    def test_stored_volume_served_without_http(self, mock_get):
+        _store_volumes([_make_volume(title="Dune", volume_id="dune-1")])
+
+        book = get_volume("dune-1")
+        assert book["title"] == "Dune"
+        mock_get.assert_not_called()
+
+    @patch("booklibrary.utils.google_books.requests.get")
+    def test_unknown_volume_fetched_and_stored(self, mock_get):
+        mock_get.return_value = _mock_response(
+            200, _make_volume(title="Emma", volume_id="emma-1"),
+            url=f"{_GOOGLEAPIS_URL}/emma-1")
+
+        book = get_volume("emma-1")
+        assert book["title"] == "Emma"
+        assert mock_get.call_args[0][0] == f"{_GOOGLEAPIS_URL}/emma-1"
+        assert GoogleVolume.objects.filter(pk="emma-1").exists()
+
+    @patch("booklibrary.utils.google_books.requests.get")
+    def test_refresh_bypasses_stored_volume(self, mock_get):
+        _store_volumes([_make_volume(title="Old", volume_id="v1")])
+        mock_get.return_value = _mock_response(
+            200, _make_volume(title="New", volume_id="v1"), url=f"{_GOOGLEAPIS_URL}/v1")
+
+        assert get_volume("v1", refresh=True)["title"] == "New"
+
+    @patch("booklibrary.utils.google_books.requests.get")
+    def test_missing_volume_raises_bad_request(self, mock_get):
+        mock_get.return_value = _mock_response(404, {"error": {"message": "not found"}})
+        with pytest.raises(GoogleBooksBadRequest):
+            get_volume("nope")
+
+
+# ── search_cached_volumes ─────────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestSearchCachedVolumes:
+
+    def test_matches_all_title_words(self):
+        _store_volumes([
+            _make_volume(title="The Lord of the Rings", volume_id="lotr"),
+            _make_volume(title="The Hobbit", volume_id="hobbit"),
+        ])
+        results, total = search_cached_volumes("lord rings")
+        assert total == 1
+        assert results[0]["volume_id"] == "lotr"
+
+    def test_google_prefixes_ignored(self):
+        _store_volumes([_make_volume(title="The Hobbit", volume_id="hobbit")])
+        results, _ = search_cached_volumes("intitle:hobbit")
+        assert [b["volume_id"] for b in results] == ["hobbit"]
+
+    def test_isbn_lookup(self):
+        volume = _make_volume(title="Dune", volume_id="dune-1")
+        volume["volumeInfo"]["industryIdentifiers"] = [
+            {"type": "ISBN_13", "identifier": "9780441013593"},
+        ]
+        _store_volumes([volume, _make_volume(title="Other", volume_id="other")])
+        results, total = search_cached_volumes("isbn:978-0441013593")
+        assert total == 1
+        assert results[0]["volume_id"] == "dune-1"
+
+    def test_no_match_returns_empty(self):
+        assert search_cached_volumes("anything") == ([], 0)
@@ -0,0 +1,188 @@
+"""
+Tests for booklibrary.utils.loadtest and the loadtest command.
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+
+from booklibrary.models import Book, BookInstance
+from booklibrary.utils import benchmarks, catalogue, loadtest
+from booklibrary.utils.standin import StandInServer
+
+from .conftest import UserFactory
+
+User = get_user_model()
+
+
+class TestSummaries:
+
+    def test_nearest_rank_percentiles(self):
+        values = list(range(1, 101))
+        assert loadtest.percentile(values, 50) == 50
+        assert loadtest.percentile(values, 99) == 99
+        assert loadtest.percentile([7], 90) == 7
+
+    def test_per_endpoint_and_total(self):
+        records = [("browse", 10.0, True), ("browse", 30.0, True), ("add_book", 200.0, False)]
+        stage = loadtest.summarise(2, 2.0, records)
+        assert stage["endpoints"]["browse"] == {
+            "count": 2, "errors": 0, "rps": 1.0, "p50": 10.0, "p90": 30.0, "p99": 30.0, "max": 30.0}
+        assert stage["endpoints"]["add_book"]["errors"] == 1
+        assert stage["total"]["count"] == 3 and stage["total"]["max"] == 200.0
+        text = loadtest.report([stage])
+        assert text.startswith("2 users, 2.0 s")
+        assert [line.split()[0] for line in text.splitlines()[2:5]] == ["add_book", "browse", "total"]
+
+
+class TestForms:
+
+    def test_fields_a_browser_would_submit(self):
+        html = """
+        <form method="post" action="/save/">
+          <input type="hidden" name="csrfmiddlewaretoken" value="t">
+          <input name="title" value="Dune &amp; more">
+          <input type="checkbox" name="keep" value="1">
+          <input type="checkbox" name="tick" value="1" checked>
+          <select name="status"><option value="a">A</option><option value="r" selected>R</option></select>
+          <select name="location"><option value="">--</option><option value="3">Shelf</option></select>
+          <textarea name="notes">Hello</textarea>
+          <input type="submit" value="Save">
+        </form>
+        <input type="checkbox" form="other" name="outside" value="1" checked>
+        <form><input name="q"></form>
+        """
+        first, second = loadtest.forms(html)
+        assert first["method"] == "post" and first["action"] == "/save/"
+        assert first["fields"] == {"csrfmiddlewaretoken": "t", "title": "Dune & more", "tick": "1",
+                                   "status": "r", "location": "", "notes": "Hello"}
+        assert first["options"]["location"] == ["", "3"]
+        assert second == {"action": "", "method": "get", "fields": {"q": ""}, "options": {}}
+
+    def test_stand_in_volumes_are_new_every_search(self):
+        one, two = loadtest.google_volumes({"q": "dune"}), loadtest.google_volumes({"q": "dune"})
+        assert one["items"][0]["volumeInfo"]["title"] == "dune 0"
+        assert one["items"][0]["id"] != two["items"][0]["id"]
+
+
+class TestRamp:
+
+    def test_one_stage_per_user_count(self):
+        # Any HTTP server will do for browsing; the stand-in answers with JSON.
+        with StandInServer({}) as server:
+            stages = loadtest.run(server.url, users=(1, 3), seconds=0.3, mix={"browse": 1})
+        assert [stage["users"] for stage in stages] == [1, 3]
+        assert all(stage["endpoints"]["browse"]["errors"] == 0 for stage in stages)
+        assert len({path for path, _ in server.requests}) == 1
+
+    def test_failures_are_counted(self):
+        with StandInServer({}, status=500) as server:
+            stage, = loadtest.run(server.url, users=(2,), seconds=0.2, mix={"browse": 1})
+        assert stage["total"]["errors"] == stage["total"]["count"] > 0
+
+
+class _DroppingHandler(BaseHTTPRequestHandler):
+    """Serves search results with an add form, then drops the connection on the add."""
+
+    def do_GET(self):
+        self._page('<form method="post" action=""><input name="search"></form>')
+
+    def do_POST(self):
+        add_url = reverse("booklibrary:book-add")
+        if self.path == add_url:
+            self.close_connection = True  # no response at all
+            return
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self._page(f'<form method="post" action="{add_url}"><input name="book_index" value="0"></form>')
+
+    def _page(self, body):
+        body = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestDroppedConnections:
+
+    def test_failed_add_does_not_end_the_user(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _DroppingHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            stage = loadtest._stage(f"http://127.0.0.1:{server.server_port}", 1, 0.5,
+                                    {"add": 1}, 0, None, 0)
+        finally:
+            server.shutdown()
+            server.server_close()
+        adds = stage["endpoints"]["add_book"]
+        assert adds["count"] > 1 and adds["errors"] == adds["count"]
+        assert stage["endpoints"]["google_search"]["errors"] == 0
+
+# serve() gives each request thread its own connection to the test database;
+# SQLite's locking keeps these to a single user.
+@pytest.mark.django_db(transaction=True)
+class TestRun:
+
+    @pytest.fixture
+    def url(self):
+        with loadtest.serve() as url:
+            yield url
+
+    @pytest.fixture
+    def user(self):
+        user = UserFactory()
+        user.set_password("secret")
+        user.save()
+        catalogue.generate(60, owners=[user])
+        return user
+
+    def test_every_action_without_errors(self, url, user):
+        with benchmarks.google_stand_in(loadtest.google_volumes):
+            stages = loadtest.run(url, users=(1,), seconds=3,
+                                  mix={**dict.fromkeys(loadtest.MIX, 1), "add": 2, "edit": 3},
+                                  username=user.username, password="secret")
+        seen = set().union(*(stage["endpoints"] for stage in stages))
+        assert {"browse", "search_form", "google_search", "add_book", "edit_save"} <= seen
+        assert sum(stage["total"]["errors"] for stage in stages) == 0
+        assert Book.objects.filter(uniqueID__startswith="loadtest-").exists()
+        assert BookInstance.objects.filter(owner=user, book__uniqueID__startswith="loadtest-").exists()
+
+    def test_anonymous_users_only_read(self, url, user):
+        books = Book.objects.count()
+        stages = loadtest.run(url, users=(1,), seconds=0.5,
+                              mix={"browse": 1, "detail": 1, "add": 5, "edit": 5})
+        assert set(stages[0]["endpoints"]) <= {"browse", "book_detail", "author_detail",
+                                               "location_detail"}
+        assert Book.objects.count() == books
+
+    def test_bad_login_is_reported(self, url, user):
+        with pytest.raises(RuntimeError, match="Could not log in"):
+            loadtest.run(url, users=(1,), seconds=5,
+                         username=user.username, password="wrong")
+
+
+@pytest.mark.django_db(transaction=True)
+class TestCommand:
+
+    def test_serve_as_a_temporary_user(self):
+        catalogue.generate(30)
+        out = StringIO()
+        call_command("loadtest", "--serve", "--users", "1", "--seconds", "1",
+                     "--mix", "browse=1,google=1,add=1", stdout=out)
+        text = out.getvalue()
+        assert "as loadtest-" in text and "1 users, " in text and "add_book" in text
+        assert not User.objects.filter(username__startswith="loadtest-").exists()
+        assert not BookInstance.objects.filter(book__uniqueID__startswith="loadtest-").exists()
+
+    def test_bad_mix(self):
+        with pytest.raises(CommandError, match="Unknown action: sleep"):
+            call_command("loadtest", "--url", "http://127.0.0.1:1", "--mix", "sleep=1")
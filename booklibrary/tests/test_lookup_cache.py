@@ -0,0 +1,77 @@
+"""
+Unit tests for booklibrary.utils.lookup_cache.
+
+The autouse clear_cache fixture empties the cache around every test.  Rows
+created by a test are written inside the test's transaction, so tests that
+expect the cache to be filled call lookup_cache.clear() after creating them.
+"""
+import pytest
+from unittest.mock import patch
+
+from booklibrary.models import Genre, Location
+from booklibrary.services import resolve_names
+from booklibrary.utils import lookup_cache
+
+from .conftest import GenreFactory, LocationFactory
+
+
+@pytest.mark.django_db
+class TestLookupCache:
+
+    def test_table_loaded_once(self, django_assert_num_queries):
+        GenreFactory(name="Poetry")
+        lookup_cache.clear()
+        with django_assert_num_queries(1):
+            lookup_cache.get_all(Genre)
+            lookup_cache.get_all(Genre)
+            lookup_cache.get_by_name(Genre, "poetry")
+
+    def test_get_by_pk(self):
+        location = LocationFactory()
+        assert lookup_cache.get(Location, location.pk) == location
+        assert lookup_cache.get(Location, str(location.pk)) == location
+
+    def test_get_missing_or_malformed_pk_returns_none(self):
+        assert lookup_cache.get(Location, 99999) is None
+        assert lookup_cache.get(Location, "not-a-pk") is None
+
+    def test_get_by_name_ignores_case(self):
+        genre = GenreFactory(name="Science Fiction")
+        assert lookup_cache.get_by_name(Genre, "science FICTION") == genre
+        assert lookup_cache.get_by_name(Genre, "Westerns") is None
+
+    def test_save_invalidates(self):
+        lookup_cache.get_all(Genre)
+        genre = GenreFactory(name="Horror")
+        assert genre in lookup_cache.get_all(Genre)
+
+    def test_delete_invalidates(self):
+        genre = GenreFactory(name="Horror")
+        lookup_cache.clear()
+        lookup_cache.get_all(Genre)
+        genre.delete()
+        assert lookup_cache.get_by_name(Genre, "Horror") is None
+
+    def test_bulk_insert_by_resolve_names_invalidates(self):
+        lookup_cache.get_all(Genre)
+        resolve_names(Genre, ["Travel"])
+        assert lookup_cache.get_by_name(Genre, "travel") is not None
+
+    def test_rows_changed_in_open_transaction_are_not_cached(self, django_assert_num_queries):
+        GenreFactory(name="Horror")
+        with django_assert_num_queries(2):
+            lookup_cache.get_all(Genre)
+            lookup_cache.get_all(Genre)
+
+    def test_commit_allows_caching_again(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            GenreFactory(name="Horror")
+        lookup_cache.get_all(Genre)
+        assert Genre in lookup_cache._tables
+
+    def test_expired_table_reloaded(self, django_assert_num_queries):
+        lookup_cache.clear()
+        with patch.object(lookup_cache, "CACHE_TIMEOUT", 0):
+            with django_assert_num_queries(2):
+                lookup_cache.get_all(Genre)
+                lookup_cache.get_all(Genre)
@@ -0,0 +1,170 @@
+"""
+Tests for booklibrary.utils.metrics, MetricsMiddleware and the /metrics view.
+"""
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+import requests
+from django.conf import settings
+
+from booklibrary.utils import google_books, metrics, search_cache
+
+from .conftest import BookFactory, UserFactory
+
+METERED_MIDDLEWARE = ["booklibrary.middleware.MetricsMiddleware", *settings.MIDDLEWARE]
+
+
+@pytest.fixture(autouse=True)
+def empty_registry():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def _lines(text, prefix):
+    return [line for line in text.splitlines() if line.startswith(prefix)]
+
+
+class TestRegistry:
+
+    def test_counter_and_histogram_exposition(self):
+        calls = metrics.counter("test_calls_total", "Calls.", ["kind"])
+        calls.inc(kind="a")
+        calls.inc(2, kind='b"q')
+        latency = metrics.histogram("test_latency_seconds", "Latency.", buckets=(0.1, 1))
+        for value in (0.05, 0.5, 5):
+            latency.observe(value)
+
+        text = metrics.render()
+        assert "# TYPE test_calls_total counter" in text
+        assert _lines(text, "test_calls_total{") == [
+            'test_calls_total{kind="a"} 1', 'test_calls_total{kind="b\\"q"} 2']
+        assert _lines(text, "test_latency_seconds") == [
+            'test_latency_seconds_bucket{le="0.1"} 1',
+            'test_latency_seconds_bucket{le="1"} 2',
+            'test_latency_seconds_bucket{le="+Inf"} 3',
+            "test_latency_seconds_sum 5.55",
+            "test_latency_seconds_count 3",
+        ]
+
+    def test_registering_twice_returns_the_same_metric(self):
+        assert metrics.counter("test_same_total", "x") is metrics.counter("test_same_total", "x")
+
+    def test_directory_mode_sums_every_process(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+        monkeypatch.setattr(metrics, "_snapshot_path", None)
+        metrics.counter("test_shared_total", "Shared.", ["kind"]).inc(3, kind="a")
+        metrics.histogram("test_shared_seconds", "Shared.", buckets=(1,)).observe(0.5)
+        # Another worker's snapshot, as flush() would have written it.
+        (tmp_path / "metrics-99999-1.json").write_text(json.dumps({
+            "test_shared_total": {"kind": "counter", "documentation": "Shared.", "labels": ["kind"],
+                                  "buckets": [], "values": [[["a"], 4], [["b"], 1]]},
+            "test_shared_seconds": {"kind": "histogram", "documentation": "Shared.", "labels": [],
+                                    "buckets": [1], "values": [[[], [0, 1, 2.0]]]},
+        }))
+
+        text = metrics.render()
+        assert _lines(text, "test_shared_total{") == [
+            'test_shared_total{kind="a"} 7', 'test_shared_total{kind="b"} 1']
+        assert 'test_shared_seconds_bucket{le="+Inf"} 2' in text
+        assert "test_shared_seconds_sum 2.5" in text
+        assert len(list(tmp_path.glob("metrics-*.json"))) == 2
+
+    def test_exited_workers_folded_into_one_snapshot(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+        monkeypatch.setattr(metrics, "_snapshot_path", None)
+        metrics.counter("test_retired_total", "Retired.").inc()
+
+        def exited_worker(count):
+            worker = subprocess.Popen([sys.executable, "-c", ""])
+            worker.wait()
+            (tmp_path / f"metrics-{metrics._HOST}-{worker.pid}-1.json").write_text(json.dumps({
+                "test_retired_total": {"kind": "counter", "documentation": "Retired.",
+                                       "labels": [], "buckets": [], "values": [[[], count]]},
+            }))
+
+        exited_worker(4)
+        exited_worker(5)
+        assert "test_retired_total 10" in metrics.render()
+        exited_worker(6)
+        assert "test_retired_total 16" in metrics.render()
+        assert "test_retired_total 16" in metrics.render()
+        assert sorted(path.name for path in tmp_path.glob("metrics-*.json")) == [
+            "metrics-retired.json", os.path.basename(metrics._snapshot_path)]
+
+
+class TestGoogleBooksMetrics:
+
+    @patch("booklibrary.utils.google_books.requests.get", side_effect=requests.ConnectionError)
+    def test_latency_and_errors_per_endpoint(self, mock_get):
+        with pytest.raises(google_books.GoogleBooksError):
+            google_books._get(google_books.BASE_URL, {})
+        text = metrics.render()
+        assert ('booklibrary_google_books_errors_total{endpoint="search",error="GoogleBooksError"} 1'
+                in text)
+        assert 'booklibrary_google_books_request_duration_seconds_count{endpoint="search"} 1' in text
+
+    def test_search_cache_hits_and_misses(self):
+        search_cache.get_results("dune", 10, 0)
+        search_cache.set_results("dune", 10, 0, ([], 0))
+        search_cache.get_results("dune", 10, 0)
+        text = metrics.render()
+        assert 'booklibrary_google_books_cache_total{cache="search",result="hit"} 1' in text
+        assert 'booklibrary_google_books_cache_total{cache="search",result="miss"} 1' in text
+
+
+@pytest.mark.django_db
+class TestMetricsMiddleware:
+
+    @pytest.fixture(autouse=True)
+    def metered(self, settings):
+        settings.METRICS = True
+        settings.MIDDLEWARE = METERED_MIDDLEWARE
+
+    def test_requests_recorded_by_url_name(self, client):
+        BookFactory()
+        client.get("/booklibrary/books/")
+        client.get("/booklibrary/no-such-page/")
+        text = metrics.render()
+        assert ('booklibrary_requests_total{view="booklibrary:books",method="GET",status="200"} 1'
+                in text)
+        assert 'booklibrary_requests_total{view="unresolved",method="GET",status="404"} 1' in text
+        assert ('booklibrary_request_duration_seconds_count{view="booklibrary:books",method="GET"} 1'
+                in text)
+        count = _lines(text, 'booklibrary_request_queries_bucket{view="booklibrary:books",le="+Inf"}')
+        assert count == ['booklibrary_request_queries_bucket{view="booklibrary:books",le="+Inf"} 1']
+
+    def test_session_cookie_size(self, client):
+        client.get("/booklibrary/")  # counts visits in the session
+        text = metrics.render()
+        assert "booklibrary_session_cookie_bytes_count 1" in text
+
+
+@pytest.mark.django_db
+class TestMetricsEndpoint:
+
+    def test_anonymous_users_are_sent_to_login(self, client):
+        response = client.get("/metrics")
+        assert response.status_code == 302
+        assert "/accounts/login/" in response["Location"]
+
+    def test_non_staff_forbidden(self, client):
+        client.force_login(UserFactory())
+        assert client.get("/metrics").status_code == 403
+
+    def test_staff_see_prometheus_text(self, client):
+        metrics.counter("test_visible_total", "Visible.").inc()
+        client.force_login(UserFactory(is_staff=True))
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert "test_visible_total 1" in response.content.decode()
+
+    def test_bearer_token(self, client, settings):
+        settings.METRICS_TOKEN = "s3cret"
+        assert client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret").status_code == 200
+        assert client.get("/metrics", HTTP_AUTHORIZATION="Bearer nope").status_code == 302
@@ -0,0 +1,93 @@
+"""
+Tests for booklibrary.middleware and the request timing in utils/timing.py.
+"""
+import logging
+from unittest.mock import patch
+
+import pytest
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.template import engines
+from django.template.loader import render_to_string
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from booklibrary.middleware import ServerTimingMiddleware
+from booklibrary.utils import google_books, providers, timing
+
+from .conftest import BookFactory
+
+TIMED_MIDDLEWARE = ["booklibrary.middleware.ServerTimingMiddleware", *settings.MIDDLEWARE]
+
+
+def _metrics(header):
+    """Parse a Server-Timing header into {name: {param: value}}."""
+    metrics = {}
+    for metric in header.split(","):
+        name, *params = metric.strip().split(";")
+        metrics[name] = dict(param.split("=", 1) for param in params)
+    return metrics
+
+
+class TestServerTimingMiddleware:
+
+    def test_off_by_default(self):
+        with pytest.raises(MiddlewareNotUsed):
+            ServerTimingMiddleware(lambda request: None)
+
+    @pytest.mark.django_db
+    @override_settings(SERVER_TIMING=True, MIDDLEWARE=TIMED_MIDDLEWARE)
+    def test_header_and_log_line(self, client, caplog):
+        BookFactory(title="Dune")
+        with caplog.at_level(logging.INFO, logger="booklibrary.middleware"):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get("/booklibrary/books/")
+
+        metrics = _metrics(response["Server-Timing"])
+        assert list(metrics) == ["db", "tpl", "total"]
+        assert metrics["db"]["desc"] == f'"{len(queries)} queries"'
+        assert 0 < float(metrics["tpl"]["dur"]) <= float(metrics["total"]["dur"])
+
+        record = next(r for r in caplog.records if r.name == "booklibrary.middleware")
+        assert record.timing["path"] == "/booklibrary/books/"
+        assert record.timing["status"] == 200
+        assert record.timing["queries"] == len(queries)
+        assert "total_ms=" in record.getMessage()
+
+    @pytest.mark.django_db
+    @override_settings(MIDDLEWARE=TIMED_MIDDLEWARE)
+    def test_no_header_when_off(self, client):
+        assert "Server-Timing" not in client.get("/booklibrary/books/")
+
+
+class TestTiming:
+
+    def test_timed_is_a_no_op_outside_a_request(self):
+        with timing.timed("google"):
+            pass
+        assert timing.current() is None
+
+    def test_nested_template_renders_count_once(self):
+        class Widget:
+            def __str__(self):
+                return render_to_string("misc/includes/pagination.html", {})
+
+        timing.instrument_templates()
+        timer, token = timing.start()
+        try:
+            engines["django"].from_string("{{ widget }}").render({"widget": Widget()})
+        finally:
+            timing.stop(token)
+        assert timer.spans["tpl"][1] == 1
+
+    @pytest.mark.django_db
+    @patch("booklibrary.utils.google_books._get", return_value={"items": [], "totalItems": 0})
+    def test_google_calls_in_fan_out_threads_are_counted(self, mock_get):
+        timer, token = timing.start()
+        try:
+            google_books.search_books("dune")
+            providers.fan_out_search([providers.GoogleBooksProvider()], "dune")
+        finally:
+            timing.stop(token)
+        assert timer.spans["google"][1] == 2
@@ -43,6 +43,16 @@ class TestGenre:
         genre = GenreFactory(name="Fantasy")
         assert str(genre) == "Fantasy"
 
+    def test_name_unique_ignoring_case(self):
+        GenreFactory(name="Fantasy")
+        with pytest.raises(IntegrityError):
+            Genre.objects.create(name="FANTASY")
+
+    def test_duplicate_name_fails_validation(self):
+        GenreFactory(name="Fantasy")
+        with pytest.raises(ValidationError, match="already exists"):
+            Genre(name="fantasy").validate_constraints()
+
     def test_name_max_length(self):
         genre = GenreFactory()
         max_length = genre._meta.get_field("name").max_length
@@ -262,6 +272,15 @@ class TestBook:
         book = BookFactory(uniqueID=None)
         assert book.uniqueID is None
 
+    def test_unique_id_is_unique(self):
+        BookFactory(uniqueID="vol-1")
+        with pytest.raises(IntegrityError):
+            BookFactory(uniqueID="vol-1")
+
+    def test_many_books_without_unique_id(self):
+        BookFactory(uniqueID=None)
+        BookFactory(uniqueID=None)
+
     def test_content_type_nullable(self):
         book = BookFactory(contentType=None)
         assert book.contentType is None
@@ -0,0 +1,70 @@
+"""
+Unit tests for booklibrary.utils.owner_counts and the signal handlers that
+invalidate it.  Invalidation runs on commit, so tests that change copies use
+django_capture_on_commit_callbacks(execute=True).
+"""
+import pytest
+
+from booklibrary.services import update_instances
+from booklibrary.models import BookInstance
+from booklibrary.utils import owner_counts
+
+from .conftest import BookFactory, BookInstanceFactory, LocationFactory
+
+
+@pytest.mark.django_db
+class TestOwnerCounts:
+
+    def test_counts_by_status_and_location(self, user, other_user):
+        attic, study = LocationFactory(name="Attic"), LocationFactory(name="Study")
+        book = BookFactory()
+        BookInstanceFactory(owner=user, book=book, location=attic, status="a")
+        BookInstanceFactory(owner=user, book=book, location=attic, status="o")
+        BookInstanceFactory(owner=user, location=study, status="a")
+        BookInstanceFactory(owner=other_user)
+        counts = owner_counts.get(user.pk)
+        assert counts["copies"] == 3
+        assert counts["books"] == 2
+        assert counts["by_status"] == [("a", "Available", 2), ("o", "On loan", 1)]
+        assert counts["by_location"] == [(attic.pk, 2), (study.pk, 1)]
+
+    def test_cached(self, user, django_assert_num_queries):
+        BookInstanceFactory(owner=user)
+        owner_counts.get(user.pk)
+        with django_assert_num_queries(0):
+            owner_counts.get(user.pk)
+
+    def test_save_invalidates(self, user, django_capture_on_commit_callbacks):
+        owner_counts.get(user.pk)
+        with django_capture_on_commit_callbacks(execute=True):
+            bi = BookInstanceFactory(owner=user)
+        assert owner_counts.get(user.pk)["copies"] == 1
+        with django_capture_on_commit_callbacks(execute=True):
+            bi.delete()
+        assert owner_counts.get(user.pk)["copies"] == 0
+
+    def test_changing_owner_invalidates_both(self, user, other_user,
+                                             django_capture_on_commit_callbacks):
+        bi = BookInstanceFactory(owner=user)
+        owner_counts.get(user.pk), owner_counts.get(other_user.pk)
+        bi.owner = other_user
+        with django_capture_on_commit_callbacks(execute=True):
+            bi.save()
+        assert owner_counts.get(user.pk)["copies"] == 0
+        assert owner_counts.get(other_user.pk)["copies"] == 1
+
+    def test_batch_update_invalidates(self, user, django_capture_on_commit_callbacks):
+        BookInstanceFactory.create_batch(2, owner=user, status="a")
+        owner_counts.get(user.pk)
+        with django_capture_on_commit_callbacks(execute=True):
+            update_instances(BookInstance.objects.filter(owner=user), status="l")
+        assert owner_counts.get(user.pk)["by_status"] == [("l", "Lost", 2)]
+
+    def test_deleting_location_invalidates_everyone(self, user,
+                                                    django_capture_on_commit_callbacks):
+        attic = LocationFactory()
+        BookInstanceFactory(owner=user, location=attic)
+        owner_counts.get(user.pk)
+        with django_capture_on_commit_callbacks(execute=True):
+            attic.delete()
+        assert owner_counts.get(user.pk)["by_location"] == [(None, 1)]
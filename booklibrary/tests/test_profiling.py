@@ -0,0 +1,195 @@
+"""
+Tests for booklibrary.utils.profiling and ProfilingMiddleware.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+
+from booklibrary.models import Book
+from booklibrary.utils import profiling
+
+from .conftest import BookFactory, UserFactory
+
+PROFILED_MIDDLEWARE = [*settings.MIDDLEWARE, "booklibrary.middleware.ProfilingMiddleware"]
+
+
+def _busy_view():
+    time.sleep(0.05)
+    return Book.objects.count()
+
+
+def _hungry_view():
+    kept = [bytes(1024) for _ in range(2000)]  # ~2 MB, returned
+    [bytes(1024) for _ in range(4000)]  # ~4 MB more at the peak, freed
+    return len(Book.objects.all()), kept
+
+
+@pytest.mark.django_db
+class TestRun:
+
+    def test_sampling_profile_has_stacks_and_sql(self, monkeypatch):
+        monkeypatch.setattr(profiling, "INTERVAL_MS", 1)
+        profile = profiling.run(_busy_view)
+        assert profile.result == 0
+        assert profile.elapsed_ms >= 50
+        assert [q["sql"] for q in profile.queries] == [
+            'SELECT COUNT(*) AS "__count" FROM "booklibrary_book"']
+        folded = profile.folded().splitlines()
+        assert folded and all(line.rsplit(" ", 1)[1].isdigit() for line in folded)
+        assert any("_busy_view (booklibrary/tests/test_profiling.py:" in line for line in folded)
+        report = profile.report()
+        assert "samples; functions by samples on top of the stack" in report
+        assert 'FROM "booklibrary_book"' in report.split("SQL:")[1]
+
+    def test_cprofile_profile_saved_with_sql(self, tmp_path):
+        profile = profiling.run(_busy_view, mode="cprofile")
+        assert "_busy_view" in profile.report()
+        stem = profile.save(str(tmp_path), "booklibrary:books")
+        assert os.path.dirname(stem) == str(tmp_path)
+        assert os.path.getsize(f"{stem}.prof") > 0
+        meta = json.loads(open(f"{stem}.json").read())
+        assert meta["label"] == "booklibrary:books" and meta["mode"] == "cprofile"
+        assert len(meta["queries"]) == 1
+
+    def test_memory_profile_peak_and_lines(self, tmp_path):
+        profile = profiling.run(_hungry_view, mode="memory")
+        memory = profile.memory
+        assert not tracemalloc.is_tracing()
+        assert 5500 < memory["peak_kb"] < 9000
+        assert 1900 < memory["retained_kb"] < 3000
+        top = memory["lines"][0]
+        assert top["line"].startswith("booklibrary/tests/test_profiling.py:") and top["blocks"] >= 2000
+        assert memory["project_lines"][0]["line"] == top["line"]
+        report = profile.report(limit=5, sql=False)
+        assert report.startswith(f"memory profile, {profile.elapsed_ms:.1f} ms, 1 queries, peak ")
+        assert top["line"] in report and "SQL:" not in report
+
+        stem = profile.save(str(tmp_path), "hungry")
+        assert sorted(path.suffix for path in tmp_path.iterdir()) == [".json"]
+        assert json.loads(open(f"{stem}.json").read())["memory"]["peak_kb"] == memory["peak_kb"]
+
+    def test_memory_profile_inside_another_trace(self):
+        tracemalloc.start()
+        try:
+            profile = profiling.run(_hungry_view, mode="memory")
+            assert tracemalloc.is_tracing()
+        finally:
+            tracemalloc.stop()
+        assert 5500 < profile.memory["peak_kb"] < 9000
+
+    def test_overlapping_memory_profiles(self):
+        # The first to finish must not stop the trace under the second.
+        first_in, second_in, first_out = threading.Event(), threading.Event(), threading.Event()
+        profiles = {}
+
+        def first():
+            with profiling.Allocations() as allocations:
+                first_in.set()
+                second_in.wait(5)
+            profiles["first"] = allocations
+            first_out.set()
+
+        def second():
+            first_in.wait(5)
+            with profiling.Allocations() as allocations:
+                second_in.set()
+                first_out.wait(5)
+                hoard = [bytearray(1024) for _ in range(2000)]
+            profiles["second"] = allocations
+            del hoard
+
+        threads = [threading.Thread(target=second), threading.Thread(target=first)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert profiles["first"].memory is not None
+        assert profiles["second"].memory["peak_kb"] > 1900
+        assert not tracemalloc.is_tracing()
+
+    def test_wrapper_removed_afterwards(self):
+        before = list(connection.execute_wrappers)
+        with pytest.raises(ZeroDivisionError):
+            profiling.run(lambda: 1 / 0)
+        assert connection.execute_wrappers == before
+
+
+@pytest.mark.django_db
+class TestProfilingMiddleware:
+
+    @pytest.fixture(autouse=True)
+    def profiled(self, settings, tmp_path):
+        settings.PROFILING = True
+        settings.PROFILE_DIR = str(tmp_path)
+        settings.MIDDLEWARE = PROFILED_MIDDLEWARE
+        BookFactory()
+
+    def test_staff_get_the_report_instead_of_the_page(self, client, tmp_path):
+        client.force_login(UserFactory(is_staff=True))
+        response = client.get("/booklibrary/books/?profile=cprofile")
+        assert response["Content-Type"] == "text/plain; charset=utf-8"
+        text = response.content.decode()
+        assert text.startswith("cprofile profile,")
+        assert '"booklibrary_book"' in text.split("SQL:")[1]
+        assert len(list(tmp_path.glob("*-booklibrary_books-*.prof"))) == 1
+
+    def test_header_and_folded_output(self, client):
+        client.force_login(UserFactory(is_staff=True))
+        response = client.get("/booklibrary/books/", HTTP_X_PROFILE="folded")
+        assert response["Content-Type"] == "text/plain; charset=utf-8"
+        assert b"<html" not in response.content
+
+    def test_memory_report(self, client):
+        client.force_login(UserFactory(is_staff=True))
+        text = client.get("/booklibrary/books/?profile=memory").content.decode()
+        assert text.startswith("memory profile,") and " KB retained" in text
+        assert "by line in this project:" in text and "booklibrary/views.py:" in text
+
+    def test_ignored_for_other_users(self, client, tmp_path):
+        client.force_login(UserFactory())
+        response = client.get("/booklibrary/books/?profile=1")
+        assert response["Content-Type"].startswith("text/html")
+        assert list(tmp_path.iterdir()) == []
+
+    def test_sampled_slow_requests_are_saved(self, client, settings, tmp_path):
+        settings.PROFILE_SAMPLE_RATE = 1.0
+        settings.PROFILE_SLOW_MS = 0
+        response = client.get("/booklibrary/books/")
+        assert response["Content-Type"].startswith("text/html")
+        saved = sorted(path.suffix for path in tmp_path.iterdir())
+        assert saved == [".folded", ".json"]
+
+    def test_sampled_fast_requests_are_discarded(self, client, settings, tmp_path):
+        settings.PROFILE_SAMPLE_RATE = 1.0
+        settings.PROFILE_SLOW_MS = 60_000
+        client.get("/booklibrary/books/")
+        assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.django_db
+class TestProfileCommand:
+
+    def test_memory_report_after_the_output(self):
+        out = StringIO()
+        call_command("profile_command", "send_loan_reminders", stdout=out)
+        text = out.getvalue()
+        assert text.index("Sent 0 reminders.") < text.index("memory profile,")
+        assert "Still allocated at the end" in text and "SQL:" not in text
+
+    def test_arguments_are_passed_on(self, tmp_path):
+        out = StringIO()
+        call_command("profile_command", "--mode", "cprofile", "--sql", "--save", str(tmp_path),
+                     "generate_catalogue", "--books", "20", "--seed", "3", stdout=out)
+        text = out.getvalue()
+        assert "Generated 20 books" in text
+        assert "cprofile profile," in text and "SQL:" in text
+        assert len(list(tmp_path.glob("*-generate_catalogue-*.prof"))) == 1
+        assert Book.objects.count() == 20
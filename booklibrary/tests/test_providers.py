@@ -0,0 +1,213 @@
+"""
+Unit tests for booklibrary/utils/providers.py.
+
+Open Library requests go to local stand-in servers (utils/standin.py), so
+the fan-out tests measure real concurrency without leaving the machine.
+"""
+import time
+
+import pytest
+from unittest.mock import patch
+
+from booklibrary.utils.google_books import GoogleBooksQuotaError
+from booklibrary.utils.providers import (
+    GoogleBooksProvider,
+    MetadataProvider,
+    OpenLibraryError,
+    OpenLibraryProvider,
+    ProviderError,
+    _dedupe_key,
+    fan_out_search,
+    get_providers,
+)
+from booklibrary.utils.standin import StandInServer, open_library_payload
+
+
+# ── helpers ───────────────────────────────────────────────────────────────────
+
+class StubProvider(MetadataProvider):
+    """Provider returning fixed results, optionally after a delay or with an error."""
+
+    def __init__(self, name, books=(), total=None, delay=0, error=None):
+        self.name = name
+        self.books = list(books)
+        self.total = len(self.books) if total is None else total
+        self.delay = delay
+        self.error = error
+
+    def search(self, query, max_results=10, start_index=0):
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return [dict(b) for b in self.books], self.total
+
+
+def _book(title, isbn_13=None, isbn_10=None, author1="Someone"):
+    return {"title": title, "author1": author1, "isbn_13": isbn_13, "isbn_10": isbn_10}
+
+
+# ── OpenLibraryProvider ───────────────────────────────────────────────────────
+
+class TestOpenLibraryProvider:
+
+    def test_parses_search_results(self):
+        payload = {
+            "numFound": 42,
+            "docs": [{
+                "key": "/works/OL27448W",
+                "title": "The Lord of the Rings",
+                "author_name": ["J.R.R. Tolkien", "Christopher Tolkien"],
+                "publisher": ["Allen & Unwin"],
+                "first_publish_year": 1954,
+                "subject": ["Fantasy", "Middle Earth"],
+                "language": ["eng"],
+                "isbn": ["0261102354", "9780261102354"],
+                "cover_i": 123,
+            }],
+        }
+        with StandInServer(payload) as server:
+            books, total = OpenLibraryProvider(base_url=server.url).search("rings")
+
+        assert total == 42
+        book = books[0]
+        assert book["title"] == "The Lord of the Rings"
+        assert book["author1"] == "J.R.R. Tolkien"
+        assert book["author2"] == "Christopher Tolkien"
+        assert book["publisher"] == "Allen & Unwin"
+        assert book["published_date"] == "1954"
+        assert book["genre1"] == "Fantasy"
+        assert book["language"] == "en"
+        assert book["isbn_10"] == "0261102354"
+        assert book["isbn_13"] == "9780261102354"
+        assert book["volume_id"] == "openlibrary:/works/OL27448W"
+        assert book["image_link"] == "https://covers.openlibrary.org/b/id/123-M.jpg"
+        assert book["is_owned"] is False
+
+    def test_sparse_doc_uses_defaults(self):
+        with StandInServer({"numFound": 1, "docs": [{"key": "/works/OL1W"}]}) as server:
+            books, _ = OpenLibraryProvider(base_url=server.url).search("x")
+        assert books[0]["title"] == "Not Present"
+        assert books[0]["author2"] is None
+        assert books[0]["image_link"] is None
+
+    def test_paging_params_forwarded(self):
+        with StandInServer(open_library_payload([])) as server:
+            OpenLibraryProvider(base_url=server.url).search("dune", max_results=5, start_index=10)
+        _, query = server.requests[0]
+        assert query["q"] == "dune"
+        assert query["limit"] == "5"
+        assert query["offset"] == "10"
+
+    def test_http_error_raises(self):
+        with StandInServer({}, status=503) as server:
+            with pytest.raises(OpenLibraryError, match="HTTP 503"):
+                OpenLibraryProvider(base_url=server.url).search("x")
+
+    def test_network_error_raises(self):
+        with pytest.raises(OpenLibraryError, match="Network error"):
+            OpenLibraryProvider(base_url="http://127.0.0.1:9", timeout=1).search("x")
+
+
+# ── get_providers ─────────────────────────────────────────────────────────────
+
+class TestGetProviders:
+
+    def test_default_is_google_only(self):
+        assert [p.name for p in get_providers()] == ["google"]
+
+    def test_named_providers(self):
+        providers = get_providers(["openlibrary", "google"])
+        assert isinstance(providers[0], OpenLibraryProvider)
+        assert isinstance(providers[1], GoogleBooksProvider)
+
+    def test_provider_without_search_cannot_be_created(self):
+        class Incomplete(MetadataProvider):
+            name = "incomplete"
+
+        with pytest.raises(TypeError, match="search"):
+            Incomplete()
+
+
+# ── _dedupe_key ───────────────────────────────────────────────────────────────
+
+class TestDedupeKey:
+
+    def test_isbn10_matches_its_isbn13(self):
+        assert _dedupe_key(_book("A", isbn_10="0261102354")) == "9780261102354"
+
+    def test_without_isbn_uses_title_and_author(self):
+        assert _dedupe_key(_book("The  Hobbit", author1="Tolkien")) == \
+            _dedupe_key(_book("the hobbit", author1="tolkien"))
+
+
+# ── fan_out_search ────────────────────────────────────────────────────────────
+
+class TestFanOutSearch:
+
+    def test_merges_in_provider_order_and_tags_source(self):
+        books, total = fan_out_search([
+            StubProvider("a", [_book("A1", "9780000000001")], total=5),
+            StubProvider("b", [_book("B1", "9780000000002")], total=7),
+        ], "q")
+        assert [b["title"] for b in books] == ["A1", "B1"]
+        assert [b["source"] for b in books] == ["a", "b"]
+        assert total == 12
+
+    def test_duplicates_by_isbn_dropped(self):
+        books, _ = fan_out_search([
+            StubProvider("a", [_book("Dune", isbn_13="9780261102354")]),
+            StubProvider("b", [_book("Dune (reprint)", isbn_10="0261102354")]),
+        ], "q")
+        assert [b["title"] for b in books] == ["Dune"]
+
+    def test_failed_provider_skipped(self):
+        books, _ = fan_out_search([
+            StubProvider("a", error=GoogleBooksQuotaError("429")),
+            StubProvider("b", [_book("B1")]),
+        ], "q")
+        assert [b["title"] for b in books] == ["B1"]
+
+    def test_all_failed_raises(self):
+        with pytest.raises(ProviderError):
+            fan_out_search([
+                StubProvider("a", error=GoogleBooksQuotaError("429")),
+                StubProvider("b", error=OpenLibraryError("down")),
+            ], "q")
+
+    def test_latency_is_max_not_sum(self):
+        start = time.monotonic()
+        fan_out_search([
+            StubProvider("a", [_book("A")], delay=0.3),
+            StubProvider("b", [_book("B")], delay=0.3),
+            StubProvider("c", [_book("C")], delay=0.3),
+        ], "q", deadline=2)
+        assert time.monotonic() - start < 0.6
+
+    def test_deadline_returns_what_arrived(self):
+        start = time.monotonic()
+        books, _ = fan_out_search([
+            StubProvider("fast", [_book("Fast")]),
+            StubProvider("slow", [_book("Slow")], delay=2),
+        ], "q", deadline=0.3)
+        assert time.monotonic() - start < 1
+        assert [b["title"] for b in books] == ["Fast"]
+
+    def test_stand_in_servers_queried_concurrently(self):
+        with StandInServer(open_library_payload(["One"]), delay=0.3) as first, \
+                StandInServer(open_library_payload(["Two"]), delay=0.3) as second:
+            start = time.monotonic()
+            books, _ = fan_out_search([
+                OpenLibraryProvider(base_url=first.url),
+                OpenLibraryProvider(base_url=second.url),
+            ], "q", deadline=2)
+            elapsed = time.monotonic() - start
+        # Both stand-ins return the same ISBN for their first doc.
+        assert [b["title"] for b in books] == ["One"]
+        assert elapsed < 0.6
+
+    @patch("booklibrary.utils.providers.google_books.search_books")
+    def test_google_provider_delegates_to_search_books(self, mock_search):
+        mock_search.return_value = ([_book("G")], 1)
+        books, _ = fan_out_search([GoogleBooksProvider()], "q", max_results=5, start_index=5)
+        mock_search.assert_called_once_with("q", max_results=5, start_index=5)
+        assert books[0]["source"] == "google"
@@ -0,0 +1,72 @@
+"""
+Unit tests for booklibrary.utils.query_parser.
+"""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from booklibrary.models import Book
+from booklibrary.utils.query_parser import compile_query, parse
+
+from .conftest import AuthorFactory, BookFactory, GenreFactory, KeywordsFactory, SeriesFactory
+
+
+class TestParse:
+
+    def test_fields_phrases_and_negation(self):
+        assert parse('author:tolkien genre:"high fantasy" "the ring" -series:silmarillion') == [
+            ("author", "tolkien", False),
+            ("genre", "high fantasy", False),
+            (None, "the ring", False),
+            ("series", "silmarillion", True),
+        ]
+
+    def test_unknown_prefix_is_part_of_the_word(self):
+        assert parse("Dune: Messiah isbn:123") == [
+            (None, "Dune:", False), (None, "Messiah", False), (None, "isbn:123", False),
+        ]
+
+    def test_field_names_ignore_case_and_unclosed_quote(self):
+        assert parse('Author:"le guin') == [("author", "le guin", False)]
+
+    def test_blank(self):
+        assert parse("   ") == []
+        assert compile_query("  ") is None
+
+
+def _titles(text, default_field="title"):
+    return sorted(Book.objects.filter(compile_query(text, default_field)).values_list("title", flat=True))
+
+
+@pytest.mark.django_db
+class TestCompileQuery:
+
+    @pytest.fixture
+    def library(self):
+        # Plain-word terms also match summaries, so none are left to Faker.
+        tolkien = AuthorFactory(first_name="John", last_name="Tolkien")
+        fantasy = GenreFactory(name="Fantasy")
+        BookFactory(title="The Fellowship of the Ring", authors=[tolkien], genre=[fantasy],
+                    series=SeriesFactory(name="The Lord of the Rings"), summary="")
+        BookFactory(title="The Silmarillion", authors=[tolkien], genre=[fantasy],
+                    series=SeriesFactory(name="Silmarillion"), summary="")
+        BookFactory(title="The Ring of Truth", genre=[GenreFactory(name="Fantasy Crime")],
+                    keywords=[KeywordsFactory(name="detective")], summary="")
+
+    def test_combined_terms(self, library):
+        assert _titles('author:tolkien genre:fantasy "ring"') == ["The Fellowship of the Ring"]
+
+    def test_negation(self, library):
+        assert _titles("author:tolkien -series:silmarillion") == ["The Fellowship of the Ring"]
+        assert _titles("ring -author:tolkien") == ["The Ring of Truth"]
+
+    def test_default_field(self, library):
+        assert _titles("detective", default_field="keyword") == ["The Ring of Truth"]
+
+    def test_one_query_without_joins_or_distinct(self, library):
+        with CaptureQueriesContext(connection) as ctx:
+            _titles('author:tolkien author:john genre:fantasy keyword:x -genre:crime "ring"')
+        assert len(ctx.captured_queries) == 1
+        sql = ctx.captured_queries[0]["sql"]
+        assert "JOIN" not in sql.split(" WHERE ")[0]
+        assert "DISTINCT" not in sql
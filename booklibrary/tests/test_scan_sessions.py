@@ -0,0 +1,181 @@
+"""
+Tests for booklibrary.utils.scan_sessions and its REST API
+(booklibrary.api.ScanSessionViewSet, routed under /booklibrary/api/).
+
+Sessions live in the default cache, which the autouse clear_cache fixture
+empties around every test.
+"""
+import threading
+import time
+import uuid
+
+import pytest
+from unittest.mock import patch
+from rest_framework.test import APIClient
+
+from booklibrary.models import BookInstance
+from booklibrary.utils import scan_sessions
+
+from .conftest import BookInstanceFactory, LocationFactory, UserFactory
+
+
+@pytest.mark.django_db
+class TestScanSessions:
+
+    def test_moves_scanned_copies_on_close(self, user):
+        target = LocationFactory()
+        copies = BookInstanceFactory.create_batch(3, owner=user)
+        session = scan_sessions.start(user, target)
+        state = scan_sessions.add(session["id"], user, [str(bi.pk) for bi in copies])
+        assert len(state["pending"]) == 3
+        assert state["moved"] == 0
+        state = scan_sessions.close(session["id"], user)
+        assert state["moved"] == 3
+        assert BookInstance.objects.filter(location=target).count() == 3
+        with pytest.raises(scan_sessions.ScanSessionNotFound):
+            scan_sessions.get(session["id"], user)
+
+    def test_batches_use_constant_queries(self, user, django_assert_max_num_queries):
+        target = LocationFactory()
+        ids = [str(bi.pk) for bi in BookInstanceFactory.create_batch(200, owner=user)]
+        session = scan_sessions.start(user, target)
+        # Four batches of 50, each one SELECT plus update_instances().
+        with patch.object(scan_sessions, "BATCH_SIZE", 50), django_assert_max_num_queries(25):
+            for bi_id in ids:
+                scan_sessions.add(session["id"], user, [bi_id])
+            state = scan_sessions.close(session["id"], user)
+        assert state["moved"] == 200
+        assert BookInstance.objects.filter(location=target).count() == 200
+
+    def test_flushes_when_batch_is_full(self, user):
+        target = LocationFactory()
+        copies = BookInstanceFactory.create_batch(3, owner=user)
+        session = scan_sessions.start(user, target)
+        with patch.object(scan_sessions, "BATCH_SIZE", 2):
+            state = scan_sessions.add(session["id"], user, [str(bi.pk) for bi in copies])
+        assert state["moved"] == 2
+        assert len(state["pending"]) == 1
+
+    def test_reports_unknown_and_invalid_ids(self, user):
+        bi = BookInstanceFactory(owner=user)
+        missing = str(uuid.uuid4())
+        session = scan_sessions.start(user, LocationFactory())
+        scan_sessions.add(session["id"], user, [str(bi.pk), missing, "not-a-uuid"])
+        state = scan_sessions.close(session["id"], user)
+        assert state["moved"] == 1
+        assert sorted(state["unknown"]) == sorted([missing, "not-a-uuid"])
+
+    def test_duplicate_scans_counted_once(self, user):
+        bi = BookInstanceFactory(owner=user)
+        session = scan_sessions.start(user, LocationFactory())
+        scan_sessions.add(session["id"], user, [str(bi.pk), str(bi.pk).upper()])
+        assert scan_sessions.close(session["id"], user)["moved"] == 1
+
+    def test_non_staff_cannot_move_others_copies(self, user, other_user):
+        target = LocationFactory()
+        theirs = BookInstanceFactory(owner=other_user)
+        session = scan_sessions.start(user, target)
+        scan_sessions.add(session["id"], user, [str(theirs.pk)])
+        state = scan_sessions.close(session["id"], user)
+        assert state["unknown"] == [str(theirs.pk)]
+        theirs.refresh_from_db()
+        assert theirs.location != target
+
+    def test_staff_can_move_any_copy(self, other_user):
+        staff = UserFactory(is_staff=True)
+        target = LocationFactory()
+        theirs = BookInstanceFactory(owner=other_user)
+        session = scan_sessions.start(staff, target)
+        scan_sessions.add(session["id"], staff, [str(theirs.pk)])
+        assert scan_sessions.close(session["id"], staff)["moved"] == 1
+
+    def test_unknown_values_capped(self, user):
+        session = scan_sessions.start(user, LocationFactory())
+        with patch.object(scan_sessions, "UNKNOWN_LIMIT", 3):
+            scan_sessions.add(session["id"], user, [f"bad-{i}" for i in range(5)])
+            state = scan_sessions.add(session["id"], user, ["bad-5", str(uuid.uuid4())])
+            state = scan_sessions.close(session["id"], user)
+        assert state["unknown"] == ["bad-0", "bad-1", "bad-2"]
+
+    def test_concurrent_scans_all_kept(self, user):
+        session = scan_sessions.start(user, LocationFactory())
+        ids = [str(uuid.uuid4()) for _ in range(4)]
+        load = scan_sessions._load
+
+        def slow_load(*args):
+            # Widen the gap between reading and writing the session.
+            state = load(*args)
+            time.sleep(0.05)
+            return state
+
+        with patch.object(scan_sessions, "_load", slow_load):
+            threads = [threading.Thread(target=scan_sessions.add, args=(session["id"], user, [i]))
+                       for i in ids]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert sorted(scan_sessions.get(session["id"], user)["pending"]) == sorted(ids)
+
+    def test_busy_session(self, user):
+        session = scan_sessions.start(user, LocationFactory())
+        with scan_sessions._locked(session["id"]), \
+                patch.object(scan_sessions, "LOCK_TIMEOUT", 0.05):
+            with pytest.raises(scan_sessions.ScanSessionBusy):
+                scan_sessions.add(session["id"], user, [str(uuid.uuid4())])
+        assert scan_sessions.add(session["id"], user, [str(uuid.uuid4())])["pending"]
+
+    def test_session_private_to_its_user(self, user, other_user):
+        session = scan_sessions.start(user, LocationFactory())
+        with pytest.raises(scan_sessions.ScanSessionNotFound):
+            scan_sessions.add(session["id"], other_user, [])
+
+
+@pytest.mark.django_db
+class TestScanSessionAPI:
+
+    URL = "/booklibrary/api/scan-sessions/"
+
+    @pytest.fixture
+    def client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_requires_authentication(self):
+        assert APIClient().post(self.URL, {"location": 1}).status_code in (401, 403)
+
+    def test_scan_and_close(self, client, user):
+        target = LocationFactory()
+        copies = BookInstanceFactory.create_batch(2, owner=user)
+        missing = str(uuid.uuid4())
+
+        response = client.post(self.URL, {"location": target.pk}, format="json")
+        assert response.status_code == 201
+        session_url = f"{self.URL}{response.json()['id']}/"
+
+        response = client.post(f"{session_url}scans/",
+                               {"ids": [str(bi.pk) for bi in copies] + [missing]}, format="json")
+        assert response.json()["pending"] == 3
+
+        response = client.post(f"{session_url}close/")
+        assert response.json() == {
+            "id": response.json()["id"], "location": target.pk,
+            "pending": 0, "moved": 2, "unknown": [missing],
+        }
+        assert client.get(session_url).status_code == 404
+
+    def test_invalid_location_rejected(self, client):
+        assert client.post(self.URL, {"location": 999999}, format="json").status_code == 400
+
+    def test_unknown_session_is_404(self, client):
+        response = client.post(f"{self.URL}nope/scans/", {"ids": ["x"]}, format="json")
+        assert response.status_code == 404
+
+    def test_busy_session_is_409(self, client, user):
+        session = scan_sessions.start(user, LocationFactory())
+        with scan_sessions._locked(session["id"]), \
+                patch.object(scan_sessions, "LOCK_TIMEOUT", 0.05):
+            response = client.post(f"{self.URL}{session['id']}/scans/",
+                                   {"ids": ["x"]}, format="json")
+        assert response.status_code == 409
@@ -0,0 +1,76 @@
+"""
+Unit tests for booklibrary/utils/search_cache.py.
+
+fetch callables are plain stubs, so nothing here talks to Google.
+"""
+from unittest.mock import MagicMock, patch
+
+from booklibrary.utils import search_cache
+from booklibrary.utils.google_books import GoogleBooksError, GoogleBooksQuotaError
+
+
+def _stub_fetch(books=None, total=0, error=None):
+    fetch = MagicMock()
+    if error is not None:
+        fetch.side_effect = error
+    else:
+        fetch.return_value = (books or [], total)
+    return fetch
+
+
+class TestResultsCache:
+
+    def test_miss_returns_none(self):
+        assert search_cache.get_results("dune", 10, 0) is None
+
+    def test_set_then_get(self):
+        search_cache.set_results("dune", 10, 0, ([{"title": "Dune"}], 1))
+        assert search_cache.get_results("dune", 10, 0) == ([{"title": "Dune"}], 1)
+
+    def test_key_ignores_case_and_spacing(self):
+        search_cache.set_results("Frank  Herbert", 10, 0, ([], 5))
+        assert search_cache.get_results("frank herbert", 10, 0) == ([], 5)
+
+    def test_pages_cached_separately(self):
+        search_cache.set_results("dune", 10, 0, ([], 1))
+        assert search_cache.get_results("dune", 10, 10) is None
+
+
+class TestPrefetch:
+
+    def test_prefetch_warms_cache(self):
+        fetch = _stub_fetch([{"title": "Page 2"}], 30)
+        future = search_cache.prefetch(fetch, "dune", 10, 10)
+        future.result(timeout=5)
+
+        fetch.assert_called_once_with("dune", max_results=10, start_index=10)
+        assert search_cache.get_results("dune", 10, 10) == ([{"title": "Page 2"}], 30)
+
+    def test_cached_page_not_refetched(self):
+        search_cache.set_results("dune", 10, 10, ([], 30))
+        fetch = _stub_fetch()
+        assert search_cache.prefetch(fetch, "dune", 10, 10) is None
+        fetch.assert_not_called()
+
+    def test_second_prefetch_within_interval_skipped(self):
+        first = search_cache.prefetch(_stub_fetch(), "dune", 10, 10)
+        first.result(timeout=5)
+        assert search_cache.prefetch(_stub_fetch(), "emma", 10, 10) is None
+
+    def test_quota_error_suspends_prefetch(self):
+        future = search_cache.prefetch(
+            _stub_fetch(error=GoogleBooksQuotaError("429")), "dune", 10, 10)
+        future.result(timeout=5)
+
+        with patch.object(search_cache, "PREFETCH_INTERVAL", 0):
+            assert search_cache.prefetch(_stub_fetch(), "emma", 10, 10) is None
+
+    def test_other_errors_leave_cache_empty(self):
+        future = search_cache.prefetch(
+            _stub_fetch(error=GoogleBooksError("down")), "dune", 10, 10)
+        future.result(timeout=5)
+        assert search_cache.get_results("dune", 10, 10) is None
+
+    def test_disabled_by_setting(self):
+        with patch.object(search_cache, "PREFETCH_ENABLED", False):
+            assert search_cache.prefetch(_stub_fetch(), "dune", 10, 10) is None
@@ -2,19 +2,41 @@
 Unit tests for booklibrary.services.
 
 Covers create_book_from_google_data() and its private helpers
-_parse_published_date() and _get_or_create_author().
+_parse_published_date() and _get_or_create_author(), the batch variant
+create_books_from_google_data(), resolve_names(), import_volume(),
+update_instances() and the loan functions.
 """
 import pytest
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from io import StringIO
+from unittest.mock import patch
 
-from booklibrary.models import Author, Book, BookInstance, Genre, Language
+from django.core import mail
+from django.core.management import call_command
+from django.utils import timezone
+
+from booklibrary.models import (
+    Author, Book, BookInstance, Genre, GoogleVolume, Keywords, Language, Loan, Location, Series,
+)
 from booklibrary.services import (
+    LoanError,
     _get_or_create_author,
     _parse_published_date,
     create_book_from_google_data,
+    create_books_from_google_data,
+    import_volume,
+    lend_copy,
+    resolve_names,
+    return_copy,
+    send_loan_reminders,
+    update_instances,
 )
+from booklibrary.signals import bookinstances_changed
+from booklibrary.utils import lookup_cache
 
 from .conftest import (
+    BookFactory,
+    BookInstanceFactory,
     GenreFactory,
     KeywordsFactory,
     LanguageFactory,
@@ -111,6 +133,62 @@ class TestGetOrCreateAuthor:
         assert author.last_name == "Bjork"
 
 
+# ── resolve_names ─────────────────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestResolveNames:
+
+    def test_creates_missing_names(self):
+        found = resolve_names(Genre, ["Horror", "Poetry"])
+        assert set(found) == {"Horror", "Poetry"}
+        assert Genre.objects.count() == 2
+
+    def test_matches_existing_names_case_insensitively(self):
+        existing = GenreFactory(name="Sci-Fi")
+        found = resolve_names(Genre, ["sci-fi", "SCI-FI"])
+        assert found["sci-fi"] == existing
+        assert found["SCI-FI"] == existing
+        assert Genre.objects.count() == 1
+
+    def test_matches_non_ascii_names_differing_in_case(self):
+        existing = GenreFactory(name="Études")
+        found = resolve_names(Genre, ["ÉTUDES", "études"])
+        assert found == {"ÉTUDES": existing, "études": existing}
+        assert Genre.objects.count() == 1
+
+    def test_names_differing_in_case_insert_one_row(self):
+        found = resolve_names(Series, ["Dune", "dune"])
+        assert found["Dune"] == found["dune"]
+        assert Series.objects.count() == 1
+
+    def test_skips_empty_names(self):
+        assert resolve_names(Language, [None, ""]) == {}
+
+    def test_one_select_when_all_exist(self, django_assert_num_queries):
+        LocationFactory(name="Attic")
+        LocationFactory(name="Cellar")
+        with django_assert_num_queries(1):
+            resolve_names(Location, ["attic", "Cellar"])
+
+    def test_ignores_rows_deleted_by_another_process(self):
+        # Deleting without signals leaves lookup_cache holding the old row,
+        # as it would in every process but the one that deleted it.
+        GenreFactory(name="Horror")
+        lookup_cache.clear()
+        lookup_cache.get_all(Genre)
+        Genre.objects.filter(name="Horror")._raw_delete(Genre.objects.db)
+        assert lookup_cache.get_by_name(Genre, "horror") is not None
+
+        found = resolve_names(Genre, ["horror"])
+        assert Genre.objects.get(pk=found["horror"].pk).name == "horror"
+
+    def test_one_insert_for_many_new_names(self, django_assert_num_queries):
+        # select, insert, re-select
+        with django_assert_num_queries(3):
+            found = resolve_names(Keywords, [f"Keyword {i}" for i in range(20)])
+        assert len(found) == 20
+
+
 # ── create_book_from_google_data ──────────────────────────────────────────────
 
 @pytest.mark.django_db
@@ -278,3 +356,305 @@ class TestCreateBookFromGoogleData:
         book2, _ = create_book_from_google_data(data, _fake_cleaned_data(), user)
         assert book1.pk == book2.pk
         assert Book.objects.filter(uniqueID="reuse-1").count() == 1
+
+    def test_duplicate_volume_id_refreshes_language(self):
+        LanguageFactory(name="en")
+        book, _ = create_book_from_google_data(
+            _fake_book_data(volume_id="lang-1", language=None), _fake_cleaned_data(), UserFactory())
+        create_book_from_google_data(
+            _fake_book_data(volume_id="lang-1", language="en"), _fake_cleaned_data(), UserFactory())
+        book.refresh_from_db()
+        assert book.language.name == "en"
+
+    def test_new_book_query_count(self, django_assert_num_queries):
+        """Known author, genre and language: lookups, one upsert, one insert per table."""
+        user = UserFactory()
+        GenreFactory(name="Sci-Fi")
+        LanguageFactory(name="en")
+        create_book_from_google_data(
+            _fake_book_data(volume_id="warm-1", genre1="Sci-Fi"), _fake_cleaned_data(), user)
+        data = _fake_book_data(volume_id="pin-1", genre1="Sci-Fi")
+        # savepoint, genre, language, author, book lookup, book upsert,
+        # author link, genre link, copy, release
+        with django_assert_num_queries(10):
+            create_book_from_google_data(data, _fake_cleaned_data(), user)
+
+    def test_existing_book_query_count(self, django_assert_num_queries):
+        """Adding another copy of a catalogued book writes no Book row."""
+        user = UserFactory()
+        data = _fake_book_data(volume_id="pin-2")
+        create_book_from_google_data(data, _fake_cleaned_data(), user)
+        # savepoint, language, author, book lookup, author link, copy, release
+        with django_assert_num_queries(7):
+            _, created = create_book_from_google_data(data, _fake_cleaned_data(), user)
+        assert created is False
+
+
+# ── create_books_from_google_data ─────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestCreateBooksFromGoogleData:
+
+    def test_creates_every_selected_book(self):
+        user = UserFactory()
+        saved = create_books_from_google_data(
+            [
+                _fake_book_data(title="Dune", volume_id="b-1", author1="Frank Herbert"),
+                _fake_book_data(title="Emma", volume_id="b-2", author1="Jane Austen"),
+            ],
+            _fake_cleaned_data(),
+            user,
+        )
+        assert [(b.title, created) for b, created in saved] == [("Dune", True), ("Emma", True)]
+        assert BookInstance.objects.filter(owner=user).count() == 2
+        assert saved[0][0].authors.get().last_name == "Herbert"
+        assert saved[1][0].authors.get().last_name == "Austen"
+
+    def test_shared_choices_applied_to_all(self):
+        location = LocationFactory()
+        series = SeriesFactory()
+        genre = GenreFactory(name="Classics")
+        keyword = KeywordsFactory(name="favourite")
+        from booklibrary.models import Keywords
+        saved = create_books_from_google_data(
+            [_fake_book_data(volume_id="s-1"), _fake_book_data(volume_id="s-2")],
+            _fake_cleaned_data(
+                book_location=location,
+                book_series=series,
+                book_genre=Genre.objects.filter(pk=genre.pk),
+                book_keywords=Keywords.objects.filter(pk=keyword.pk),
+            ),
+            UserFactory(),
+        )
+        for book, _ in saved:
+            book.refresh_from_db()
+            assert book.series == series
+            assert book.genre.filter(name="Classics").exists()
+            assert book.keywords.filter(name="favourite").exists()
+            assert book.bookinstance_set.get().location == location
+
+    def test_shared_lookups_created_once(self):
+        create_books_from_google_data(
+            [
+                _fake_book_data(volume_id="l-1", genre1="Fiction", language="fr",
+                                author1="Victor Hugo"),
+                _fake_book_data(volume_id="l-2", genre1="Fiction", language="fr",
+                                author1="Victor Hugo"),
+            ],
+            _fake_cleaned_data(),
+            UserFactory(),
+        )
+        assert Genre.objects.filter(name="Fiction").count() == 1
+        assert Language.objects.filter(name="fr").count() == 1
+        assert Author.objects.filter(last_name="Hugo").count() == 1
+
+    def test_reuses_existing_lookup_rows(self):
+        genre = GenreFactory(name="Fiction")
+        author = _get_or_create_author("Victor Hugo")
+        book, _ = create_books_from_google_data(
+            [_fake_book_data(volume_id="r-1", genre1="Fiction", author1="Victor Hugo")],
+            _fake_cleaned_data(),
+            UserFactory(),
+        )[0]
+        assert list(book.genre.all()) == [genre]
+        assert list(book.authors.all()) == [author]
+
+    def test_existing_book_reported_not_created(self):
+        create_book_from_google_data(
+            _fake_book_data(volume_id="dup-1"), _fake_cleaned_data(), UserFactory())
+        saved = create_books_from_google_data(
+            [_fake_book_data(volume_id="dup-1"), _fake_book_data(volume_id="new-1")],
+            _fake_cleaned_data(),
+            UserFactory(),
+        )
+        assert [created for _, created in saved] == [False, True]
+        assert Book.objects.filter(uniqueID="dup-1").count() == 1
+        assert BookInstance.objects.filter(book__uniqueID="dup-1").count() == 2
+
+    def test_failure_rolls_back_whole_batch(self):
+        user = UserFactory()
+        with patch("booklibrary.services.BookInstance.objects.bulk_create",
+                   side_effect=RuntimeError("boom")):
+            with pytest.raises(RuntimeError):
+                create_books_from_google_data(
+                    [_fake_book_data(volume_id="tx-1"), _fake_book_data(volume_id="tx-2")],
+                    _fake_cleaned_data(),
+                    user,
+                )
+        assert not Book.objects.filter(uniqueID__in=["tx-1", "tx-2"]).exists()
+
+    def test_query_count_independent_of_batch_size(self, django_assert_max_num_queries):
+        GenreFactory(name="Fiction")
+        LanguageFactory(name="en")
+        _get_or_create_author("Jane Author")
+        user = UserFactory()
+        books_data = [
+            _fake_book_data(volume_id=f"q-{i}", genre1="Fiction") for i in range(10)
+        ]
+        with django_assert_max_num_queries(12):
+            create_books_from_google_data(books_data, _fake_cleaned_data(), user)
+
+
+# ── import_volume ─────────────────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestImportVolume:
+
+    @patch("booklibrary.utils.google_books.requests.get")
+    def test_stored_volume_imported_without_http(self, mock_get):
+        GoogleVolume.objects.create(
+            volume_id="dune-1", fetched_at=timezone.now(),
+            data={"id": "dune-1", "volumeInfo": {"title": "Dune", "authors": ["Frank Herbert"]}},
+        )
+        user = UserFactory()
+        book, created = import_volume("dune-1", _fake_cleaned_data(), user)
+
+        assert created is True
+        assert book.title == "Dune"
+        assert book.authors.filter(last_name="Herbert").exists()
+        assert BookInstance.objects.filter(book=book, owner=user).exists()
+        mock_get.assert_not_called()
+
+
+# ── update_instances ──────────────────────────────────────────────────────────
+
+@pytest.fixture
+def changed_signals():
+    """Collect the kwargs of every bookinstances_changed signal sent."""
+    sent = []
+
+    def receiver(sender, **kwargs):
+        sent.append(kwargs)
+
+    bookinstances_changed.connect(receiver)
+    yield sent
+    bookinstances_changed.disconnect(receiver)
+
+
+@pytest.mark.django_db
+class TestUpdateInstances:
+
+    def test_moves_every_instance_in_one_update(self, django_assert_num_queries):
+        old, new = LocationFactory(), LocationFactory()
+        for _ in range(5):
+            BookInstanceFactory(location=old)
+        # savepoint, select touched owners/locations, update, release
+        with django_assert_num_queries(4):
+            count = update_instances(BookInstance.objects.filter(location=old), location=new)
+        assert count == 5
+        assert BookInstance.objects.filter(location=new).count() == 5
+
+    def test_sets_status_and_owner_together(self):
+        user = UserFactory()
+        instances = [BookInstanceFactory(status="a") for _ in range(2)]
+        update_instances(BookInstance.objects.all(), status="l", owner=user)
+        for bi in instances:
+            bi.refresh_from_db()
+            assert (bi.status, bi.owner) == ("l", user)
+
+    def test_signal_sent_once_after_commit(self, changed_signals, django_capture_on_commit_callbacks):
+        old, new = LocationFactory(), LocationFactory()
+        a, b = BookInstanceFactory(location=old), BookInstanceFactory(location=old)
+        with django_capture_on_commit_callbacks(execute=True):
+            update_instances(BookInstance.objects.all(), location=new)
+            assert changed_signals == []
+        assert len(changed_signals) == 1
+        assert changed_signals[0]["owner_ids"] == {a.owner_id, b.owner_id}
+        assert changed_signals[0]["location_ids"] == {old.pk, new.pk}
+        assert changed_signals[0]["fields"] == ["location"]
+
+    def test_no_signal_when_nothing_matched(self, changed_signals, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            assert update_instances(BookInstance.objects.all(), status="l") == 0
+        assert changed_signals == []
+
+    def test_rejects_other_fields(self):
+        with pytest.raises(ValueError):
+            update_instances(BookInstance.objects.all(), book=None)
+
+    def test_batch_add_sends_signal_once(self, changed_signals, django_capture_on_commit_callbacks):
+        user = UserFactory()
+        with django_capture_on_commit_callbacks(execute=True):
+            create_books_from_google_data(
+                [_fake_book_data(volume_id=f"sig-{i}") for i in range(3)],
+                _fake_cleaned_data(), user)
+        assert len(changed_signals) == 1
+        assert changed_signals[0]["owner_ids"] == {user.pk}
+
+
+# ── Loans ─────────────────────────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestLoans:
+
+    def test_lend_marks_copy_on_loan(self, book_instance):
+        due = timezone.localdate() + timedelta(days=14)
+        loan = lend_copy(book_instance, "Alice", due, "alice@example.com")
+        book_instance.refresh_from_db()
+        assert book_instance.status == "o"
+        assert list(Loan.objects.open()) == [loan]
+        assert loan.due_back == due
+
+    def test_cannot_lend_unavailable_copy(self, book_instance):
+        lend_copy(book_instance, "Alice", timezone.localdate())
+        with pytest.raises(LoanError):
+            lend_copy(book_instance, "Bob", timezone.localdate())
+        assert Loan.objects.count() == 1
+
+    def test_return_closes_loan(self, book_instance):
+        lend_copy(book_instance, "Alice", timezone.localdate())
+        return_copy(book_instance)
+        book_instance.refresh_from_db()
+        assert book_instance.status == "a"
+        assert not Loan.objects.open().exists()
+        assert Loan.objects.get().returned_at is not None
+
+    def test_cannot_return_copy_not_on_loan(self, book_instance):
+        with pytest.raises(LoanError):
+            return_copy(book_instance)
+        book_instance.refresh_from_db()
+        assert book_instance.status == "a"
+
+    def test_overdue_only_open_loans_past_due(self):
+        today = date(2026, 3, 10)
+        late = Loan.objects.create(instance=BookInstanceFactory(), borrower="A",
+                                   due_back=date(2026, 3, 1))
+        Loan.objects.create(instance=BookInstanceFactory(), borrower="B", due_back=date(2026, 3, 20))
+        Loan.objects.create(instance=BookInstanceFactory(), borrower="C", due_back=date(2026, 3, 1),
+                            returned_at=timezone.now())
+        assert list(Loan.objects.overdue(today)) == [late]
+
+
+@pytest.mark.django_db
+class TestLoanReminders:
+
+    TODAY = date(2026, 3, 10)
+
+    def _loan(self, **kwargs):
+        defaults = dict(instance=BookInstanceFactory(book=BookFactory(title="Dune")),
+                        borrower="Alice", borrower_email="alice@example.com",
+                        due_back=date(2026, 3, 1))
+        defaults.update(kwargs)
+        return Loan.objects.create(**defaults)
+
+    def test_reminds_overdue_borrowers_once_per_interval(self, django_assert_num_queries):
+        loan = self._loan()
+        self._loan(due_back=date(2026, 3, 20))          # not due yet
+        self._loan(borrower_email="")                   # nowhere to send
+        self._loan(returned_at=timezone.now())          # returned
+        with django_assert_num_queries(2):
+            assert send_loan_reminders(self.TODAY) == 1
+        assert len(mail.outbox) == 1
+        assert mail.outbox[0].to == ["alice@example.com"]
+        assert "Dune" in mail.outbox[0].subject
+        loan.refresh_from_db()
+        assert loan.reminded_on == self.TODAY
+
+        assert send_loan_reminders(self.TODAY + timedelta(days=1)) == 0
+        assert send_loan_reminders(self.TODAY + timedelta(days=7)) == 1
+
+    def test_management_command(self):
+        self._loan(due_back=timezone.localdate() - timedelta(days=1))
+        out = StringIO()
+        call_command("send_loan_reminders", stdout=out)
+        assert out.getvalue().strip() == "Sent 1 reminder."
@@ -0,0 +1,150 @@
+"""
+Tests for booklibrary.utils.slow_queries and the slow_queries command.
+"""
+import json
+from io import StringIO
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test.signals import template_rendered
+
+from booklibrary.models import Book
+from booklibrary.utils import slow_queries
+
+from .conftest import AuthorFactory, BookFactory
+
+
+@pytest.fixture
+def log(tmp_path, monkeypatch):
+    """Record every query (threshold 0) to a temporary log; return its records."""
+    path = tmp_path / "slow.jsonl"
+    monkeypatch.setattr(slow_queries, "THRESHOLD_MS", 0)
+    monkeypatch.setattr(slow_queries, "LOG_PATH", str(path))
+
+    def records():
+        return list(slow_queries.read(path)) if path.exists() else []
+    return records
+
+
+class TestNormalise:
+
+    def test_literals_parameters_and_in_lists(self):
+        a = slow_queries.normalise(
+            "SELECT  \"t\".\"id\" FROM t WHERE name = 'O''Brien' AND n > 12.5 AND id IN (%s, %s, %s)")
+        b = slow_queries.normalise("SELECT \"t\".\"id\" FROM t WHERE name = 'x' AND n > 3 AND id IN (%s)")
+        assert a == b == 'SELECT "t"."id" FROM t WHERE name = ? AND n > ? AND id IN (...)'
+        assert slow_queries.shape(a) == slow_queries.shape(b)
+
+    def test_identifiers_with_digits_are_kept(self):
+        assert slow_queries.normalise('SELECT T2."id" FROM "booklibrary_book" T2') == (
+            'SELECT T2."id" FROM "booklibrary_book" T2')
+
+
+@pytest.mark.django_db
+class TestWrapper:
+
+    def test_explain_once_per_shape_then_short_records(self, log):
+        with connection.execute_wrapper(slow_queries.wrapper):
+            Book.objects.filter(pk__in=[1, 2]).count()
+            Book.objects.filter(pk__in=[3]).count()
+        first, second = log()
+        assert first["shape"] == second["shape"]
+        assert "IN (...)" in first["sql"]
+        assert first["explain"] and not first["explain"][0].startswith("EXPLAIN failed")
+        assert "sql" not in second and "explain" not in second
+        assert first["caller"].startswith("booklibrary/tests/test_slow_queries.py:")
+
+    def test_writes_are_recorded_without_explain(self, log):
+        with connection.execute_wrapper(slow_queries.wrapper):
+            AuthorFactory()
+        records = [r for r in log() if r.get("sql", "").startswith("INSERT")]
+        assert records and records[0]["explain"] is None
+
+    def test_fast_queries_are_not_recorded(self, log, monkeypatch):
+        monkeypatch.setattr(slow_queries, "THRESHOLD_MS", 60_000)
+        with connection.execute_wrapper(slow_queries.wrapper):
+            Book.objects.count()
+        assert log() == []
+
+    def test_view_and_template_of_a_request(self, log, client, settings):
+        settings.SLOW_QUERY_MS = 0
+        settings.MIDDLEWARE = ["booklibrary.middleware.SlowQueryMiddleware", *settings.MIDDLEWARE]
+        slow_queries._instrument_templates()
+        BookFactory(authors=[AuthorFactory()])
+        with connection.execute_wrapper(slow_queries.wrapper):
+            client.get("/booklibrary/books/")
+        records = log()
+        assert {r["view"] for r in records} == {"booklibrary:books"}
+        assert "booklibrary/book_list.html > booklibrary/base_menu.html" in {
+            r["template"] for r in records}
+
+
+class TestInstall:
+
+    def test_attaches_to_open_and_new_connections(self):
+        try:
+            slow_queries.install()
+            assert slow_queries.wrapper in connection.execute_wrappers
+        finally:
+            slow_queries.connection_created.disconnect(dispatch_uid="booklibrary_slow_queries")
+            if slow_queries.wrapper in connection.execute_wrappers:
+                connection.execute_wrappers.remove(slow_queries.wrapper)
+
+
+    @pytest.mark.django_db
+    def test_connection_opened_during_a_timed_request(self, log, client, settings):
+        settings.SLOW_QUERY_MS = 0
+        settings.SERVER_TIMING = True
+        settings.MIDDLEWARE = ["booklibrary.middleware.ServerTimingMiddleware",
+                               "booklibrary.middleware.SlowQueryMiddleware", *settings.MIDDLEWARE]
+        BookFactory()
+
+        def reconnect(**kwargs):
+            # As if the database connection had opened during the request.
+            connection_created.send(sender=connection.__class__, connection=connection)
+
+        connection_created.connect(slow_queries._attach, dispatch_uid="test_slow_queries")
+        template_rendered.connect(reconnect, dispatch_uid="test_slow_queries")
+        try:
+            for _ in range(2):
+                assert "Server-Timing" in client.get("/booklibrary/books/")
+                assert connection.execute_wrappers == [slow_queries.wrapper]
+        finally:
+            connection_created.disconnect(dispatch_uid="test_slow_queries")
+            template_rendered.disconnect(dispatch_uid="test_slow_queries")
+            connection.execute_wrappers.clear()
+        assert log()
+
+
+class TestCommand:
+
+    def _log(self, tmp_path, records):
+        path = tmp_path / "slow.jsonl"
+        path.write_text("".join(json.dumps(r) + "\n" for r in records) + "not json\n")
+        return str(path)
+
+    def test_top_offenders_by_total_time(self, tmp_path):
+        path = self._log(tmp_path, [
+            {"shape": "aaa", "ms": 300, "view": "booklibrary:books", "template": None,
+             "caller": "booklibrary/views.py:10 in get", "sql": "SELECT 1", "explain": ["SCAN t"]},
+            {"shape": "aaa", "ms": 250, "view": "booklibrary:books", "template": None, "caller": None},
+            {"shape": "bbb", "ms": 400, "view": "booklibrary:authors", "template": None, "caller": None},
+        ])
+        out = StringIO()
+        call_command("slow_queries", log=[path], explain=True, stdout=out)
+        text = out.getvalue()
+        assert text.index("1. aaa") < text.index("2. bbb")
+        assert "2× slow, 0.55 s total, 275.0 ms mean, 300.0 ms max" in text
+        assert "views: booklibrary:books (2)" in text
+        assert "| SCAN t" in text
+        assert "(SQL not captured)" in text
+
+    def test_needs_a_log(self):
+        if getattr(settings, "SLOW_QUERY_LOG", None):
+            pytest.skip("SLOW_QUERY_LOG is configured")
+        with pytest.raises(CommandError):
+            call_command("slow_queries")
@@ -0,0 +1,94 @@
+"""
+Unit tests for booklibrary.utils.typeahead.
+"""
+import time
+
+import pytest
+
+from booklibrary.utils import typeahead
+
+from .conftest import AuthorFactory, BookFactory, GenreFactory, SeriesFactory
+
+
+def _texts(prefix, **kwargs):
+    return [row["text"] for row in typeahead.suggest(prefix, **kwargs)]
+
+
+@pytest.mark.django_db
+class TestSuggest:
+
+    def test_prefixes_of_every_kind(self):
+        BookFactory(title="The Hobbit", series=SeriesFactory(name="Middle-earth"))
+        AuthorFactory(first_name="J. R. R.", last_name="Tolkien", full_name="J. R. R. Tolkien")
+        GenreFactory(name="High Fantasy")
+        typeahead.clear()
+        assert _texts("hob") == ["The Hobbit"]
+        assert _texts("THE h") == ["The Hobbit"]
+        assert _texts("tolk") == ["Tolkien, J. R. R."]
+        assert _texts("j. r") == ["Tolkien, J. R. R."]
+        assert _texts("middle") == ["Middle-earth"]
+        assert _texts("high f") == ["High Fantasy"]
+        assert _texts("   ") == []
+
+    def test_accents_kinds_and_limit(self):
+        BookFactory(title="Émile")
+        AuthorFactory(first_name="Ralph Waldo", last_name="Emerson", full_name="Ralph Waldo Emerson")
+        for n in range(12):
+            BookFactory(title=f"Emma {n}")
+        typeahead.clear()
+        assert _texts("emi") == ["Émile"]
+        assert _texts("em", kinds=["author"]) == ["Emerson, Ralph Waldo"]
+        assert len(_texts("em")) == typeahead.TYPEAHEAD_LIMIT
+        assert _texts("em", limit=2) == ["Émile", "Emma 0"]
+
+    def test_shorter_matches_first(self):
+        BookFactory(title="Dune Messiah")
+        BookFactory(title="Dune")
+        typeahead.clear()
+        assert _texts("dune") == ["Dune", "Dune Messiah"]
+
+    def test_lookups_after_loading_cost_no_queries(self, django_assert_num_queries):
+        BookFactory(title="Dune")
+        typeahead.clear()
+        with django_assert_num_queries(4):
+            typeahead.suggest("d")
+        with django_assert_num_queries(0):
+            assert _texts("du") == ["Dune"]
+
+    def test_lookup_is_fast_on_a_large_index(self):
+        typeahead._index = {
+            "expires": time.monotonic() + 60,
+            "entries": sorted((f"title {n:06d}", "book", n, f"Title {n:06d}") for n in range(200000)),
+            "keys": {},
+        }
+        start = time.perf_counter()
+        for n in range(100):
+            typeahead.suggest(f"title {n:03d}")
+        assert (time.perf_counter() - start) / 100 < 0.02
+
+
+@pytest.mark.django_db
+class TestIncrementalUpdates:
+
+    def test_save_rename_and_delete(self, django_capture_on_commit_callbacks):
+        typeahead.suggest("x")  # load the (empty) index
+        with django_capture_on_commit_callbacks(execute=True):
+            book = BookFactory(title="Neuromancer")
+        assert _texts("neuro") == ["Neuromancer"]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            book.title = "Count Zero"
+            book.save()
+        assert _texts("neuro") == []
+        assert _texts("count") == ["Count Zero"]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            book.delete()
+        assert _texts("count") == []
+
+    def test_uncommitted_rows_are_not_shared(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks():
+            BookFactory(title="Neuromancer")
+            assert _texts("neuro") == ["Neuromancer"]
+        # The transaction is still open: the index was not kept.
+        assert typeahead._index is None
@@ -5,18 +5,26 @@ Uses Django's RequestFactory throughout so URL routing (and the broken
 library/urls.py) is never involved.  Session and message middleware are
 attached manually via helpers from conftest.py.
 """
+import json
+from datetime import timedelta
 import pytest
 from unittest.mock import patch, MagicMock
 
 from django.contrib.auth.models import AnonymousUser
+from django.db import connection
 from django.http import Http404
-from django.test import RequestFactory
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
 
-from booklibrary.models import Book, Author, BookInstance, Genre, Location
+from booklibrary.api import BookPagination, BookViewSet
+from booklibrary.models import Book, Author, BookInstance, Genre, GoogleVolume, Loan, Location
 from booklibrary.views import (
     index,
     BookListView,
     BookDetailView,
+    MyLibraryView,
     AuthorListView,
     AuthorDetailView,
     LocationListView,
@@ -24,10 +32,23 @@ from booklibrary.views import (
     GenreListView,
     BookSearchView,
     add_book,
+    add_books,
+    autocomplete,
+    AUTOCOMPLETE_PAGE_SIZE,
+    suggest,
+    inventory,
+    scan_session,
+    scan_start,
+    bookinstance_lend,
+    bookinstance_return,
+    loans,
     BookInstanceUpdate,
     BookInstanceDelete,
     get_ip,
+    search_metadata,
 )
+from booklibrary.utils import fuzzy, lookup_cache, scan_sessions, search_cache, typeahead
+from booklibrary.utils.providers import ProviderError
 from booklibrary.utils.google_books import (
     GoogleBooksAuthError,
     GoogleBooksBadRequest,
@@ -208,6 +229,64 @@ class TestBookListView:
         response = BookListView.as_view()(request)
         assert response.status_code == 200
 
+    def test_structured_search(self, rf):
+        tolkien = AuthorFactory(last_name="Tolkien")
+        BookFactory(title="The Hobbit", authors=[tolkien], genre=[GenreFactory(name="Fantasy")])
+        BookFactory(title="The Children of Hurin", authors=[tolkien])
+        response = self._get(rf, '?search=author:tolkien+genre:fantasy+"hobbit"')
+        assert [b.title for b in response.context_data["page_obj"]] == ["The Hobbit"]
+
+    def test_fuzzy_search_ranks_best_match_first(self, rf):
+        BookFactory(title="Brothers in Arms")
+        BookFactory(title="The Brothers Karamazov")
+        fuzzy.rebuild()
+        response = self._get(rf, "?search=brothers+karamasov&fuzzy=1")
+        assert [b.title for b in response.context_data["page_obj"]] == [
+            "The Brothers Karamazov", "Brothers in Arms"]
+        assert response.context_data["fuzzy"]
+
+    def test_fuzzy_search_without_matches(self, rf):
+        BookFactory(title="The Brothers Karamazov")
+        fuzzy.rebuild()
+        response = self._get(rf, "?search=zzzz&fuzzy=1")
+        assert response.status_code == 200
+        assert list(response.context_data["object_list"]) == []
+
+    def test_fuzzy_without_search_lists_every_book(self, rf):
+        BookFactory(title="Neuromancer")
+        BookFactory(title="Dune")
+        response = self._get(rf, "?fuzzy=1&search=+")
+        assert [b.title for b in response.context_data["object_list"]] == ["Dune", "Neuromancer"]
+
+    def test_empty_search_offers_fuzzy_search(self, rf):
+        BookFactory(title="Neuromancer")
+        response = self._get(rf, "?search=neuromancr").render()
+        assert "Try a fuzzy search" in response.content.decode()
+        assert "fuzzy=1" in response.content.decode()
+
+    def test_facet_links_narrow_and_clear(self, rf):
+        poetry = GenreFactory(name="Poetry")
+        BookFactory(title="Odes", genre=[poetry])
+        BookFactory(title="Dune")
+        response = self._get(rf, "?search=o")
+        facet_links = dict(response.context_data["facets"])
+        link = next(i for i in facet_links["genre"] if i["label"] == "Poetry")
+        assert link["count"] == 1 and not link["active"]
+        assert link["url"] == f"?search=o&genre={poetry.pk}"
+
+        response = self._get(rf, link["url"])
+        assert [b.title for b in response.context_data["page_obj"]] == ["Odes"]
+        link = next(i for i in dict(response.context_data["facets"])["genre"] if i["label"] == "Poetry")
+        assert link["active"] and link["url"] == "?search=o"
+
+    def test_facet_filters_use_exists_not_distinct(self, rf):
+        BookInstanceFactory(status="o")
+        with CaptureQueriesContext(connection) as ctx:
+            self._get(rf, "?status=o").render()
+        listing = [q["sql"] for q in ctx.captured_queries
+                   if q["sql"].startswith('SELECT "booklibrary_book"."id"')]
+        assert listing and all("DISTINCT" not in sql for sql in listing)
+
 
 # ── BookDetailView ────────────────────────────────────────────────────────────
 
@@ -228,6 +307,51 @@ class TestBookDetailView:
             BookDetailView.as_view()(request, pk=99999)
 
 
+# ── MyLibraryView ─────────────────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestMyLibraryView:
+
+    def _get(self, rf, user, query=""):
+        request = rf.get(f"/booklibrary/mine/?{query}")
+        setup_request(request, user=user)
+        return MyLibraryView.as_view()(request)
+
+    def test_login_required(self, rf):
+        request = rf.get("/booklibrary/mine/")
+        request.user = AnonymousUser()
+        assert MyLibraryView.as_view()(request).status_code == 302
+
+    def test_lists_only_own_books_once(self, rf, user, other_user):
+        mine = BookFactory(title="Dune")
+        BookInstanceFactory.create_batch(2, owner=user, book=mine)
+        BookInstanceFactory(owner=other_user, book=BookFactory(title="Emma"))
+        response = self._get(rf, user)
+        assert list(response.context_data["object_list"]) == [mine]
+        response.render()
+        assert b"Dune" in response.content
+        assert b"Emma" not in response.content
+
+    def test_search_and_counts(self, rf, user):
+        attic = LocationFactory(name="Attic")
+        BookInstanceFactory(owner=user, book=BookFactory(title="Dune"), location=attic)
+        BookInstanceFactory(owner=user, book=BookFactory(title="Emma"), status="o")
+        response = self._get(rf, user, "search=dun")
+        assert [b.title for b in response.context_data["object_list"]] == ["Dune"]
+        assert response.context_data["counts"]["copies"] == 2
+        response.render()
+        assert b"On loan: 1" in response.content
+        assert b"Attic" in response.content
+
+    def test_no_distinct_join(self, rf, user):
+        BookInstanceFactory(owner=user)
+        with CaptureQueriesContext(connection) as ctx:
+            self._get(rf, user).render()
+        book_queries = [q["sql"] for q in ctx.captured_queries if 'FROM "booklibrary_book"' in q["sql"]]
+        assert book_queries
+        assert all("DISTINCT" not in sql and "EXISTS" in sql for sql in book_queries)
+
+
 # ── AuthorListView ────────────────────────────────────────────────────────────
 
 @pytest.mark.django_db
@@ -283,6 +407,20 @@ class TestAuthorDetailView:
         with pytest.raises(Http404):
             AuthorDetailView.as_view()(request, pk=99999)
 
+    @pytest.mark.parametrize("location", [False, True])
+    def test_book_copies_in_constant_queries(self, rf, location):
+        author = AuthorFactory()
+        two, one = BookFactory(authors=[author]), BookFactory(authors=[author])
+        BookInstanceFactory.create_batch(2, book=two)
+        BookInstanceFactory(book=one)
+        request = rf.get(f"/booklibrary/author/{author.pk}")
+        setup_request(request, session_data={"location": location})
+        with CaptureQueriesContext(connection) as queries:
+            response = AuthorDetailView.as_view()(request, pk=author.pk).render()
+        assert len(queries) == (3 if location else 2)
+        text = " ".join(response.content.decode().split())
+        assert location or ("2 copies" in text and "1 copy" in text)
+
 
 # ── LocationListView ──────────────────────────────────────────────────────────
 
@@ -475,6 +613,31 @@ class TestBookSearchView:
         # Stale pk → no matching Location → initial is None, no crash
         assert form.initial.get("book_location") is None
 
+    @patch("booklibrary.views.search_books")
+    def test_results_page_renders_without_lookup_queries_once_warm(self, mock_search, rf):
+        """The per-result shelving forms read every lookup table from lookup_cache."""
+        location = LocationFactory()
+        GenreFactory(name="Fantasy")
+        SeriesFactory()
+        KeywordsFactory()
+        lookup_cache.clear()
+        mock_search.return_value = ([_fake_book(volume_id=f"v{i}") for i in range(5)], 5)
+
+        def render():
+            request = rf.post("/booklibrary/book/search/", {"search": "test"})
+            setup_request(request, session_data={
+                "repeat_genre": "fantasy", "repeat_location": location.pk})
+            return BookSearchView.as_view()(request).render()
+
+        render()
+        with CaptureQueriesContext(connection) as ctx:
+            response = render()
+        tables = ("booklibrary_genre", "booklibrary_location",
+                  "booklibrary_series", "booklibrary_keywords")
+        assert not [q["sql"] for q in ctx.captured_queries
+                    if any(t in q["sql"] for t in tables)]
+        assert b"Fantasy" in response.content
+
     @patch("booklibrary.views.search_books")
     def test_fetch_books_annotates_owned_books(self, mock_search, rf):
         """_fetch_books() sets is_owned=True for volume_ids already in the DB."""
@@ -492,6 +655,101 @@ class TestBookSearchView:
         assert owned["owned-vol"] is True
         assert owned["new-vol"] is False
 
+    @patch("booklibrary.views.search_books")
+    def test_google_error_falls_back_to_stored_volumes(self, mock_search, rf):
+        """When Google fails, volumes stored by earlier searches are shown instead."""
+        GoogleVolume.objects.create(
+            volume_id="dune-1", fetched_at=timezone.now(),
+            data={"id": "dune-1", "volumeInfo": {"title": "Dune"}},
+        )
+        mock_search.side_effect = GoogleBooksError("down")
+        request = rf.post("/booklibrary/book/search/", {"search": "dune"})
+        setup_request(request)
+        response = BookSearchView.as_view()(request)
+
+        assert response.template_name == "booklibrary/book_results.html"
+        assert [b["volume_id"] for b in request.session["google_books_results"]] == ["dune-1"]
+        assert any("earlier searches" in m for m in get_messages(request))
+
+    @patch("booklibrary.views.search_books")
+    def test_bad_request_does_not_fall_back(self, mock_search, rf):
+        GoogleVolume.objects.create(
+            volume_id="dune-1", fetched_at=timezone.now(),
+            data={"id": "dune-1", "volumeInfo": {"title": "Dune"}},
+        )
+        mock_search.side_effect = GoogleBooksBadRequest("bad")
+        request = rf.post("/booklibrary/book/search/", {"search": "dune"})
+        setup_request(request)
+        response = BookSearchView.as_view()(request)
+
+        assert response.template_name == ["booklibrary/book_search.html"]
+
+    @patch("booklibrary.views.search_books")
+    def test_page_param_requests_matching_start_index(self, mock_search, rf):
+        mock_search.return_value = ([_fake_book()], 25)
+        request = rf.post("/booklibrary/book/search/", {"search": "dune", "page": "3"})
+        setup_request(request)
+        response = BookSearchView.as_view()(request)
+
+        assert mock_search.call_args[1]["start_index"] == 20
+        assert response.context_data["page"] == 3
+        assert response.context_data["first_index"] == 21
+
+    @patch("booklibrary.views.search_books")
+    def test_cached_page_served_without_calling_google(self, mock_search, rf):
+        search_cache.set_results("dune", 10, 10, ([_fake_book(volume_id="p2")], 15))
+        request = rf.post("/booklibrary/book/search/", {"search": "dune", "page": "2"})
+        setup_request(request)
+        BookSearchView.as_view()(request)
+
+        mock_search.assert_not_called()
+        assert request.session["google_books_results"][0]["volume_id"] == "p2"
+
+    @patch("booklibrary.views.search_cache.prefetch")
+    @patch("booklibrary.views.search_books")
+    def test_full_page_prefetches_next_page(self, mock_search, mock_prefetch, rf):
+        mock_search.return_value = ([_fake_book(volume_id=f"v{i}") for i in range(10)], 25)
+        request = rf.post("/booklibrary/book/search/", {"search": "dune"})
+        setup_request(request)
+        response = BookSearchView.as_view()(request)
+
+        assert response.context_data["has_next"] is True
+        mock_prefetch.assert_called_once_with(search_metadata, "dune", 10, 10)
+
+    @patch("booklibrary.views.search_cache.prefetch")
+    @patch("booklibrary.views.search_books")
+    def test_last_page_does_not_prefetch(self, mock_search, mock_prefetch, rf):
+        mock_search.return_value = ([_fake_book()], 21)
+        request = rf.post("/booklibrary/book/search/", {"search": "dune", "page": "3"})
+        setup_request(request)
+        response = BookSearchView.as_view()(request)
+
+        assert response.context_data["has_next"] is False
+        mock_prefetch.assert_not_called()
+
+    @override_settings(BOOK_METADATA_PROVIDERS=["google", "openlibrary"])
+    @patch("booklibrary.views.fan_out_search")
+    def test_several_providers_use_fan_out(self, mock_fan_out, rf):
+        mock_fan_out.return_value = ([_fake_book(volume_id="openlibrary:/works/OL1W")], 1)
+        request = rf.post("/booklibrary/book/search/", {"search": "dune"})
+        setup_request(request)
+        BookSearchView.as_view()(request)
+
+        providers = mock_fan_out.call_args[0][0]
+        assert [p.name for p in providers] == ["google", "openlibrary"]
+        assert request.session["google_books_results"][0]["volume_id"] == "openlibrary:/works/OL1W"
+
+    @override_settings(BOOK_METADATA_PROVIDERS=["google", "openlibrary"])
+    @patch("booklibrary.views.fan_out_search")
+    def test_fan_out_failure_shows_error_message(self, mock_fan_out, rf):
+        mock_fan_out.side_effect = ProviderError("nobody answered")
+        request = rf.post("/booklibrary/book/search/", {"search": "dune"})
+        setup_request(request)
+        response = BookSearchView.as_view()(request)
+
+        assert response.template_name == ["booklibrary/book_search.html"]
+        assert any("unexpected error" in m for m in get_messages(request))
+
 
 # ── add_book ──────────────────────────────────────────────────────────────────
 
@@ -633,6 +891,31 @@ class TestAddBookView:
 
         assert 'repeat_location' not in request.session
 
+    @patch("booklibrary.views.AddForm")
+    def test_post_expired_session_uses_stored_volume(self, MockForm, rf, user):
+        """Without session results, the submitted uniqueID is read from GoogleVolume."""
+        GoogleVolume.objects.create(
+            volume_id="dune-1", fetched_at=timezone.now(),
+            data={"id": "dune-1", "volumeInfo": {"title": "Dune", "authors": ["Frank Herbert"]}},
+        )
+        mock_form = MagicMock()
+        mock_form.is_valid.return_value = True
+        mock_form.cleaned_data = {
+            "book_genre": Genre.objects.none(),
+            "book_location": None,
+            "book_keywords": None,
+            "book_series": None,
+            "uniqueID": "dune-1",
+        }
+        MockForm.return_value = mock_form
+
+        request = rf.post("/booklibrary/book/add/", {"book_index": "0"})
+        setup_request(request, user=user)
+        response = add_book(request)
+
+        assert response.status_code == 302
+        assert Book.objects.filter(uniqueID="dune-1", title="Dune").exists()
+
     @patch("booklibrary.views.AddForm")
     def test_post_invalid_form_rerenders_results(self, MockForm, rf, user):
         mock_form = MagicMock()
@@ -645,6 +928,365 @@ class TestAddBookView:
         assert response.status_code == 200
 
 
+# ── add_books ─────────────────────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestAddBooksView:
+
+    def _session(self):
+        return {"google_books_results": [
+            _fake_book(title="Dune", volume_id="dune-1", author1="Frank Herbert"),
+            _fake_book(title="Emma", volume_id="emma-1", author1="Jane Austen"),
+            _fake_book(title="Ulysses", volume_id="ulysses-1", author1="James Joyce"),
+        ]}
+
+    def test_anonymous_redirects_to_login(self, rf):
+        request = rf.post("/booklibrary/book/add/selected/", {})
+        setup_request(request, user=AnonymousUser())
+        response = add_books(request)
+        assert response.status_code == 302
+        assert "/accounts/login/" in response["Location"]
+
+    def test_get_redirects_to_search(self, rf, user):
+        request = rf.get("/booklibrary/book/add/selected/")
+        setup_request(request, user=user)
+        response = add_books(request)
+        assert response.status_code == 302
+
+    def test_selected_books_created_with_shared_location(self, rf, user):
+        location = LocationFactory()
+        request = rf.post("/booklibrary/book/add/selected/", {
+            "bulk-book_indices": ["0", "2"],
+            "bulk-book_location": str(location.pk),
+        })
+        setup_request(request, user=user, session_data=self._session())
+        response = add_books(request)
+
+        assert response.status_code == 302
+        assert set(Book.objects.values_list("title", flat=True)) == {"Dune", "Ulysses"}
+        assert BookInstance.objects.filter(owner=user, location=location).count() == 2
+        assert request.session["repeat_location"] == location.pk
+        assert any("Added 2 books" in m for m in get_messages(request))
+
+    def test_duplicates_reported(self, rf, user):
+        BookFactory(uniqueID="dune-1")
+        request = rf.post("/booklibrary/book/add/selected/", {"bulk-book_indices": ["0", "1"]})
+        setup_request(request, user=user, session_data=self._session())
+        add_books(request)
+        assert any("1 of them were already" in m for m in get_messages(request))
+
+    def test_no_selection_shows_error(self, rf, user):
+        request = rf.post("/booklibrary/book/add/selected/", {})
+        setup_request(request, user=user, session_data=self._session())
+        response = add_books(request)
+
+        assert response.status_code == 302
+        assert not Book.objects.exists()
+        assert any("Select at least one book" in m for m in get_messages(request))
+
+    def test_invalid_shelving_choice_shows_error(self, rf, user):
+        request = rf.post("/booklibrary/book/add/selected/", {
+            "bulk-book_indices": ["0"],
+            "bulk-book_location": "999999",
+        })
+        setup_request(request, user=user, session_data=self._session())
+        response = add_books(request)
+
+        assert response.status_code == 302
+        assert not Book.objects.exists()
+        assert any(m.startswith("Book location: Select a valid choice") for m in get_messages(request))
+
+    def test_missing_session_results_shows_error(self, rf, user):
+        request = rf.post("/booklibrary/book/add/selected/", {"bulk-book_indices": ["0"]})
+        setup_request(request, user=user)
+        add_books(request)
+
+        assert not Book.objects.exists()
+        assert any("search again" in m for m in get_messages(request))
+
+    @patch("booklibrary.views.search_books")
+    def test_results_page_renders_bulk_form(self, mock_search, rf):
+        mock_search.return_value = ([_fake_book(), _fake_book(volume_id="ID2")], 2)
+        request = rf.post("/booklibrary/book/search/", {"search": "test"})
+        setup_request(request)
+        response = BookSearchView.as_view()(request)
+        response.render()
+
+        assert response.context_data["bulk_form"].prefix == "bulk"
+        assert b'name="bulk-book_indices" value="1"' in response.content
+
+
+# ── autocomplete ──────────────────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestAutocompleteView:
+
+    def _request(self, rf, user, kind, **params):
+        request = rf.get(f"/booklibrary/autocomplete/{kind}/", params)
+        return setup_request(request, user=user)
+
+    def _get(self, rf, user, kind, **params):
+        return autocomplete(self._request(rf, user, kind, **params), kind=kind)
+
+    def _json(self, response):
+        return json.loads(response.content)
+
+    def test_prefix_match_ignores_case(self, rf, user):
+        fantasy = GenreFactory(name="Fantasy")
+        GenreFactory(name="Science Fantasy")
+        GenreFactory(name="Horror")
+        data = self._json(self._get(rf, user, "genre", q="fan"))
+        assert data["results"] == [{"id": fantasy.pk, "text": "Fantasy"}]
+        assert data["pagination"] == {"more": False}
+
+    def test_author_matches_last_or_full_name(self, rf, user):
+        herbert = AuthorFactory(first_name="Frank", last_name="Herbert", full_name="Frank Herbert")
+        AuthorFactory(first_name="Isaac", last_name="Asimov", full_name="Isaac Asimov")
+        assert [r["id"] for r in self._json(self._get(rf, user, "author", q="her"))["results"]] == [herbert.pk]
+        assert [r["id"] for r in self._json(self._get(rf, user, "author", q="frank h"))["results"]] == [herbert.pk]
+
+    def test_paginated(self, rf, user):
+        for i in range(AUTOCOMPLETE_PAGE_SIZE + 5):
+            KeywordsFactory(name=f"Topic {i:02d}")
+        first = self._json(self._get(rf, user, "keywords", q="topic"))
+        second = self._json(self._get(rf, user, "keywords", q="topic", page=2))
+        assert len(first["results"]) == AUTOCOMPLETE_PAGE_SIZE
+        assert first["pagination"]["more"] is True
+        assert len(second["results"]) == 5
+        assert second["pagination"]["more"] is False
+
+    def test_bad_page_treated_as_first(self, rf, user):
+        SeriesFactory(name="Dune")
+        data = self._json(self._get(rf, user, "series", page="x"))
+        assert [r["text"] for r in data["results"]] == ["Dune"]
+
+    def test_single_query(self, rf, user, django_assert_num_queries):
+        LocationFactory(name="Attic")
+        request = self._request(rf, user, "location", q="at")
+        with django_assert_num_queries(1):
+            autocomplete(request, kind="location")
+
+    def test_unknown_kind_404(self, rf, user):
+        with pytest.raises(Http404):
+            self._get(rf, user, "book")
+
+    def test_anonymous_redirects_to_login(self, rf):
+        assert self._get(rf, AnonymousUser(), "genre").status_code == 302
+
+
+# ── suggest (typeahead) ───────────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestSuggestView:
+
+    def _json(self, rf, **params):
+        request = setup_request(rf.get("/booklibrary/typeahead/", params))
+        return json.loads(suggest(request).content)
+
+    def test_suggestions_link_to_their_pages(self, rf):
+        dune = BookFactory(title="Dune")
+        herbert = AuthorFactory(first_name="Frank", last_name="Herbert", full_name="Frank Herbert")
+        series = SeriesFactory(name="Dune Chronicles")
+        typeahead.clear()
+        assert self._json(rf, q="du")["results"] == [
+            {"kind": "book", "id": dune.pk, "text": "Dune", "url": f"/booklibrary/book/{dune.pk}"},
+            {"kind": "series", "id": series.pk, "text": "Dune Chronicles",
+             "url": f"/booklibrary/books/?series={series.pk}"},
+        ]
+        assert [r["id"] for r in self._json(rf, q="frank", kinds="author,bogus")["results"]] == [herbert.pk]
+
+    def test_open_to_anonymous_users_and_blank_query(self, rf):
+        assert self._json(rf, q="")["results"] == []
+
+
+# ── inventory ─────────────────────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestInventoryView:
+
+    @pytest.fixture
+    def staff(self):
+        return UserFactory(is_staff=True)
+
+    def _call(self, rf, user, method="get", query="", data=None):
+        url = f"/booklibrary/inventory/?{query}"
+        request = rf.post(url, data or {}) if method == "post" else rf.get(url)
+        setup_request(request, user=user)
+        return inventory(request)
+
+    def test_non_staff_redirected(self, rf, user):
+        assert self._call(rf, user).status_code == 302
+
+    def test_lists_filtered_copies(self, rf, staff):
+        attic = LocationFactory(name="Attic")
+        BookInstanceFactory(location=attic, book=BookFactory(title="Dune"))
+        BookInstanceFactory(book=BookFactory(title="Emma"))
+        response = self._call(rf, staff, query=f"location={attic.pk}")
+        assert response.status_code == 200
+        assert b"Dune" in response.content
+        assert b"Emma" not in response.content
+
+    def test_apply_to_ticked(self, rf, staff):
+        target = LocationFactory()
+        ticked, unticked = BookInstanceFactory(), BookInstanceFactory()
+        request_data = {"instances": [str(ticked.pk)], "new_location": target.pk}
+        response = self._call(rf, staff, "post", data=request_data)
+        assert response.status_code == 302
+        ticked.refresh_from_db()
+        unticked.refresh_from_db()
+        assert ticked.location == target
+        assert unticked.location != target
+
+    def test_apply_to_all_matches(self, rf, staff):
+        attic = LocationFactory()
+        BookInstanceFactory.create_batch(3, location=attic, status="a")
+        BookInstanceFactory(status="a")
+        response = self._call(rf, staff, "post", query=f"location={attic.pk}",
+                              data={"apply_to": "all", "new_status": "r"})
+        assert response["Location"] == f"/booklibrary/inventory/?location={attic.pk}"
+        assert BookInstance.objects.filter(status="r").count() == 3
+
+    def test_requires_a_change(self, rf, staff):
+        bi = BookInstanceFactory()
+        request = rf.post("/booklibrary/inventory/", {"instances": [str(bi.pk)]})
+        setup_request(request, user=staff)
+        inventory(request)
+        assert "Choose a new location, status or owner." in get_messages(request)
+
+    def test_requires_a_selection(self, rf, staff):
+        request = rf.post("/booklibrary/inventory/", {"new_status": "l"})
+        setup_request(request, user=staff)
+        inventory(request)
+        assert any("Tick the copies" in m for m in get_messages(request))
+
+    def test_invalid_filter_changes_nothing(self, rf, staff):
+        BookInstanceFactory.create_batch(2, status="a")
+        request = rf.post("/booklibrary/inventory/?location=999999",
+                          {"apply_to": "all", "new_status": "r"})
+        setup_request(request, user=staff)
+        response = inventory(request)
+        assert response.status_code == 302
+        assert not BookInstance.objects.filter(status="r").exists()
+        assert "Fix the filters before changing copies." in get_messages(request)
+
+    def test_malformed_instance_ids(self, rf, staff):
+        bi = BookInstanceFactory(status="a")
+        request = rf.post("/booklibrary/inventory/",
+                          {"instances": [str(bi.pk), "not-a-uuid"], "new_status": "r"})
+        setup_request(request, user=staff)
+        response = inventory(request)
+        assert response.status_code == 302
+        bi.refresh_from_db()
+        assert bi.status == "a"
+        assert "Invalid copy selection." in get_messages(request)
+
+
+# ── scan_start / scan_session ─────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestScanViews:
+
+    def test_start_opens_session(self, rf, user):
+        target = LocationFactory()
+        request = rf.post("/booklibrary/scan/", {"location": target.pk})
+        setup_request(request, user=user)
+        response = scan_start(request)
+        assert response.status_code == 302
+        session_id = response["Location"].rstrip("/").rsplit("/", 1)[-1]
+        assert scan_sessions.get(session_id, user)["location_id"] == target.pk
+
+    def _post(self, rf, user, session_id, data):
+        request = rf.post(f"/booklibrary/scan/{session_id}/", data)
+        setup_request(request, user=user)
+        return request, scan_session(request, session_id=session_id)
+
+    def test_scan_then_finish(self, rf, user):
+        target = LocationFactory(name="Study")
+        bi = BookInstanceFactory(owner=user)
+        session = scan_sessions.start(user, target)
+        self._post(rf, user, session["id"], {"codes": f"{bi.pk}, bogus"})
+
+        request = rf.get(f"/booklibrary/scan/{session['id']}/")
+        setup_request(request, user=user)
+        response = scan_session(request, session_id=session["id"])
+        assert b"Scanning to Study" in response.content
+
+        request, response = self._post(rf, user, session["id"], {"finish": "1"})
+        assert response["Location"] == "/booklibrary/scan/"
+        texts = [str(m) for m in get_messages(request)]
+        assert "Moved 1 copy to Study." in texts
+        assert "Not found: bogus" in texts
+        bi.refresh_from_db()
+        assert bi.location == target
+
+    def test_other_users_session_is_404(self, rf, user, other_user):
+        session = scan_sessions.start(user, LocationFactory())
+        request = rf.get(f"/booklibrary/scan/{session['id']}/")
+        setup_request(request, user=other_user)
+        with pytest.raises(Http404):
+            scan_session(request, session_id=session["id"])
+
+
+# ── Loans ─────────────────────────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestLoanViews:
+
+    def _request(self, rf, user, url, data=None):
+        request = rf.post(url, data or {}) if data is not None else rf.get(url)
+        setup_request(request, user=user)
+        return request
+
+    def test_lend(self, rf, user, book_instance):
+        due = (timezone.localdate() + timedelta(days=7)).isoformat()
+        request = self._request(rf, user, "/lend/", {"borrower": "Alice", "due_back": due})
+        response = bookinstance_lend(request, pk=book_instance.pk)
+        assert response.status_code == 302
+        assert Loan.objects.open().get().borrower == "Alice"
+        book_instance.refresh_from_db()
+        assert book_instance.status == "o"
+
+    def test_lend_unavailable_copy_shows_error(self, rf, user):
+        bi = BookInstanceFactory(owner=user, status="l")
+        due = timezone.localdate().isoformat()
+        request = self._request(rf, user, "/lend/", {"borrower": "Alice", "due_back": due})
+        response = bookinstance_lend(request, pk=bi.pk)
+        assert response.status_code == 200
+        assert b"not available" in response.content
+        assert not Loan.objects.exists()
+
+    def test_lend_others_copy_is_404(self, rf, user, other_user):
+        bi = BookInstanceFactory(owner=other_user)
+        with pytest.raises(Http404):
+            bookinstance_lend(self._request(rf, user, "/lend/"), pk=bi.pk)
+
+    def test_return(self, rf, user, book_instance):
+        Loan.objects.create(instance=book_instance, borrower="Alice", due_back=timezone.localdate())
+        BookInstance.objects.filter(pk=book_instance.pk).update(status="o")
+        request = self._request(rf, user, "/return/", {"next": "https://evil.example/"})
+        response = bookinstance_return(request, pk=book_instance.pk)
+        assert response["Location"] == "/booklibrary/loans/"
+        assert not Loan.objects.open().exists()
+
+    def test_list_overdue_and_by_borrower(self, rf, user, other_user):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        later = timezone.localdate() + timedelta(days=7)
+        Loan.objects.create(instance=BookInstanceFactory(owner=user, book=BookFactory(title="Dune")),
+                            borrower="Alice", due_back=yesterday)
+        Loan.objects.create(instance=BookInstanceFactory(owner=user, book=BookFactory(title="Emma")),
+                            borrower="Bob", due_back=later)
+        Loan.objects.create(instance=BookInstanceFactory(owner=other_user, book=BookFactory(title="Ulysses")),
+                            borrower="Alice", due_back=yesterday)
+
+        content = loans(self._request(rf, user, "/loans/")).content
+        assert b"Dune" in content and b"Emma" in content
+        assert b"Ulysses" not in content
+        content = loans(self._request(rf, user, "/loans/?overdue=1")).content
+        assert b"Dune" in content and b"Emma" not in content
+        content = loans(self._request(rf, user, "/loans/?borrower=Bob")).content
+        assert b"Emma" in content and b"Dune" not in content
+
+
 # ── BookInstanceUpdate / BookInstanceDelete (OwnerUpdateView/OwnerDeleteView) ─
 
 @pytest.mark.django_db
@@ -713,3 +1355,31 @@ class TestGetIpView:
         response = get_ip(request)
         assert response.status_code == 302
         assert "/accounts/login/" in response["Location"]
+
+
+@pytest.mark.django_db
+class TestSitemap:
+
+    def test_lists_every_book_without_loading_rows(self, client):
+        books = [BookFactory(), BookFactory()]
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get("/booklibrary/sitemap.xml")
+        assert response.status_code == 200
+        for book in books:
+            assert f"/booklibrary/book/{book.pk}</loc>".encode() in response.content
+        assert all('"booklibrary_book"."title"' not in q["sql"] for q in queries)
+
+
+# ── BookViewSet ───────────────────────────────────────────────────────────────
+
+@pytest.mark.django_db
+class TestBookApi:
+
+    def test_list_is_paginated(self, user):
+        BookFactory.create_batch(3)
+        request = APIRequestFactory().get("/api/books/")
+        force_authenticate(request, user=user)
+        with patch.object(BookPagination, "page_size", 2):
+            response = BookViewSet.as_view({"get": "list"})(request)
+        assert response.data["count"] == 3
+        assert len(response.data["results"]) == 2 and response.data["next"]
@@ -5,24 +5,34 @@ Minimal URLconf for the test suite.  Replaces the broken library/urls.py
 from django.contrib import admin
 from django.urls import include, path
 
-from booklibrary import views
+from rest_framework.routers import SimpleRouter
+
+from booklibrary import api, views
 from booklibrary.sitemaps import BookSitemap
 from django.contrib.sitemaps.views import sitemap
 
 sitemaps_dict = {"books": BookSitemap}
 
+router = SimpleRouter()
+router.register("scan-sessions", api.ScanSessionViewSet, basename="scansession")
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("accounts/", include("django.contrib.auth.urls")),
+    path("metrics", views.metrics_endpoint, name="metrics"),
 
     # All booklibrary routes under /booklibrary/ so that get_absolute_url()
     # results (e.g. /booklibrary/author/<pk>) match what the models produce.
     path("booklibrary/", include(([
         path("", views.index, name="index"),
         path("books/", views.BookListView.as_view(), name="books"),
+        path("mine/", views.MyLibraryView.as_view(), name="my-library"),
         path("book/<int:pk>", views.BookDetailView.as_view(), name="book-detail"),
         path("book/search/", views.BookSearchView.as_view(), name="book-search"),
+        path("autocomplete/<slug:kind>/", views.autocomplete, name="autocomplete"),
+        path("typeahead/", views.suggest, name="typeahead"),
         path("book/add/", views.add_book, name="book-add"),
+        path("book/add/selected/", views.add_books, name="book-add-selected"),
         path("book/<int:pk>/update/", views.BookUpdate.as_view(), name="book-update"),
         path("book/<int:pk>/delete/", views.BookDelete.as_view(), name="book-delete"),
         path("authors/", views.AuthorListView.as_view(), name="authors"),
@@ -38,6 +48,13 @@ urlpatterns = [
         path("genre/", views.GenreListView.as_view(), name="genre"),
         path("bookinstance/<uuid:pk>/update/", views.BookInstanceUpdate.as_view(), name="bookinstance-update"),
         path("bookinstance/<uuid:pk>/delete/", views.BookInstanceDelete.as_view(), name="bookinstance-delete"),
+        path("inventory/", views.inventory, name="inventory"),
+        path("bookinstance/<uuid:pk>/lend/", views.bookinstance_lend, name="bookinstance-lend"),
+        path("bookinstance/<uuid:pk>/return/", views.bookinstance_return, name="bookinstance-return"),
+        path("loans/", views.loans, name="loans"),
+        path("scan/", views.scan_start, name="scan"),
+        path("scan/<str:session_id>/", views.scan_session, name="scan-session"),
+        path("api/", include(router.urls)),
         path("ip/", views.get_ip),
         path("sitemap.xml", sitemap, {"sitemaps": sitemaps_dict},
              name="django.contrib.sitemaps.views.sitemap"),
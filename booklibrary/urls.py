@@ -5,6 +5,7 @@ Browse / search
 ---------------
   ''                  index                 Home page
   books/              BookListView          Paginated book catalogue
+  mine/               MyLibraryView         The current user's books and counts (login)
   book/<pk>           BookDetailView        Single-book detail
   authors/            AuthorListView        Paginated author list
   locations/          LocationListView      Paginated location list
@@ -12,6 +13,8 @@ Browse / search
   location/<pk>       LocationDetailView    Location detail with BookInstances
   author/<pk>         AuthorDetailView      Author detail
   book/search/        BookSearchView        Google Books search
+  autocomplete/<kind>/ autocomplete         JSON options for autocomplete widgets
+  typeahead/          suggest               JSON typeahead suggestions for the search boxes
 
 Author CRUD (login / permission required)
 -----------------------------------------
@@ -28,6 +31,7 @@ Location CRUD (login / permission required)
 Book CRUD (login / permission required)
 ----------------------------------------
   book/add/           Save a book chosen from Google Books results
+  book/add/selected/  Save several selected Google Books results at once
   book/<pk>/update/
   book/<pk>/delete/
 
@@ -35,6 +39,16 @@ BookInstance CRUD (login required, owner only)
 ----------------------------------------------
   bookinstance/<uuid:pk>/update/
   bookinstance/<uuid:pk>/delete/
+  inventory/    Staff-only bulk changes to copies (location / status / owner)
+  bookinstance/<uuid:pk>/lend/    Lend a copy (owner only)
+  bookinstance/<uuid:pk>/return/  Record a copy's return (owner only, POST)
+  loans/        Open loans; ?overdue=1, ?borrower=<name>
+  scan/         Start a scan session: move copies by scanning their ids
+  scan/<session_id>/  Scan ids into an open session
+
+REST API (login required)
+-------------------------
+  api/scan-sessions/  ScanSessionViewSet (see booklibrary/api.py)
 
 Miscellaneous
 -------------
@@ -43,7 +57,8 @@ Miscellaneous
   sitemap.xml   XML sitemap for all Book pages
 """
 from django.urls import path, include, re_path
-from . import views
+from rest_framework.routers import SimpleRouter
+from . import api, views
 from django.contrib.sitemaps.views import sitemap
 from .sitemaps import BookSitemap
 
@@ -54,6 +69,7 @@ sitemaps_dict = {
 urlpatterns = [
     path('', views.index, name='index'),
     path('books/', views.BookListView.as_view(), name='books'),
+    path('mine/', views.MyLibraryView.as_view(), name='my-library'),
     path('book/<int:pk>', views.BookDetailView.as_view(), name='book-detail'),
     path('authors/', views.AuthorListView.as_view(), name='authors'),
     path('locations/', views.LocationListView.as_view(), name='locations'),
@@ -61,6 +77,8 @@ urlpatterns = [
     path('location/<int:pk>', views.LocationDetailView.as_view(), name='location-detail'),
     path('author/<int:pk>', views.AuthorDetailView.as_view(), name='author-detail'),
     path('book/search/', views.BookSearchView.as_view(), name='book-search'),
+    path('autocomplete/<slug:kind>/', views.autocomplete, name='autocomplete'),
+    path('typeahead/', views.suggest, name='typeahead'),
     path("ip/", views.get_ip),
     re_path(r'^robots\.txt', include('robots.urls')),
     path('sitemap.xml', sitemap, {'sitemaps': sitemaps_dict},
@@ -84,6 +102,7 @@ urlpatterns += [
 # Book CRUD
 urlpatterns += [
     path('book/add/', views.add_book, name='book-add'),
+    path('book/add/selected/', views.add_books, name='book-add-selected'),
     path('book/<int:pk>/update/', views.BookUpdate.as_view(), name='book-update'),
     path('book/<int:pk>/delete/', views.BookDelete.as_view(), name='book-delete'),
 ]
@@ -92,4 +111,17 @@ urlpatterns += [
 urlpatterns += [
     path('bookinstance/<uuid:pk>/update/', views.BookInstanceUpdate.as_view(), name='bookinstance-update'),
     path('bookinstance/<uuid:pk>/delete/', views.BookInstanceDelete.as_view(), name='bookinstance-delete'),
+    path('inventory/', views.inventory, name='inventory'),
+    path('bookinstance/<uuid:pk>/lend/', views.bookinstance_lend, name='bookinstance-lend'),
+    path('bookinstance/<uuid:pk>/return/', views.bookinstance_return, name='bookinstance-return'),
+    path('loans/', views.loans, name='loans'),
+    path('scan/', views.scan_start, name='scan'),
+    path('scan/<str:session_id>/', views.scan_session, name='scan-session'),
+]
+
+# REST API
+router = SimpleRouter()
+router.register('scan-sessions', api.ScanSessionViewSet, basename='scansession')
+urlpatterns += [
+    path('api/', include(router.urls)),
 ]
@@ -0,0 +1,335 @@
+"""
+View benchmarks over a synthetic catalogue, compared with a stored baseline.
+
+scenarios() builds the list of requests worth timing against the catalogue
+in the database (see utils/catalogue.py): the book list plain, on a deep
+page, in each search mode, fuzzy, with dups and with a facet; the detail
+pages of the busiest book, author and shelf; a Google search answered by a
+local stand-in server (utils/standin.py); adding a book from its results;
+the REST API's BookViewSet; and the listings that can grow with the
+catalogue: the author list, the staff inventory and the sitemap.  The
+busiest rows are chosen on purpose: an N+1 shows up as queries per book on
+the author page, per copy on the shelf page.
+
+run() requests each scenario once to warm the caches, then repeat times
+(fewer once a time budget is spent) recording wall time and query count,
+then once more under tracemalloc (utils/profiling.py) for the peak
+allocation.  Scenarios that write (adding a book) run each time inside a
+savepoint that is rolled back, so every run does the same work.
+memory_profile() repeats one scenario under the memory profiler, for the
+lines behind a peak.
+
+compare() checks results against a baseline written by an earlier run:
+more queries than the baseline fails (query counts are exact for a given
+catalogue), as does wall time or peak memory above factor times the
+baseline (and above a small absolute floor, so 1 ms views do not fail on
+noise).  Baselines are per catalogue: the same views take longer and
+allocate more against 20,000 books than against 300, so the file holds
+one entry per "<books>-<seed>".  Query counts should not differ between
+entries; one that grows with the catalogue is an N+1.
+
+``manage.py benchmark_views`` runs all of this against the configured
+database; tests/test_benchmarks.py checks the query budgets of a small
+catalogue, that no view's query count grows with the catalogue, and the
+peak memory of the LISTINGS, on every test run.
+
+Public interface
+----------------
+BASELINE_PATH
+    The checked-in baseline, booklibrary/tests/benchmark_baseline.json.
+LISTINGS
+    The scenarios that list many rows (list pages, the API list, the
+    sitemap), whose memory the tests check.
+Scenario(name, path, method="GET", data=None, login=False, setup=None,
+         call=None, writes=False)
+    One request: a path for the test client, or call(user) returning a
+    response for views that are not routed (BookViewSet); setup(client) is
+    run, untimed, before every request (e.g. a search filling the session).
+scenarios(user)
+    The standard scenarios for the catalogue in the database.
+google_stand_in(payload=None)
+    Context manager pointing google_books at a local stand-in server.
+stand_in_volumes(titles)
+    A stand-in volumes.list body complete enough for add_book.
+run(scenarios, user, repeat=5, budget=10.0)
+    Return {name: {"ms", "ms_max", "queries", "peak_kb"}}.
+memory_profile(scenario, user)
+    Request the scenario under the memory profiler; return the Profile.
+compare(results, baseline, time_factor=2.0, memory_factor=2.0)
+    Return a list of regression messages (empty when all is well).
+memory_regressed(result, base, factor=2.0)
+    Whether result's peak memory is a regression on base (None: no).
+load_baseline(key, path=BASELINE_PATH) / save_baseline(key, results, path)
+    Read or replace one catalogue's entry in a baseline file.
+"""
+import contextlib
+import json
+import os
+import statistics
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from booklibrary import api
+from booklibrary.models import Author, Book, Genre, Location
+from booklibrary.utils import google_books, profiling, search_cache
+from booklibrary.utils.standin import StandInServer, google_payload
+from booklibrary.views import GOOGLE_PAGE_SIZE, PAGE_SIZE
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "benchmark_baseline.json")
+
+# Differences below these are noise, whatever the ratio.
+TIME_FLOOR_MS = 5
+MEMORY_FLOOR_KB = 256
+
+LISTINGS = frozenset({
+    "book_list", "book_list_deep_page", "book_list_search_title", "book_list_search_author",
+    "book_list_search_syntax", "book_list_fuzzy", "book_list_dups", "book_list_facet",
+    "location_detail", "author_list", "inventory", "sitemap", "api_book_list",
+})
+
+_QUERY = "benchmark"
+# The hidden fields book_results.html posts for the first stand-in volume.
+_ADD_FORM = {
+    "book_index": "0", "title": "Benchmark Volume 0", "author1": "Author 0",
+    "genre1": "Fiction", "language": "en", "uniqueID": "standin-0", "status": "PHY",
+}
+
+
+class Scenario:
+    """One request to benchmark (see module docstring)."""
+
+    def __init__(self, name, path=None, method="GET", data=None, login=False, setup=None,
+                 call=None, writes=False):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.data = data
+        self.login = login
+        self.setup = setup
+        self.call = call
+        self.writes = writes
+
+    def request(self, client, user):
+        if self.call:
+            return self.call(user)
+        if self.method == "POST":
+            return client.post(self.path, self.data or {})
+        return client.get(self.path, self.data or {})
+
+
+# ── Scenarios ─────────────────────────────────────────────────────────────────
+
+def _uncached_search(client):
+    # Every run goes to the (stand-in) Google server.
+    cache.delete(search_cache._results_key(_QUERY, GOOGLE_PAGE_SIZE, 0))
+
+
+def _search(client):
+    _uncached_search(client)
+    client.post(reverse("booklibrary:book-search"), {"search": _QUERY})
+
+
+def _api_view(actions, **kwargs):
+    view = api.BookViewSet.as_view(actions)
+
+    def call(user):
+        request = APIRequestFactory().get("/api/books/")
+        force_authenticate(request, user=user)
+        return view(request, **kwargs).render()
+    return call
+
+
+def _pages(count):
+    return max(1, -(-count // PAGE_SIZE))
+
+
+def scenarios(user):
+    """Return the standard scenarios for the catalogue in the database."""
+    genre = Genre.objects.annotate(n=Count("book")).order_by("-n", "pk").first()
+    book = Book.objects.annotate(n=Count("bookinstance")).order_by("-n", "pk").first()
+    author = Author.objects.annotate(n=Count("books")).order_by("-n", "pk").first()
+    location = Location.objects.annotate(n=Count("bookinstance")).order_by("-n", "pk").first()
+    if None in (genre, book, author, location):
+        raise ValueError("The benchmarks need a catalogue; see utils/catalogue.py.")
+    word = book.title.split()[-1]
+    typo = word[:-2] + word[-1] + word[-2]  # last two letters swapped
+
+    books = reverse("booklibrary:books")
+    author_detail = reverse("booklibrary:author-detail", args=[author.pk])
+    location_detail = reverse("booklibrary:location-detail", args=[location.pk])
+    return [
+        Scenario("book_list", books),
+        Scenario("book_list_deep_page", books, data={"page": _pages(Book.objects.count())}),
+        Scenario("book_list_search_title", books, data={"search": word}),
+        Scenario("book_list_search_author", books,
+                 data={"search": author.last_name, "fields": "author"}),
+        Scenario("book_list_search_syntax", books,
+                 data={"search": f'genre:"{genre.name}" -{word}'}),
+        Scenario("book_list_fuzzy", books, data={"search": typo, "fuzzy": "1"}),
+        Scenario("book_list_dups", books, data={"dups": "1"}),
+        Scenario("book_list_facet", books, data={"genre": genre.pk}),
+        Scenario("book_detail", reverse("booklibrary:book-detail", args=[book.pk])),
+        Scenario("author_detail", author_detail),
+        Scenario("author_detail_locations", author_detail, setup=lambda client: client.get(
+            reverse("booklibrary:authors"), {"author_location": "1"})),
+        Scenario("location_detail", location_detail),
+        Scenario("location_detail_deep_page", location_detail,
+                 data={"page": _pages(location.bookinstance_set.count())}),
+        Scenario("book_search", reverse("booklibrary:book-search"), method="POST",
+                 data={"search": _QUERY}, login=True, setup=_uncached_search),
+        Scenario("add_book", reverse("booklibrary:book-add"), method="POST",
+                 data=_ADD_FORM, login=True, setup=_search, writes=True),
+        Scenario("author_list", reverse("booklibrary:authors")),
+        Scenario("inventory", reverse("booklibrary:inventory"), login=True),
+        Scenario("sitemap", reverse("booklibrary:django.contrib.sitemaps.views.sitemap")),
+        Scenario("api_book_detail", call=_api_view({"get": "retrieve"}, pk=book.pk)),
+        Scenario("api_book_list", call=_api_view({"get": "list"})),
+    ]
+
+
+def stand_in_volumes(titles):
+    """Return a volumes.list body for titles with the fields add_book needs."""
+    payload = google_payload(titles)
+    for item in payload["items"]:
+        item["volumeInfo"].update(
+            categories=["Fiction"], publisher="Stand-in Press",
+            description="A volume served by the benchmark stand-in server. " * 8)
+    return payload
+
+
+@contextlib.contextmanager
+def google_stand_in(payload=None):
+    """Answer Google Books searches from a local stand-in server.
+
+    payload is as for StandInServer; by default the same GOOGLE_PAGE_SIZE
+    volumes every time.
+    """
+    if payload is None:
+        payload = stand_in_volumes([f"Benchmark Volume {n}" for n in range(GOOGLE_PAGE_SIZE)])
+    with StandInServer(payload) as server, \
+            mock.patch.object(google_books, "BASE_URL", server.url), \
+            mock.patch.object(google_books, "_EXPECTED_HOST", server.url.split("//", 1)[1]):
+        yield server
+
+
+# ── Running ───────────────────────────────────────────────────────────────────
+
+def _once(scenario, client, user):
+    """Make the scenario's request, untimed setup first; return (response, ms, queries)."""
+    if scenario.setup:
+        scenario.setup(client)
+    count = 0
+
+    def counter(execute, sql, params, many, context):
+        nonlocal count
+        count += 1
+        return execute(sql, params, many, context)
+
+    with transaction.atomic() if scenario.writes else contextlib.nullcontext():
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            response = scenario.request(client, user)
+            ms = (time.perf_counter() - start) * 1000
+        if scenario.writes:
+            transaction.set_rollback(True)
+    return response, ms, count
+
+
+def run(scenarios, user, repeat=5, budget=10.0):
+    """Benchmark each scenario; return {name: {"ms", "ms_max", "queries", "peak_kb"}}.
+
+    Each scenario is measured repeat times, or fewer (but at least once) when
+    its measured runs have taken budget seconds.
+    """
+    results = {}
+    for scenario in scenarios:
+        client = Client()
+        if scenario.login:
+            client.force_login(user)
+        response = _once(scenario, client, user)[0]  # warm-up
+        if response.status_code >= 400:
+            raise RuntimeError(f"{scenario.name}: HTTP {response.status_code}")
+
+        times, queries = [], []
+        for _ in range(repeat):
+            _, ms, count = _once(scenario, client, user)
+            times.append(ms)
+            queries.append(count)
+            if sum(times) > budget * 1000:
+                break
+
+        # One frame: only the peak is wanted, and deeper stacks trace slowly.
+        with profiling.Allocations(frames=1) as traced:
+            _once(scenario, client, user)
+
+        results[scenario.name] = {
+            "ms": round(statistics.median(times), 1),
+            "ms_max": round(max(times), 1),
+            "queries": max(queries),
+            "peak_kb": traced.memory["peak_kb"],
+        }
+    return results
+
+
+def memory_profile(scenario, user):
+    """Request the scenario (after a warm-up) under the memory profiler; return the Profile."""
+    client = Client()
+    if scenario.login:
+        client.force_login(user)
+    _once(scenario, client, user)
+    return profiling.run(_once, scenario, client, user, mode="memory")
+
+
+# ── Baselines ─────────────────────────────────────────────────────────────────
+
+def compare(results, baseline, time_factor=2.0, memory_factor=2.0):
+    """Return a message for each result worse than its baseline."""
+    problems = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["queries"] > base["queries"]:
+            problems.append(f"{name}: {result['queries']} queries, baseline {base['queries']}")
+        if (result["ms"] > base["ms"] * time_factor
+                and result["ms"] - base["ms"] > TIME_FLOOR_MS):
+            problems.append(f"{name}: {result['ms']} ms, baseline {base['ms']} ms")
+        if memory_regressed(result, base, memory_factor):
+            problems.append(f"{name}: peak {result['peak_kb']} KB, baseline {base['peak_kb']} KB")
+    return problems
+
+
+def memory_regressed(result, base, factor=2.0):
+    """Return whether result's peak memory exceeds factor times base's (and the floor)."""
+    return bool(base and result["peak_kb"] > base["peak_kb"] * factor
+                and result["peak_kb"] - base["peak_kb"] > MEMORY_FLOOR_KB)
+
+
+def load_baseline(key, path=BASELINE_PATH):
+    """Return the baseline results stored under key, or {}."""
+    try:
+        with open(path) as f:
+            return json.load(f).get(key, {})
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(key, results, path=BASELINE_PATH):
+    """Store results as the baseline under key, keeping the other keys."""
+    try:
+        with open(path) as f:
+            baselines = json.load(f)
+    except FileNotFoundError:
+        baselines = {}
+    baselines[key] = results
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=1, sort_keys=True)
+        f.write("\n")
@@ -0,0 +1,145 @@
+"""
+Database helpers shared by the booklibrary services.
+
+Public interface
+----------------
+bulk_upsert(model, objs, unique_fields, update_fields)
+    INSERT ... ON CONFLICT DO UPDATE for a list of unsaved model instances,
+    portable across the SQLite, PostgreSQL and MySQL backends.
+estimated_count(model, using=None)
+    The planner's row estimate for model's table, or None where the backend
+    keeps none (SQLite).
+EstimatedCountPaginator
+    Paginator that trusts estimated_count() for large unfiltered querysets
+    instead of running COUNT(*) over the whole table.
+statement_deadline(deadline, using=None)
+    Context manager that aborts any statement still running at deadline (a
+    time.monotonic() value), raising DeadlineExceeded; SQLite, PostgreSQL
+    and MySQL only, elsewhere statements run to completion.
+
+Configuration
+-------------
+ESTIMATED_COUNT_THRESHOLD  (optional) – below this many estimated rows the
+                           exact count is used (10000).
+"""
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, router, transaction
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+ESTIMATED_COUNT_THRESHOLD = getattr(settings, "ESTIMATED_COUNT_THRESHOLD", 10000)
+
+
+def bulk_upsert(model, objs, unique_fields, update_fields):
+    """Insert objs, updating update_fields on rows that collide on unique_fields.
+
+    MySQL's ON DUPLICATE KEY UPDATE has no conflict target, and Django refuses
+    unique_fields on backends that cannot express one, so it is only passed
+    where supported.  Returns the list from bulk_create(); primary keys are
+    not guaranteed to be set on every backend.
+    """
+    features = connections[router.db_for_write(model)].features
+    return model.objects.bulk_create(
+        objs,
+        update_conflicts=True,
+        update_fields=update_fields,
+        unique_fields=unique_fields if features.supports_update_conflicts_with_target else None,
+    )
+
+
+def estimated_count(model, using=None):
+    """Return the database's row estimate for model's table, or None."""
+    using = using or router.db_for_read(model)
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == "postgresql":
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)"
+    elif connection.vendor == "mysql":
+        sql = ("SELECT table_rows FROM information_schema.tables "
+               "WHERE table_schema = DATABASE() AND table_name = %s")
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    # PostgreSQL reports -1 for a table that has never been analysed.
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator whose count is the table's row estimate when that is large.
+
+    Only unfiltered querysets can use the estimate; filtered ones, small
+    tables and backends without estimates get the exact COUNT(*).  The last
+    page number may be slightly off on an estimated count.
+    """
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if isinstance(qs, QuerySet) and not qs.query.where and not qs.query.distinct:
+            estimate = estimated_count(qs.model, using=qs.db)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class DeadlineExceeded(Exception):
+    """A statement was aborted by statement_deadline()."""
+
+
+def _bounded(deadline, execute, sql, params, many, context):
+    # An execute_wrapper giving each statement the time left before deadline.
+    ms = max(1, int((deadline - time.monotonic()) * 1000))
+    if context["connection"].vendor == "mysql":
+        # MySQL only honours the hint on SELECT, which is all we bound.
+        if sql.lstrip()[:6].upper() == "SELECT":
+            sql = f"SELECT /*+ MAX_EXECUTION_TIME({ms}) */{sql.lstrip()[6:]}"
+        return execute(sql, params, many, context)
+    # PostgreSQL.  If the statement fails, rolling back the savepoint
+    # statement_deadline() opened undoes the SET as well.
+    raw = context["cursor"].cursor
+    raw.execute(f"SET statement_timeout = {ms}")
+    result = execute(sql, params, many, context)
+    raw.execute("RESET statement_timeout")
+    return result
+
+
+@contextmanager
+def statement_deadline(deadline, using=None):
+    """Abort statements in the block still running at deadline.
+
+    SQLite checks the clock from a progress handler; MySQL gets a
+    MAX_EXECUTION_TIME hint and PostgreSQL a statement_timeout of the time
+    left, inside a savepoint so the aborted statement does not poison the
+    transaction.  An aborted statement raises DeadlineExceeded.
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    try:
+        if connection.vendor == "sqlite":
+            connection.ensure_connection()
+            connection.connection.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+            try:
+                yield
+            finally:
+                connection.connection.set_progress_handler(None, 0)
+        elif connection.vendor == "postgresql":
+            with transaction.atomic(using=connection.alias), \
+                    connection.execute_wrapper(lambda *args: _bounded(deadline, *args)):
+                yield
+        elif connection.vendor == "mysql":
+            with connection.execute_wrapper(lambda *args: _bounded(deadline, *args)):
+                yield
+        else:
+            yield
+    except OperationalError as exc:
+        if time.monotonic() < deadline:
+            raise
+        raise DeadlineExceeded(str(exc)) from exc
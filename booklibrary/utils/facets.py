@@ -0,0 +1,189 @@
+"""
+Facet counts and facet filters for the book list.
+
+A facet breaks the current result set down by one attribute (genre,
+language, series, location, status or decade of publication), counting the
+books in each bucket.  Each facet is one grouped query over the result set,
+so a page costs at most len(FACETS) queries, and the counts are cached per
+result set (keyed on its SQL), so paging through results or repeating a
+search costs none.  Bucket names come from lookup_cache.
+
+Multi-valued facets (genre, location, status) filter with EXISTS
+subqueries, so selecting them never adds a join or DISTINCT to the book
+query.  For the unfiltered catalogue the counts group the tables directly
+instead of going through a subquery of every book id.
+
+Public interface
+----------------
+FACETS
+    Facet names, in display order; also the GET parameter each filters on.
+apply(queryset, params)
+    Narrow a Book queryset by the facet values in params (a QueryDict or
+    dict); invalid values are ignored.  Returns (queryset, {name: value}).
+compute(queryset)
+    Return {name: [(value, label, count)]} for the Book queryset, the
+    FACET_LIMIT largest buckets of each facet.  Cached.  Facets not finished
+    within FACET_TIME_BUDGET are left out, so a slow catalogue degrades to
+    fewer facets rather than a slow page; the budget bounds each query too
+    (utils/db.statement_deadline), so one slow count cannot overrun it.
+    Partial counts are cached for FACET_PARTIAL_CACHE_TIMEOUT only, so the
+    full set is tried again soon.
+
+Configuration
+-------------
+FACET_LIMIT          (optional) – buckets shown per facet (10).
+FACET_CACHE_TIMEOUT  (optional) – seconds counts are cached (300).
+FACET_TIME_BUDGET    (optional) – seconds to spend computing facets (0.5).
+FACET_PARTIAL_CACHE_TIMEOUT  (optional) – seconds counts cut short by the
+                                          time budget are cached (30).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Count, Exists, OuterRef, Q
+from django.db.models.functions import ExtractYear
+
+from booklibrary.models import Book, BookInstance, Genre, Language, Location, Series
+from booklibrary.utils import lookup_cache
+from booklibrary.utils.db import DeadlineExceeded, statement_deadline
+
+FACET_LIMIT = getattr(settings, "FACET_LIMIT", 10)
+CACHE_TIMEOUT = getattr(settings, "FACET_CACHE_TIMEOUT", 300)
+TIME_BUDGET = getattr(settings, "FACET_TIME_BUDGET", 0.5)
+PARTIAL_CACHE_TIMEOUT = getattr(settings, "FACET_PARTIAL_CACHE_TIMEOUT", 30)
+
+FACETS = ("genre", "language", "series", "location", "status", "decade")
+
+_STATUS_LABELS = dict(BookInstance.LOAN_STATUS)
+
+
+# ── Filtering ─────────────────────────────────────────────────────────────────
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _filter(name, value):
+    """Return the filter expression for one facet value, or None if invalid."""
+    if name == "status":
+        if value not in _STATUS_LABELS:
+            return None
+        return Exists(BookInstance.objects.filter(book=OuterRef("pk"), status=value))
+    value = _int(value)
+    if value is None:
+        return None
+    if name == "genre":
+        return Exists(Book.genre.through.objects.filter(book=OuterRef("pk"), genre_id=value))
+    if name == "location":
+        return Exists(BookInstance.objects.filter(book=OuterRef("pk"), location_id=value))
+    if name == "decade":
+        return Q(publishedDate__year__gte=value, publishedDate__year__lt=value + 10)
+    return Q(**{f"{name}_id": value})
+
+
+def apply(queryset, params):
+    """Narrow queryset by the facet values in params."""
+    selected = {}
+    for name in FACETS:
+        value = params.get(name)
+        if not value:
+            continue
+        expression = _filter(name, value)
+        if expression is not None:
+            queryset = queryset.filter(expression)
+            selected[name] = str(value)
+    return queryset, selected
+
+
+# ── Counting ──────────────────────────────────────────────────────────────────
+
+def _named(model, rows):
+    return [
+        (pk, str(lookup_cache.get(model, pk) or "—"), n)
+        for pk, n in rows if pk is not None
+    ]
+
+
+def _within(queryset, lookup, books):
+    """Restrict queryset to rows of the books subquery (None: every book)."""
+    return queryset if books is None else queryset.filter(**{lookup: books})
+
+
+def _count_genre(books):
+    rows = (_within(Book.genre.through.objects, "book__in", books)
+            .values_list("genre_id").annotate(n=Count("book_id")).order_by("-n")[:FACET_LIMIT])
+    return _named(Genre, rows)
+
+
+def _count_fk(field, model):
+    def count(books):
+        rows = (_within(Book.objects, "pk__in", books).values_list(f"{field}_id")
+                .annotate(n=Count("pk")).order_by("-n")[:FACET_LIMIT])
+        return _named(model, rows)
+    return count
+
+
+def _count_instances(field, label):
+    # A book with several copies in one bucket is counted once.
+    def count(books):
+        rows = (_within(BookInstance.objects, "book__in", books).values_list(field)
+                .annotate(n=Count("book_id", distinct=True)).order_by("-n")[:FACET_LIMIT])
+        return [(value, label(value), n) for value, n in rows if value is not None]
+    return count
+
+
+def _count_decade(books):
+    decades = {}
+    years = (_within(Book.objects, "pk__in", books).exclude(publishedDate=None)
+             .values_list(ExtractYear("publishedDate")).annotate(n=Count("pk")).order_by())
+    for year, n in years:
+        decade = year // 10 * 10
+        decades[decade] = decades.get(decade, 0) + n
+    return [(decade, f"{decade}s", n) for decade, n in sorted(decades.items(), reverse=True)]
+
+
+_COUNTERS = {
+    "genre": _count_genre,
+    "language": _count_fk("language", Language),
+    "series": _count_fk("series", Series),
+    "location": _count_instances("location_id", lambda pk: str(lookup_cache.get(Location, pk) or "—")),
+    "status": _count_instances("status", _STATUS_LABELS.get),
+    "decade": _count_decade,
+}
+
+
+def _key(books):
+    sql = "all" if books is None else str(books.query)
+    return f"booklibrary:facets:{hashlib.sha256(sql.encode()).hexdigest()}"
+
+
+def compute(queryset):
+    """Return {facet: [(value, label, count)]} for the books in queryset."""
+    books = queryset.order_by().values("pk") if queryset.query.where else None
+    try:
+        key = _key(books)
+    except EmptyResultSet:
+        return {}  # a filter that cannot match, such as pk__in=[]
+    facets = cache.get(key)
+    if facets is not None:
+        return facets
+
+    facets = {}
+    deadline = time.monotonic() + TIME_BUDGET
+    for name in FACETS:
+        if time.monotonic() > deadline:
+            break
+        try:
+            with statement_deadline(deadline, using=queryset.db):
+                facets[name] = _COUNTERS[name](books)
+        except DeadlineExceeded:
+            break
+    complete = len(facets) == len(FACETS)
+    cache.set(key, facets, CACHE_TIMEOUT if complete else PARTIAL_CACHE_TIMEOUT)
+    return facets
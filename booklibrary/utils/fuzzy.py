@@ -0,0 +1,214 @@
+"""
+Typo-tolerant search over Book titles and Author names.
+
+Text is normalised (transliterated to ASCII, lower-cased, split into words).
+Every distinct word is stored once in SearchWord with its trigrams, padded
+at the ends like PostgreSQL's pg_trgm ("tolkien" -> __t _to tol olk lki kie
+ien en_), and SearchPosting records which titles and names contain it.
+
+A search first corrects each query word against the vocabulary: one grouped
+query over SearchWordTrigram finds the words sharing the most trigrams,
+scored by trigram similarity (shared / union), so "Tolkein" finds "tolkien"
+(0.33) and "Dostoyevsky" finds "dostoevsky" (0.64) where icontains finds
+nothing.  One more grouped query ranks the objects containing those words by
+the summed similarity of the words they contain.  The vocabulary is far
+smaller than the catalogue, so both queries stay cheap however many books
+there are: a search costs one query per query word plus one.
+
+The index is maintained incrementally: signals.py re-indexes a Book or
+Author after a save commits and drops its postings on delete, and the batch
+add path in services.py indexes the books and authors it inserts.  Run
+``manage.py rebuild_fuzzy_index`` once to index existing rows, and
+``manage.py benchmark_fuzzy`` to time searches against a generated
+catalogue.
+
+Public interface
+----------------
+trigrams(word)
+    The trigrams of one normalised word.
+index(kind, objects)
+    Re-index Books (kind SearchPosting.BOOK) or Authors (AUTHOR) now, for
+    code that inserts rows without signals.
+index_later(kind, objects)
+    Like index(), once the current transaction commits.
+unindex(kind, pks)
+    Drop the postings of the given objects.
+rebuild(batch_size=2000)
+    Re-index every Book and Author; returns the number of postings.
+search(kind, text, limit=FUZZY_LIMIT)
+    Return [(pk, score)] best first; score (0–1) is the mean similarity of
+    the query's words to the object's, at least FUZZY_THRESHOLD.
+search_books(text, limit=FUZZY_LIMIT)
+    Like search(), for Books matched by title or by an author's name.
+
+Configuration
+-------------
+FUZZY_THRESHOLD  (optional) – minimum similarity of a word or a match (0.3).
+FUZZY_LIMIT      (optional) – most results returned (50).
+"""
+import math
+import re
+
+import unidecode
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, FloatField, Sum, Value, When
+
+from booklibrary.models import Author, Book, SearchPosting, SearchWord, SearchWordTrigram
+
+THRESHOLD = getattr(settings, "FUZZY_THRESHOLD", 0.3)
+FUZZY_LIMIT = getattr(settings, "FUZZY_LIMIT", 50)
+
+# Vocabulary words kept per query word, and scanned to find them.
+WORD_CANDIDATES = 5
+WORD_SCAN = 100
+
+# Dropped from queries that have other words: they occur in so many titles
+# that they only slow the ranking query down.
+STOPWORDS = frozenset("a an and de der die el for in la le les of on the to".split())
+
+_WORD = re.compile(r"[a-z0-9]+")
+_MAX_WORD = SearchWord._meta.get_field("word").max_length
+
+# Padding uses "_" rather than pg_trgm's spaces: MySQL's PAD SPACE
+# collations ignore trailing spaces, which would merge "en " with "en".
+_PAD = "_"
+
+
+def _words(text):
+    """Return the distinct normalised words of text, in order."""
+    words = _WORD.findall(unidecode.unidecode(text or "").lower())
+    return list(dict.fromkeys(word[:_MAX_WORD] for word in words))
+
+
+def trigrams(word):
+    """Return the set of trigrams of one normalised word."""
+    padded = f"{_PAD}{_PAD}{word}{_PAD}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# ── Indexing ──────────────────────────────────────────────────────────────────
+
+def _text(kind, obj):
+    if kind == SearchPosting.BOOK:
+        return obj.title
+    return obj.full_name or f"{obj.first_name} {obj.last_name or ''}"
+
+
+def _word_ids(words):
+    """Return {word: SearchWord pk}, adding the words not yet in the vocabulary."""
+    ids = dict(SearchWord.objects.filter(word__in=words).values_list("word", "pk"))
+    new = [word for word in words if word not in ids]
+    if new:
+        SearchWord.objects.bulk_create(
+            [SearchWord(word=word, trigram_count=len(trigrams(word))) for word in new],
+            ignore_conflicts=True, batch_size=2000,
+        )
+        added = dict(SearchWord.objects.filter(word__in=new).values_list("word", "pk"))
+        SearchWordTrigram.objects.bulk_create(
+            [SearchWordTrigram(word_id=pk, trigram=gram)
+             for word, pk in added.items() for gram in trigrams(word)],
+            ignore_conflicts=True, batch_size=5000,
+        )
+        ids.update(added)
+    return ids
+
+
+def index(kind, objects):
+    """Replace the postings of objects (Books or Authors, as kind) now."""
+    words = {obj.pk: _words(_text(kind, obj)) for obj in objects if obj.pk is not None}
+    if not words:
+        return
+    ids = _word_ids({word for object_words in words.values() for word in object_words})
+    SearchPosting.objects.filter(kind=kind, object_id__in=list(words)).delete()
+    SearchPosting.objects.bulk_create([
+        SearchPosting(kind=kind, object_id=pk, word_id=ids[word])
+        for pk, object_words in words.items() for word in object_words
+    ], batch_size=5000)
+
+
+def index_later(kind, objects):
+    """Re-index objects once the current transaction commits."""
+    objects = list(objects)
+    transaction.on_commit(lambda: index(kind, objects))
+
+
+def unindex(kind, pks):
+    """Drop the postings of the objects with these primary keys."""
+    SearchPosting.objects.filter(kind=kind, object_id__in=list(pks)).delete()
+
+
+def rebuild(batch_size=2000):
+    """Re-index every Book and Author in batches; returns the posting count."""
+    SearchPosting.objects.all().delete()
+    for kind, queryset in (
+        (SearchPosting.BOOK, Book.objects.only("pk", "title")),
+        (SearchPosting.AUTHOR, Author.objects.only("pk", "full_name", "first_name", "last_name")),
+    ):
+        batch = []
+        for obj in queryset.order_by("pk").iterator(chunk_size=batch_size):
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                index(kind, batch)
+                batch = []
+        index(kind, batch)
+    return SearchPosting.objects.count()
+
+
+# ── Searching ─────────────────────────────────────────────────────────────────
+
+def _similar_words(word):
+    """Return [(SearchWord pk, similarity)] for the vocabulary words most like word."""
+    grams = trigrams(word)
+    # similarity >= THRESHOLD needs at least this many shared trigrams.
+    needed = max(1, math.ceil(len(grams) * THRESHOLD / (1 + THRESHOLD)))
+    rows = (
+        SearchWordTrigram.objects.filter(trigram__in=grams)
+        .values_list("word_id", "word__trigram_count")
+        .annotate(shared=Count("pk"))
+        .filter(shared__gte=needed)
+        .order_by("-shared")[:WORD_SCAN]
+    )
+    scored = [(pk, shared / (len(grams) + count - shared)) for pk, count, shared in rows]
+    scored = [row for row in scored if row[1] >= THRESHOLD]
+    return sorted(scored, key=lambda row: -row[1])[:WORD_CANDIDATES]
+
+
+def search(kind, text, limit=None):
+    """Return [(pk, score)] for the objects of kind most like text."""
+    words = _words(text)
+    words = [word for word in words if word not in STOPWORDS] or words
+    if not words:
+        return []
+
+    similarity = {}
+    for word in words:
+        for pk, score in _similar_words(word):
+            similarity[pk] = max(similarity.get(pk, 0), score)
+    if not similarity:
+        return []
+
+    score = Sum(
+        Case(*[When(word_id=pk, then=Value(s)) for pk, s in similarity.items()],
+             default=Value(0.0), output_field=FloatField()),
+    )
+    rows = (
+        SearchPosting.objects.filter(kind=kind, word_id__in=similarity)
+        .values_list("object_id")
+        .annotate(score=score)
+        .filter(score__gte=THRESHOLD * len(words))
+        .order_by("-score", "object_id")[:limit or FUZZY_LIMIT]
+    )
+    return [(pk, min(1.0, total / len(words))) for pk, total in rows]
+
+
+def search_books(text, limit=None):
+    """Return [(book pk, score)] for books whose title or author is like text."""
+    limit = limit or FUZZY_LIMIT
+    scores = dict(search(SearchPosting.BOOK, text, limit))
+    authors = dict(search(SearchPosting.AUTHOR, text, limit))
+    if authors:
+        written = Book.authors.through.objects.filter(author_id__in=authors)
+        for book_id, author_id in written.values_list("book_id", "author_id")[:limit * 4]:
+            scores[book_id] = max(scores.get(book_id, 0), authors[author_id])
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
@@ -8,8 +8,17 @@ search_books(query, max_results, start_index)
     Returns (list[dict], total_items).  Each dict contains the fields
     expected by BookSearchView / add_book (title, author1, author2,
     publisher, published_date, description, genre1, genre2, language,
-    preview_link, image_link, volume_id).  is_owned is always False here;
-    callers should annotate it after the call.
+    preview_link, image_link, volume_id, isbn_10, isbn_13).  is_owned is
+    always False here; callers should annotate it after the call.  The raw
+    volumes are also stored in the local GoogleVolume table.
+
+get_volume(volume_id, refresh=False)
+    Return the dict for one volume, served from the local GoogleVolume table
+    when present and fetched from volumes.get (then stored) otherwise.
+
+search_cached_volumes(query, max_results, start_index)
+    Search the local GoogleVolume table by title words or ISBN.  Same return
+    shape as search_books(); used as a fallback when Google is unavailable.
 
 Error hierarchy
 ---------------
@@ -30,10 +39,17 @@ The response host is checked against the expected host to guard against
 redirect-based attacks.
 """
 import logging
-from urllib.parse import urlparse
+import time
+from urllib.parse import quote, urlparse
 
 import requests
 from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from booklibrary.models import GoogleVolume
+from booklibrary.utils import metrics, timing
+from booklibrary.utils.db import bulk_upsert
 
 logger = logging.getLogger(__name__)
 
@@ -93,6 +109,16 @@ def _map_error(response):
     raise GoogleBooksError(message)
 
 
+def _parse_isbns(info):
+    """Return (isbn_10, isbn_13) from a volumeInfo's industryIdentifiers."""
+    isbns = {"ISBN_10": None, "ISBN_13": None}
+    for ident in info.get("industryIdentifiers") or []:
+        kind = ident.get("type")
+        if kind in isbns and not isbns[kind]:
+            isbns[kind] = ident.get("identifier")
+    return isbns["ISBN_10"], isbns["ISBN_13"]
+
+
 def _parse_volume(item):
     """Extract and normalise fields from a single Google Books API volume into a dict."""
     info = item.get("volumeInfo", {})
@@ -101,6 +127,7 @@ def _parse_volume(item):
     image_links = info.get("imageLinks") or {}
 
     volume_id = item["id"]
+    isbn_10, isbn_13 = _parse_isbns(info)
     return {
         "title":         info.get("title") or "Not Present",
         "author1":       authors[0] if authors else "Not Present",
@@ -114,21 +141,57 @@ def _parse_volume(item):
         "preview_link":  _safe_https_url(info.get("previewLink"), "previewLink"),
         "image_link":    _safe_https_url(image_links.get("thumbnail"), "imageLink"),
         "volume_id":     volume_id,
+        "isbn_10":       isbn_10,
+        "isbn_13":       isbn_13,
         "is_owned":      False,
     }
 
 
-def search_books(query, max_results=10, start_index=0):
-    """Call Google Books volumes.list; return (list of volume dicts, total_items)."""
-    params = {
-        "q": query,
-        "maxResults": max_results,
-        "startIndex": start_index,
-        "key": API_KEY,
-    }
+def _store_volumes(items):
+    """Upsert raw volume resources into the local GoogleVolume table."""
+    now = timezone.now()
+    rows = []
+    for item in items:
+        if not item.get("id"):
+            continue
+        isbn_10, isbn_13 = _parse_isbns(item.get("volumeInfo") or {})
+        rows.append(GoogleVolume(
+            volume_id=item["id"], data=item,
+            isbn_10=isbn_10, isbn_13=isbn_13, fetched_at=now,
+        ))
+    if rows:
+        bulk_upsert(GoogleVolume, rows,
+            unique_fields=["volume_id"],
+            update_fields=["data", "isbn_10", "isbn_13", "fetched_at"])
+
+
+_REQUEST_SECONDS = metrics.histogram(
+    "booklibrary_google_books_request_duration_seconds",
+    "Time taken by Google Books API calls.", ["endpoint"])
+_ERRORS = metrics.counter(
+    "booklibrary_google_books_errors_total",
+    "Google Books API calls that failed, by exception.", ["endpoint", "error"])
+CACHE_LOOKUPS = metrics.counter(
+    "booklibrary_google_books_cache_total",
+    "Lookups in the Google Books result and volume caches.", ["cache", "result"])
+
+
+def _get(url, params):
+    """GET url from the Google Books API; return the decoded JSON body."""
+    endpoint = "search" if url == BASE_URL else "volume"
+    start = time.perf_counter()
+    try:
+        return _request(url, params)
+    except GoogleBooksError as exc:
+        _ERRORS.inc(endpoint=endpoint, error=type(exc).__name__)
+        raise
+    finally:
+        _REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
 
+
+def _request(url, params):
     try:
-        resp = requests.get(BASE_URL, params=params, timeout=5, verify=True)
+        resp = requests.get(url, params=params, timeout=5, verify=True)
     except requests.RequestException as exc:
         logger.warning("Google Books request failed: %s", exc)
         raise GoogleBooksError("Network error talking to Google Books") from exc
@@ -145,6 +208,53 @@ def search_books(query, max_results=10, start_index=0):
     if not resp.ok:
         _map_error(resp)
 
-    data = resp.json()
+    return resp.json()
+
+
+@timing.timed("google")
+def search_books(query, max_results=10, start_index=0):
+    """Call Google Books volumes.list; return (list of volume dicts, total_items)."""
+    params = {
+        "q": query,
+        "maxResults": max_results,
+        "startIndex": start_index,
+        "key": API_KEY,
+    }
+    data = _get(BASE_URL, params)
     items = data.get("items") or []
+    _store_volumes(items)
     return [_parse_volume(item) for item in items], data.get("totalItems") or 0
+
+
+def get_volume(volume_id, refresh=False):
+    """Return the dict for one volume, from the local table unless refresh is set."""
+    if not refresh:
+        cached = GoogleVolume.objects.filter(pk=volume_id).first()
+        CACHE_LOOKUPS.inc(cache="volume", result="miss" if cached is None else "hit")
+        if cached is not None:
+            return _parse_volume(cached.data)
+
+    item = _get(f"{BASE_URL}/{quote(volume_id, safe='')}", {"key": API_KEY})
+    _store_volumes([item])
+    return _parse_volume(item)
+
+
+def search_cached_volumes(query, max_results=10, start_index=0):
+    """Search locally stored volumes by ISBN or title words; return (dicts, total)."""
+    # Accept the Google-style prefixes users already type into the search box.
+    terms = [t.split(":", 1)[-1] for t in query.split()]
+    terms = [t for t in terms if t]
+    if not terms:
+        return [], 0
+
+    isbn = "".join(terms).replace("-", "")
+    if isbn.isdigit() and len(isbn) in (10, 13):
+        qs = GoogleVolume.objects.filter(Q(isbn_10=isbn) | Q(isbn_13=isbn))
+    else:
+        qs = GoogleVolume.objects.all()
+        for term in terms:
+            qs = qs.filter(data__volumeInfo__title__icontains=term)
+
+    total = qs.count()
+    page = qs[start_index:start_index + max_results]
+    return [_parse_volume(v.data) for v in page], total
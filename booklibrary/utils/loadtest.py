@@ -0,0 +1,423 @@
+"""
+Load testing: a scripted mix of users replayed against a running server.
+
+run() drives virtual users over HTTP, so the server can be anything that
+serves the project: ``manage.py runserver``, gunicorn with library.wsgi,
+uvicorn with library.asgi, or serve() below, which runs the WSGI
+application in-process.  Each virtual user is a thread with its own
+session (cookies, CSRF token, login) that repeatedly picks an action from
+a weighted mix, waits a random think time, and picks again:
+
+  browse   – a random page of the book list
+  search   – the book list searched for a word from a title seen so far
+             (one in five fuzzy)
+  detail   – a book, author or shelf page linked from a page seen so far
+  google   – the search form, then a Google search for a new query
+  add      – a Google search, then "Add to library" on its first result
+  edit     – "My library", one of its books, then the edit form of a copy
+             on it, saved with a new status and shelf
+
+Every request is recorded under the action step that made it (browse,
+book_detail, google_search, add_book, edit_save, …) with its latency and
+whether it failed (a connection error or HTTP 4xx/5xx; an add that does
+not redirect to the new book also counts).  Users ramp in stages: each
+stage runs its number of users for a fixed time, and reports throughput
+and latency percentiles per endpoint.
+
+add and edit need a login and are dropped from the mix without one;
+google works anonymously but needs the server's Google Books client
+pointed at a stand-in (see google_volumes).  Adds and edits are real
+writes: point the server at a scratch database.
+
+Public interface
+----------------
+MIX
+    The default action weights, {action: weight}.
+run(base_url, users=(1, 2, 4, 8), seconds=30, mix=MIX, think=0.0,
+    username=None, password=None, seed=0, log=None)
+    Run one stage per entry of users; return a list of stage summaries
+    (see summarise()).  log(text) is called with each stage's report as it
+    finishes.
+summarise(users, seconds, records)
+    {"users", "seconds", "endpoints": {name: stats}, "total": stats} where
+    stats is {"count", "errors", "rps", "p50", "p90", "p99", "max"} (ms).
+report(stages)
+    The summaries as a plain-text table.
+percentile(values, p)
+    Nearest-rank percentile of a non-empty list.
+forms(html)
+    The forms in a page: [{"action", "method", "fields", "options"}].
+google_volumes(query)
+    StandInServer payload answering each Google search with fresh volumes.
+serve(host="127.0.0.1", port=0)
+    Context manager running the project's WSGI application in a background
+    thread; yields the base URL.
+"""
+import contextlib
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import requests
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+
+from booklibrary.utils.benchmarks import stand_in_volumes
+from booklibrary.views import GOOGLE_PAGE_SIZE
+
+MIX = {"browse": 35, "search": 20, "detail": 30, "google": 5, "add": 5, "edit": 5}
+WRITES = ("add", "edit")
+
+TIMEOUT = 30
+# Links and title words remembered per user, for detail and search.
+_MEMORY = 500
+# Copy statuses edit_save chooses between; loans go through the lend view.
+_EDIT_STATUSES = ("a", "r")
+
+_DETAIL = re.compile(r'href="([^"?#]*/(?:book|author|location)/\d+)"')
+_TITLE = re.compile(r'href="[^"?#]*/book/\d+">([^<]+)</a>')
+_PAGE = re.compile(r'[?&;]page=(\d+)')
+_COPY = re.compile(r'href="([^"]*/bookinstance/[0-9a-f-]{36}/update/)"')
+_WORD = re.compile(r"[A-Za-z]{4,}")
+
+
+# ── Pages ─────────────────────────────────────────────────────────────────────
+
+class _FormParser(HTMLParser):
+    """Collect each form's action, method and submitted field values."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.forms = []
+        self._form = None
+        self._select = None
+        self._textarea = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "form":
+            self._form = {"action": attrs.get("action") or "",
+                          "method": (attrs.get("method") or "get").lower(),
+                          "fields": {}, "options": {}}
+            self.forms.append(self._form)
+        if self._form is None or ("form" in attrs and tag != "form"):
+            return
+        name = attrs.get("name")
+        if tag == "input" and name:
+            kind = (attrs.get("type") or "text").lower()
+            if kind in ("submit", "button", "image", "file"):
+                return
+            if kind in ("checkbox", "radio") and "checked" not in attrs:
+                return
+            self._form["fields"][name] = attrs.get("value") or ""
+        elif tag == "select" and name:
+            self._select = name
+            self._form["options"][name] = []
+        elif tag == "option" and self._select:
+            value = attrs.get("value") or ""
+            self._form["options"][self._select].append(value)
+            if "selected" in attrs:
+                self._form["fields"][self._select] = value
+        elif tag == "textarea" and name:
+            self._textarea = name
+            self._form["fields"][name] = ""
+
+    def handle_data(self, data):
+        if self._textarea:
+            self._form["fields"][self._textarea] += data
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self._form = None
+        elif tag == "select" and self._select:
+            options = self._form["options"][self._select] if self._form else []
+            if self._form and options and self._select not in self._form["fields"]:
+                self._form["fields"][self._select] = options[0]
+            self._select = None
+        elif tag == "textarea":
+            self._textarea = None
+
+
+def forms(html):
+    """Return the forms in html as [{"action", "method", "fields", "options"}].
+
+    fields holds what a browser would submit (checked boxes, selected or
+    first options); options lists each select's values.
+    """
+    parser = _FormParser()
+    parser.feed(html)
+    parser.close()
+    return parser.forms
+
+
+def google_volumes(query):
+    """StandInServer payload: GOOGLE_PAGE_SIZE new volumes for every search.
+
+    Each answer has fresh volume ids, so adding one creates a new book as
+    adding a real search result would.  For a server in another process,
+    run a StandInServer with this payload (``manage.py loadtest
+    --standin-port``) and set the server's GOOGLE_BOOKS_API_BASE to it.
+    """
+    q = query.get("q", "")
+    payload = stand_in_volumes([f"{q} {n}" for n in range(GOOGLE_PAGE_SIZE)])
+    batch = uuid.uuid4().hex[:12]
+    for item in payload["items"]:
+        item["id"] = f"loadtest-{batch}-{item['id']}"
+    return payload
+
+
+# ── Virtual users ─────────────────────────────────────────────────────────────
+
+class _User:
+    """One virtual user: a session, what it has seen, and its actions."""
+
+    def __init__(self, base_url, mix, rng, think, record):
+        self.base_url = base_url.rstrip("/")
+        self.actions = list(mix)
+        self.weights = list(mix.values())
+        self.rng = rng
+        self.think = think
+        self.record = record
+        self.session = requests.Session()
+        self.links = []
+        self.words = []
+        self.pages = 1
+
+    def _url(self, name):
+        return self.base_url + reverse(name)
+
+    def request(self, name, method, url, expect=None, **kwargs):
+        """Make a request, record it under name; return the response or None.
+
+        A response counts as a failure if expect(response) is false.
+        """
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, url, timeout=TIMEOUT, **kwargs)
+        except requests.RequestException:
+            self.record((name, (time.perf_counter() - start) * 1000, False))
+            return None
+        ok = response.status_code < 400 and (expect is None or expect(response))
+        self.record((name, (time.perf_counter() - start) * 1000, ok))
+        if not ok:
+            return None
+        if "html" in response.headers.get("Content-Type", ""):
+            self._remember(response.text)
+        return response
+
+    def _remember(self, html):
+        for link in _DETAIL.findall(html):
+            if link not in self.links:
+                self.links.append(link)
+        for title in _TITLE.findall(html):
+            self.words.extend(_WORD.findall(title))
+        del self.links[:-_MEMORY], self.words[:-_MEMORY]
+        self.pages = max([self.pages, *map(int, _PAGE.findall(html))])
+
+    def _post(self, name, url, data):
+        data = {**data, "csrfmiddlewaretoken": self.session.cookies.get("csrftoken", "")}
+        return self.request(name, "POST", url, data=data, headers={"Referer": url})
+
+    def login(self, username, password):
+        url = self.base_url + reverse("login")
+        page = self.session.get(url, timeout=TIMEOUT)
+        form = next(f for f in forms(page.text) if "password" in f["fields"])
+        form["fields"].update(username=username, password=password)
+        response = self.session.post(url, data=form["fields"], headers={"Referer": url},
+                                     allow_redirects=False, timeout=TIMEOUT)
+        if response.status_code != 302:  # a failed login renders the form again
+            raise RuntimeError(f"Could not log in to {self.base_url} as {username!r}.")
+
+    # Actions
+
+    def browse(self):
+        self.request("browse", "GET", self._url("booklibrary:books"),
+                     params={"page": self.rng.randint(1, self.pages)})
+
+    def search(self):
+        if not self.words:
+            return self.browse()
+        params = {"search": self.rng.choice(self.words)}
+        if self.rng.random() < 0.2:
+            params["fuzzy"] = "1"
+        self.request("search", "GET", self._url("booklibrary:books"), params=params)
+
+    def detail(self):
+        if not self.links:
+            return self.browse()
+        link = self.rng.choice(self.links)
+        kind = link.rstrip("/").split("/")[-2]
+        self.request(f"{kind}_detail", "GET", urljoin(self.base_url + "/", link))
+
+    def google(self):
+        url = self._url("booklibrary:book-search")
+        if self.request("search_form", "GET", url) is None:
+            return None
+        query = f"{self.rng.choice(self.words or ['library'])} {self.rng.randrange(10 ** 6)}"
+        return self._post("google_search", url, {"search": query})
+
+    def add(self):
+        results = self.google()
+        if results is None:
+            return
+        add_url = self._url("booklibrary:book-add")
+        form = next((f for f in forms(results.text)
+                     if urljoin(results.url, f["action"]) == add_url), None)
+        if form is None:
+            return
+        # Added when it redirects to the new book.
+        self.request("add_book", "POST", add_url, data=form["fields"],
+                     headers={"Referer": results.url}, expect=lambda response: bool(response.history))
+
+    def edit(self):
+        mine = self.request("my_library", "GET", self._url("booklibrary:my-library"))
+        books = [link for link in _DETAIL.findall(mine.text) if "/book/" in link] if mine else []
+        if not books:
+            return
+        book = self.request("book_detail", "GET", urljoin(self.base_url + "/", self.rng.choice(books)))
+        copies = _COPY.findall(book.text) if book else []
+        if not copies:
+            return
+        url = urljoin(self.base_url + "/", self.rng.choice(copies))
+        page = self.request("edit_form", "GET", url)
+        # Not the menu's logout form.
+        form = next((f for f in forms(page.text) if "status" in f["fields"]), None) if page else None
+        if form is None:
+            return
+        fields = dict(form["fields"])
+        fields["status"] = self.rng.choice(_EDIT_STATUSES)
+        if form["options"].get("location"):
+            fields["location"] = self.rng.choice(form["options"]["location"])
+        self._post("edit_save", urljoin(url, form["action"]) if form["action"] else url, fields)
+
+    def run(self, stop):
+        while not stop.is_set():
+            getattr(self, self.rng.choices(self.actions, self.weights)[0])()
+            if self.think:
+                stop.wait(self.rng.uniform(0, 2 * self.think))
+
+
+# ── Running ───────────────────────────────────────────────────────────────────
+
+def percentile(values, p):
+    """Return the nearest-rank p-th percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def _stats(records, seconds):
+    times = [ms for _, ms, _ in records]
+    return {
+        "count": len(records),
+        "errors": sum(not ok for _, _, ok in records),
+        "rps": round(len(records) / seconds, 1),
+        **{f"p{p}": round(percentile(times, p), 1) for p in (50, 90, 99)},
+        "max": round(max(times), 1),
+    }
+
+
+def summarise(users, seconds, records):
+    """Summarise one stage's (name, ms, ok) records per endpoint and overall."""
+    by_name = {}
+    for record in records:
+        by_name.setdefault(record[0], []).append(record)
+    return {
+        "users": users,
+        "seconds": round(seconds, 1),
+        "endpoints": {name: _stats(by_name[name], seconds) for name in sorted(by_name)},
+        "total": _stats(records, seconds) if records else None,
+    }
+
+
+def report(stages):
+    """Return the stage summaries as a plain-text table."""
+    lines = []
+    columns = f"{'count':>8}{'errors':>8}{'req/s':>8}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+    for stage in stages:
+        lines.append(f"{stage['users']} users, {stage['seconds']} s")
+        lines.append(f"  {'endpoint':<16}{columns}")
+        rows = [*stage["endpoints"].items(), ("total", stage["total"])]
+        for name, s in rows:
+            if s:
+                lines.append(f"  {name:<16}{s['count']:>8}{s['errors']:>8}{s['rps']:>8}"
+                             f"{s['p50']:>9}{s['p90']:>9}{s['p99']:>9}{s['max']:>9}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def _stage(base_url, count, seconds, mix, think, credentials, seed):
+    records = []
+    stop = threading.Event()
+    ready = threading.Barrier(count + 1)
+    failures = []
+    users = [_User(base_url, mix, random.Random(f"{seed}-{count}-{n}"), think, records.append)
+             for n in range(count)]
+
+    def drive(user):
+        try:
+            if credentials:
+                user.login(*credentials)
+        except Exception as exc:  # reported by the stage below
+            failures.append(exc)
+        finally:
+            ready.wait()
+        if not failures:
+            user.run(stop)
+
+    threads = [threading.Thread(target=drive, args=(user,), name=f"loadtest-{n}", daemon=True)
+               for n, user in enumerate(users)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    start = time.perf_counter()
+    if not failures:
+        stop.wait(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    if failures:
+        raise failures[0]
+    return summarise(count, time.perf_counter() - start, records)
+
+
+def run(base_url, users=(1, 2, 4, 8), seconds=30, mix=None, think=0.0, username=None,
+        password=None, seed=0, log=None):
+    """Replay the action mix against base_url, one stage per user count; return the summaries."""
+    mix = {name: weight for name, weight in (mix or MIX).items()
+           if weight and (username or name not in WRITES)}
+    if not mix:
+        raise ValueError("Nothing to run: the mix is empty (add and edit need a login).")
+    credentials = (username, password) if username else None
+    stages = []
+    for count in users:
+        stage = _stage(base_url, count, seconds, mix, think, credentials, seed)
+        stages.append(stage)
+        if log:
+            log(report([stage]))
+    return stages
+
+
+class _QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def serve(host="127.0.0.1", port=0):
+    """Serve the project's WSGI application from a background thread; yield its URL."""
+    server = ThreadedWSGIServer((host, port), _QuietHandler)
+    server.set_app(get_wsgi_application())
+    thread = threading.Thread(target=server.serve_forever, name="loadtest-server", daemon=True)
+    thread.start()
+    try:
+        yield f"http://{host}:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,119 @@
+"""
+Per-process read-through cache for the small lookup tables.
+
+Genre, Keywords, Language, Location and Series have a handful to a few
+hundred rows and change rarely, yet every search results page renders their
+full choice lists once per result.  This module keeps each table in memory so
+forms and services can read it without a query.
+
+Public interface
+----------------
+LOOKUP_MODELS
+    The models cached here.
+get_all(model)
+    Every row of model, in the model's default order.
+get(model, pk)
+    The row with this primary key, or None.
+get_by_name(model, name)
+    The row whose name matches case-insensitively, or None.
+note_change(model)
+    Drop model's cached rows.  Called from the post_save/post_delete signal
+    handlers in booklibrary.signals; code that writes rows without signals
+    (bulk_create, QuerySet.update) must call it itself.
+clear()
+    Forget every cached table.  For tests.
+
+Consistency
+-----------
+Signals only reach the process that made the change, so a table is also
+reloaded once it is LOOKUP_CACHE_TIMEOUT seconds old.  Inside a transaction
+that changed a table, that table is read from the database without being
+cached, so rows that may still be rolled back are never shared; the cached
+copy is dropped again when the transaction commits.
+
+Configuration
+-------------
+LOOKUP_CACHE_TIMEOUT  (optional) – seconds before a cached table is reloaded (300).
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import router, transaction
+
+from booklibrary.models import Genre, Keywords, Language, Location, Series
+
+CACHE_TIMEOUT = getattr(settings, "LOOKUP_CACHE_TIMEOUT", 300)
+
+LOOKUP_MODELS = (Genre, Keywords, Language, Location, Series)
+
+# model -> (expires_at, rows, {pk: row}, {lower name: row})
+_tables = {}
+# Per-thread set of models changed in the transaction that is still open.
+_local = threading.local()
+
+
+def _dirty():
+    if not hasattr(_local, "models"):
+        _local.models = set()
+    return _local.models
+
+
+def _table(model):
+    """Return the cached entry for model, loading it when missing or expired."""
+    entry = _tables.get(model)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry
+    rows = list(model.objects.all())
+    entry = (
+        time.monotonic() + CACHE_TIMEOUT,
+        rows,
+        {row.pk: row for row in rows},
+        {row.name.lower(): row for row in rows},
+    )
+    dirty = _dirty()
+    if transaction.get_connection(router.db_for_read(model)).in_atomic_block:
+        if model in dirty:
+            return entry
+    else:
+        dirty.discard(model)
+    _tables[model] = entry
+    return entry
+
+
+def get_all(model):
+    """Return every row of model."""
+    return _table(model)[1]
+
+
+def get(model, pk):
+    """Return the row of model with primary key pk, or None."""
+    try:
+        return _table(model)[2].get(int(pk))
+    except (TypeError, ValueError):
+        return None
+
+
+def get_by_name(model, name):
+    """Return the row of model named name (ignoring case), or None."""
+    return _table(model)[3].get(name.lower())
+
+
+def note_change(model):
+    """Drop model's cached rows now and again when the current transaction commits."""
+    _tables.pop(model, None)
+    using = router.db_for_write(model)
+    if transaction.get_connection(using).in_atomic_block:
+        _dirty().add(model)
+
+        def committed():
+            _dirty().discard(model)
+            _tables.pop(model, None)
+
+        transaction.on_commit(committed, using=using)
+
+
+def clear():
+    """Forget every cached table and pending change."""
+    _tables.clear()
+    _dirty().clear()
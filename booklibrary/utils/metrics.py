@@ -0,0 +1,308 @@
+"""
+In-process metrics registry, exported in the Prometheus text format.
+
+Counters and histograms are kept per process in memory; recording a value
+is a dict update under a lock.  The /metrics view (views.metrics_endpoint) renders
+them for a Prometheus scraper or a curious admin.
+
+Several worker processes (gunicorn, uWSGI) each hold their own registry, so
+a scrape would only see whichever worker answered.  Set METRICS_DIR to a
+directory shared by the workers: each process then writes a snapshot of its
+registry there (metrics-<host>-<pid>-<start time>.json) at most every
+METRICS_FLUSH_INTERVAL seconds, and render() sums every snapshot in the
+directory.  So that counters never go backwards, the snapshots of workers
+that have exited are not dropped: render() folds those of this host into
+one metrics-retired.json, so the directory does not grow with every worker
+ever started.  Empty the directory when the service is restarted.
+
+Metrics recorded
+----------------
+booklibrary_request_duration_seconds{view, method}   histogram (MetricsMiddleware)
+booklibrary_requests_total{view, method, status}     counter   (MetricsMiddleware)
+booklibrary_request_queries{view}                    histogram (MetricsMiddleware)
+booklibrary_session_cookie_bytes                     histogram (MetricsMiddleware)
+booklibrary_google_books_request_duration_seconds{endpoint}
+                                                     histogram (google_books)
+booklibrary_google_books_errors_total{endpoint, error}
+                                                     counter   (google_books)
+booklibrary_google_books_cache_total{cache, result}  counter   (google_books,
+                                                     search_cache): result is
+                                                     hit or miss
+
+Public interface
+----------------
+counter(name, documentation, labels=())
+    Return the Counter registered under name, creating it on first use.
+    Counter.inc(amount=1, **labels).
+histogram(name, documentation, labels=(), buckets=LATENCY_BUCKETS)
+    Likewise for a Histogram.  Histogram.observe(value, **labels).
+render()
+    The registry (merged across processes in METRICS_DIR mode) as
+    Prometheus text.
+flush()
+    Write this process's snapshot now (METRICS_DIR mode only).
+reset()
+    Zero every metric.  For tests.
+
+Configuration
+-------------
+METRICS_DIR             (optional) – shared snapshot directory; unset means
+                        per-process metrics only.
+METRICS_FLUSH_INTERVAL  (optional) – seconds between snapshots (5).
+"""
+import glob
+import json
+import os
+import socket
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: snapshots of exited workers are never folded
+    fcntl = None
+
+from django.conf import settings
+
+METRICS_DIR = getattr(settings, "METRICS_DIR", None)
+FLUSH_INTERVAL = getattr(settings, "METRICS_FLUSH_INTERVAL", 5)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096)
+
+_registry = {}
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_snapshot_path = None
+_next_flush = 0.0
+_HOST = socket.gethostname()
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+
+class Counter(_Metric):
+    """A value that only goes up."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        _maybe_flush()
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, with their sum."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels, buckets):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            # [count per bucket (not cumulative)..., +Inf count, sum]
+            row = self.values.get(key)
+            if row is None:
+                row = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    break
+            else:
+                i = len(self.buckets)
+            row[i] += 1
+            row[-1] += value
+        _maybe_flush()
+
+
+def _register(cls, name, *args):
+    with _lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, *args)
+        return metric
+
+
+def counter(name, documentation, labels=()):
+    """Return the Counter called name, registering it on first use."""
+    return _register(Counter, name, documentation, labels)
+
+
+def histogram(name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+    """Return the Histogram called name, registering it on first use."""
+    return _register(Histogram, name, documentation, labels, buckets)
+
+
+# ── Multi-process snapshots ───────────────────────────────────────────────────
+
+def _snapshot():
+    with _lock:
+        return {
+            name: {
+                "kind": metric.kind,
+                "documentation": metric.documentation,
+                "labels": list(metric.labels),
+                "buckets": list(getattr(metric, "buckets", ())),
+                "values": [[list(key), list(value) if isinstance(value, list) else value]
+                           for key, value in metric.values.items()],
+            }
+            for name, metric in _registry.items()
+        }
+
+
+def flush():
+    """Write this process's snapshot to METRICS_DIR."""
+    global _snapshot_path, _next_flush
+    if not METRICS_DIR:
+        return
+    with _flush_lock:
+        if _snapshot_path is None:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            _snapshot_path = os.path.join(
+                METRICS_DIR, f"metrics-{_HOST}-{os.getpid()}-{time.time_ns()}.json")
+        _next_flush = time.monotonic() + FLUSH_INTERVAL
+        temporary = f"{_snapshot_path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(_snapshot(), f)
+        os.replace(temporary, _snapshot_path)
+
+
+def _maybe_flush():
+    if METRICS_DIR and time.monotonic() >= _next_flush and not _flush_lock.locked():
+        flush()
+
+
+def _exited(path):
+    """Whether path is the snapshot of a process on this host that has exited."""
+    try:
+        host, pid, _ = os.path.basename(path)[len("metrics-"):-len(".json")].rsplit("-", 2)
+        pid = int(pid)
+    except ValueError:
+        return False  # metrics-retired.json
+    if host != _HOST:
+        return False  # another machine's process table
+    if pid == os.getpid():
+        return path != _snapshot_path  # an earlier process with a reused pid
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass  # running as another user
+    return False
+
+
+def _sum(paths):
+    """Return the snapshots in paths summed, with values as {tuple(key): value}."""
+    merged = {}
+    for path in paths:
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, metric in snapshot.items():
+            into = merged.setdefault(name, {**metric, "values": {}})
+            for key, value in metric["values"]:
+                key = tuple(key)
+                if key not in into["values"]:
+                    into["values"][key] = value
+                elif metric["kind"] == "histogram":
+                    into["values"][key] = [a + b for a, b in zip(into["values"][key], value)]
+                else:
+                    into["values"][key] += value
+    for metric in merged.values():
+        metric["values"] = [[list(key), value] for key, value in metric["values"].items()]
+    return merged
+
+
+def _snapshots():
+    return sorted(glob.glob(os.path.join(METRICS_DIR, "metrics-*.json")))
+
+
+def _retire():
+    """Fold the snapshots of exited processes into metrics-retired.json."""
+    dead = [path for path in _snapshots() if _exited(path)]
+    if not dead:
+        return
+    retired = os.path.join(METRICS_DIR, "metrics-retired.json")
+    temporary = f"{retired}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(_sum([retired, *dead]), f)
+    os.replace(temporary, retired)
+    for path in dead:
+        os.remove(path)
+
+
+def _merged():
+    """Return the snapshots of every process, summed, in _snapshot() form."""
+    if not METRICS_DIR:
+        return _snapshot()
+    flush()
+    if fcntl is None:
+        return _sum(_snapshots())
+    # Serialise folding and reading, so no scrape sees a snapshot both in
+    # metrics-retired.json and in its own file.
+    with open(os.path.join(METRICS_DIR, ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        _retire()
+        return _sum(_snapshots())
+
+
+# ── Exposition ────────────────────────────────────────────────────────────────
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format."""
+    lines = []
+    for name, metric in sorted(_merged().items()):
+        lines.append(f"# HELP {name} {metric['documentation']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for key, value in sorted(metric["values"]):
+            if metric["kind"] == "counter":
+                lines.append(f"{name}{_labels(metric['labels'], key)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip([*metric["buckets"], "+Inf"], value[:-1]):
+                cumulative += count
+                le = (("le", bound if bound == "+Inf" else _number(bound)),)
+                lines.append(f"{name}_bucket{_labels(metric['labels'], key, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric['labels'], key)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(metric['labels'], key)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Zero every metric in this process."""
+    with _lock:
+        for metric in _registry.values():
+            metric.values.clear()
@@ -0,0 +1,78 @@
+"""
+Cached per-owner collection counts for the "My library" page.
+
+Counting a large collection by status and by location is three GROUP BY
+queries over the owner's BookInstances (served by the (owner, book) index);
+the result is cached per owner until one of their copies changes.
+
+Public interface
+----------------
+get(owner_id)
+    Return {"copies", "books", "by_status", "by_location"} for an owner:
+    by_status is [(code, label, count)] in LOAN_STATUS order, by_location is
+    [(location_id or None, count)] largest first.  Cached.
+invalidate(owner_ids=None)
+    Drop the cached counts of the given owners, or of every owner when
+    owner_ids is None (used when a Location is deleted, which re-points
+    copies without signals).
+
+signals.py calls invalidate() from BookInstance post_save / post_delete and
+from bookinstances_changed, so batch updates invalidate once.
+
+Configuration
+-------------
+OWNER_COUNTS_TIMEOUT   (optional) – seconds counts are cached (default 600).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from booklibrary.models import BookInstance
+
+CACHE_TIMEOUT = getattr(settings, "OWNER_COUNTS_TIMEOUT", 600)
+
+_GENERATION_KEY = "booklibrary:owner_counts:generation"
+
+
+def _key(owner_id):
+    generation = cache.get_or_set(_GENERATION_KEY, 0, None)
+    return f"booklibrary:owner_counts:{generation}:{owner_id}"
+
+
+def _compute(owner_id):
+    copies = BookInstance.objects.filter(owner_id=owner_id).order_by()
+    statuses = dict(copies.values_list("status").annotate(n=Count("pk")))
+    by_location = sorted(
+        copies.values_list("location_id").annotate(n=Count("pk")),
+        key=lambda row: -row[1],
+    )
+    return {
+        "copies": sum(statuses.values()),
+        "books": copies.exclude(book=None).values("book").distinct().count(),
+        "by_status": [
+            (code, label, statuses[code])
+            for code, label in BookInstance.LOAN_STATUS if code in statuses
+        ],
+        "by_location": by_location,
+    }
+
+
+def get(owner_id):
+    """Return the (cached) collection counts for owner_id."""
+    key = _key(owner_id)
+    counts = cache.get(key)
+    if counts is None:
+        counts = _compute(owner_id)
+        cache.set(key, counts, CACHE_TIMEOUT)
+    return counts
+
+
+def invalidate(owner_ids=None):
+    """Forget the counts of owner_ids, or of every owner when None."""
+    if owner_ids is None:
+        try:
+            cache.incr(_GENERATION_KEY)
+        except ValueError:
+            cache.set(_GENERATION_KEY, 1, None)
+        return
+    cache.delete_many([_key(owner_id) for owner_id in owner_ids if owner_id is not None])
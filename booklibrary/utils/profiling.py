@@ -0,0 +1,289 @@
+"""
+Request profiling: a sampling profiler, cProfile, tracemalloc, and the SQL
+a request ran.
+
+run(func, *args, mode="sample") calls func under a profiler and returns a
+Profile holding its result, the profile and every query it executed.
+
+  sample   – a background thread records the calling thread's stack every
+             PROFILE_INTERVAL_MS.  Cheap enough (a few percent) to leave on
+             for a fraction of real traffic; the stacks come out in the
+             "folded" format that flamegraph.pl, speedscope and inferno
+             read directly (one "outer;inner;leaf count" line per stack).
+  cprofile – deterministic cProfile.  Exact call counts, but it slows the
+             request down several times; the .prof file it saves opens in
+             snakeviz or flameprof.
+  memory   – tracemalloc: the peak memory allocated while func ran, and the
+             lines holding the most of what was still allocated when it
+             returned (the response and anything cached), both by the line
+             that made the allocation and by the innermost line of this
+             project's code on its stack.  tracemalloc cannot say what was
+             live at the peak itself, only how high it went.  Tracing
+             PROFILE_MEMORY_FRAMES frames of stack slows func down several
+             times.
+
+ProfilingMiddleware (booklibrary/middleware.py) uses this for the staff
+switch and for sampled automatic captures; ``manage.py profile_command``
+runs a management command under it, and the view benchmarks
+(utils/benchmarks.py) measure peak memory with the memory mode.
+
+Public interface
+----------------
+run(func, *args, mode="sample", **kwargs)
+    Call func; return a Profile.
+Profile
+    result, mode, elapsed_ms, queries ([{"sql", "ms"}]),
+    memory (memory mode) – {"peak_kb", "retained_kb", "lines",
+    "project_lines"}, the lines as [{"line", "kb", "blocks"}], largest first,
+    folded() – the folded stacks (sample mode),
+    report(limit=40, sql=True) – a text report: the top functions (or
+    lines, for memory) and the SQL,
+    save(directory, label) – write <stem>.folded or <stem>.prof (none for
+    memory), plus <stem>.json with the timing, memory and SQL; returns the
+    stem.
+Allocations(frames=PROFILE_MEMORY_FRAMES)
+    The memory mode's tracing as a context manager; memory is set on exit.
+    Fewer frames trace faster but attribute fewer lines to this project.
+    tracemalloc is process-wide: blocks overlapping in other threads (two
+    staff profiling at once) share one trace, stopped when the last ends,
+    and each one's peak then also counts the others' allocations.
+
+Configuration
+-------------
+PROFILE_INTERVAL_MS    (optional) – sampling interval in milliseconds (5).
+PROFILE_MEMORY_FRAMES  (optional) – stack frames tracemalloc records per
+                       allocation in memory mode (32).
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+INTERVAL_MS = getattr(settings, "PROFILE_INTERVAL_MS", 5)
+MEMORY_FRAMES = getattr(settings, "PROFILE_MEMORY_FRAMES", 32)
+
+_UNSAFE = re.compile(r"[^\w.-]+")
+# The directory holding this project's packages (booklibrary, library).
+_PROJECT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_UNTRACED = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+_tracing_lock = threading.Lock()
+_tracers = 0  # Allocations blocks open, in any thread
+_owns_trace = False  # whether they started tracemalloc, and so must stop it
+
+
+def _short(filename):
+    for path in sorted(sys.path, key=len, reverse=True):
+        if path and filename.startswith(path):
+            return filename[len(path):].lstrip(os.sep)
+    return filename
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({_short(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _in_project(filename):
+    return (filename.startswith(_PROJECT) and "site-packages" not in filename
+            and filename != __file__)
+
+
+class _Sampler:
+    """Count the stacks of one thread, sampled from a background thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+class Allocations:
+    """Trace allocations with tracemalloc; summarise the peak and what is left."""
+
+    def __init__(self, frames=None):
+        self.frames = frames or MEMORY_FRAMES
+        self.memory = None
+
+    def __enter__(self):
+        global _tracers, _owns_trace
+        with _tracing_lock:
+            if _tracers == 0:
+                # Inside a trace started elsewhere (a test, say): share it.
+                _owns_trace = not tracemalloc.is_tracing()
+                if _owns_trace:
+                    tracemalloc.start(self.frames)
+            _tracers += 1
+            alone = _tracers == 1
+        self._before = tracemalloc.take_snapshot().filter_traces(_UNTRACED)
+        if alone:
+            # Resetting under an overlapping block would hide its peak.
+            tracemalloc.reset_peak()
+        self._base = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, *exc_info):
+        global _tracers
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot().filter_traces(_UNTRACED)
+        with _tracing_lock:
+            _tracers -= 1
+            if _tracers == 0 and _owns_trace:
+                tracemalloc.stop()
+        lines, project_lines = Counter(), Counter()
+        blocks, project_blocks = Counter(), Counter()
+        for stat in after.compare_to(self._before, "traceback"):
+            if stat.size_diff <= 0:
+                continue
+            frames = list(stat.traceback)  # oldest first
+            line = f"{_short(frames[-1].filename)}:{frames[-1].lineno}"
+            lines[line] += stat.size_diff
+            blocks[line] += stat.count_diff
+            ours = next((f for f in reversed(frames) if _in_project(f.filename)), None)
+            if ours is not None:
+                line = f"{_short(ours.filename)}:{ours.lineno}"
+                project_lines[line] += stat.size_diff
+                project_blocks[line] += stat.count_diff
+        self.memory = {
+            "peak_kb": round((peak - self._base) / 1024),
+            "retained_kb": round(max(0, current - self._base) / 1024),
+            "lines": _top(lines, blocks),
+            "project_lines": _top(project_lines, project_blocks),
+        }
+
+
+def _top(sizes, blocks, limit=50):
+    return [{"line": line, "kb": round(size / 1024, 1), "blocks": blocks[line]}
+            for line, size in sizes.most_common(limit)]
+
+
+class Profile:
+    """The outcome of run(): func's result, its profile and its SQL."""
+
+    def __init__(self, result, mode, elapsed_ms, queries, stacks=None, stats=None, memory=None):
+        self.result = result
+        self.mode = mode
+        self.elapsed_ms = elapsed_ms
+        self.queries = queries
+        self.stacks = stacks or Counter()
+        self.stats = stats
+        self.memory = memory
+
+    def folded(self):
+        """Return the sampled stacks in the folded flame-graph format."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def report(self, limit=40, sql=True):
+        """Return a plain-text report: the busiest functions (or lines), then the SQL."""
+        out = io.StringIO()
+        out.write(f"{self.mode} profile, {self.elapsed_ms:.1f} ms, {len(self.queries)} queries")
+        if self.memory is not None:
+            out.write(f", peak {self.memory['peak_kb']} KB, {self.memory['retained_kb']} KB retained")
+        out.write("\n\n")
+        if self.stats is not None:
+            pstats.Stats(self.stats, stream=out).sort_stats("cumulative").print_stats(limit)
+        elif self.memory is not None:
+            for key, heading in (("lines", "by allocating line"),
+                                 ("project_lines", "by line in this project")):
+                out.write(f"Still allocated at the end, {heading}:\n")
+                for entry in self.memory[key][:limit]:
+                    out.write(f"{entry['kb']:10.1f} KB {entry['blocks']:7d} blocks  {entry['line']}\n")
+                out.write("\n")
+        else:
+            own = Counter()
+            for stack, count in self.stacks.items():
+                own[stack.rsplit(";", 1)[-1]] += count
+            total = sum(own.values()) or 1
+            out.write(f"{total} samples; functions by samples on top of the stack:\n")
+            for name, count in own.most_common(limit):
+                out.write(f"{count:6d} {100 * count / total:5.1f}%  {name}\n")
+        if sql:
+            out.write("\nSQL:\n")
+            for query in self.queries:
+                out.write(f"{query['ms']:8.1f} ms  {query['sql']}\n")
+        return out.getvalue()
+
+    def save(self, directory, label):
+        """Write the profile and its SQL to directory; return the file stem."""
+        os.makedirs(directory, exist_ok=True)
+        stamp = timezone.now().strftime("%Y%m%d-%H%M%S-%f")
+        stem = os.path.join(directory, f"{stamp}-{_UNSAFE.sub('_', label)[:80]}-{self.elapsed_ms:.0f}ms")
+        if self.stats is not None:
+            self.stats.dump_stats(f"{stem}.prof")
+        elif self.memory is None:
+            with open(f"{stem}.folded", "w") as f:
+                f.write(self.folded())
+        meta = {"label": label, "mode": self.mode, "elapsed_ms": round(self.elapsed_ms, 1),
+                "queries": self.queries}
+        if self.memory is not None:
+            meta["memory"] = self.memory
+        with open(f"{stem}.json", "w") as f:
+            json.dump(meta, f, indent=1)
+        return stem
+
+
+def run(func, *args, mode="sample", **kwargs):
+    """Call func(*args, **kwargs) under the profiler for mode; return a Profile."""
+    queries = []
+
+    def capture(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            queries.append({"sql": sql, "ms": round((time.perf_counter() - start) * 1000, 2)})
+
+    wrapped = [connection for connection in connections.all()]
+    for connection in wrapped:
+        connection.execute_wrappers.append(capture)
+    start = time.perf_counter()
+    try:
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            result = profiler.runcall(func, *args, **kwargs)
+            elapsed = (time.perf_counter() - start) * 1000
+            return Profile(result, mode, elapsed, queries, stats=profiler)
+        if mode == "memory":
+            with Allocations() as allocations:
+                start = time.perf_counter()  # not counting the first snapshot
+                result = func(*args, **kwargs)
+                elapsed = (time.perf_counter() - start) * 1000
+            return Profile(result, mode, elapsed, queries, memory=allocations.memory)
+        with _Sampler(threading.get_ident(), INTERVAL_MS / 1000) as sampler:
+            result = func(*args, **kwargs)
+        elapsed = (time.perf_counter() - start) * 1000
+        return Profile(result, mode, elapsed, queries, stacks=sampler.stacks)
+    finally:
+        for connection in wrapped:
+            connection.execute_wrappers.remove(capture)
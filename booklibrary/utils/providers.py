@@ -0,0 +1,252 @@
+"""
+Book metadata providers for the booklibrary app.
+
+A provider answers a free-text query with the same list of volume dicts that
+google_books.search_books() returns (title, author1, author2, publisher,
+published_date, description, genre1, genre2, language, preview_link,
+image_link, volume_id, isbn_10, isbn_13, is_owned), so BookSearchView and
+add_book do not care where a result came from.
+
+Public interface
+----------------
+MetadataProvider
+    Abstract base class.  Subclasses set ``name`` and implement
+    search(query, max_results, start_index) -> (list[dict], total_items);
+    one that does not cannot be instantiated.
+GoogleBooksProvider
+    Wraps google_books.search_books().
+OpenLibraryProvider
+    Queries the Open Library search API (search.json).
+get_providers(names=None)
+    Instantiate the providers named in BOOK_METADATA_PROVIDERS.
+fan_out_search(providers, query, max_results, start_index, deadline)
+    Query several providers concurrently and merge their results, dropping
+    duplicates by ISBN.  Whatever has arrived when the deadline passes is
+    returned, so latency is bounded by the slowest provider that answers in
+    time rather than by the sum of all of them.
+
+Error hierarchy
+---------------
+ProviderError        – base for non-Google provider failures, and raised by
+                       fan_out_search() when no provider answered at all.
+  OpenLibraryError   – network error, bad status or unexpected host.
+
+Configuration
+-------------
+BOOK_METADATA_PROVIDERS  (optional) – provider names, default ["google"].
+BOOK_METADATA_DEADLINE   (optional) – fan-out deadline in seconds (4).
+OPEN_LIBRARY_API_BASE    (optional) – override the Open Library search URL.
+"""
+import abc
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.db import connections
+
+from . import google_books
+
+logger = logging.getLogger(__name__)
+
+DEADLINE = getattr(settings, "BOOK_METADATA_DEADLINE", 4)
+
+OPEN_LIBRARY_BASE_URL = getattr(settings, "OPEN_LIBRARY_API_BASE",
+    "https://openlibrary.org/search.json")
+
+# Open Library reports MARC language codes; Google reports ISO 639-1.
+_MARC_LANGUAGES = {
+    "eng": "en", "fre": "fr", "ger": "de", "spa": "es", "ita": "it",
+    "por": "pt", "dut": "nl", "rus": "ru", "jpn": "ja", "chi": "zh",
+    "swe": "sv", "dan": "da", "nor": "no", "pol": "pl", "lat": "la",
+}
+
+
+class ProviderError(Exception):
+    """Base error for metadata provider failures."""
+
+class OpenLibraryError(ProviderError):
+    """Open Library could not be reached or answered unexpectedly."""
+
+
+class MetadataProvider(abc.ABC):
+    """Base class for book metadata sources."""
+
+    name = None
+
+    @abc.abstractmethod
+    def search(self, query, max_results=10, start_index=0):
+        """Return (list of volume dicts, total_items) for query."""
+
+
+class GoogleBooksProvider(MetadataProvider):
+    """Google Books volumes.list, via google_books.search_books()."""
+
+    name = "google"
+
+    def search(self, query, max_results=10, start_index=0):
+        return google_books.search_books(
+            query, max_results=max_results, start_index=start_index)
+
+
+class OpenLibraryProvider(MetadataProvider):
+    """Open Library's search.json endpoint (no API key required)."""
+
+    name = "openlibrary"
+    fields = "key,title,author_name,publisher,first_publish_year,subject,language,isbn,cover_i"
+
+    def __init__(self, base_url=None, timeout=5):
+        self.base_url = base_url or OPEN_LIBRARY_BASE_URL
+        self.timeout = timeout
+        self._expected_host = urlparse(self.base_url).netloc
+
+    def search(self, query, max_results=10, start_index=0):
+        params = {
+            "q": query,
+            "limit": max_results,
+            "offset": start_index,
+            "fields": self.fields,
+        }
+        try:
+            resp = requests.get(self.base_url, params=params, timeout=self.timeout)
+        except requests.RequestException as exc:
+            logger.warning("Open Library request failed: %s", exc)
+            raise OpenLibraryError("Network error talking to Open Library") from exc
+
+        response_host = urlparse(resp.url).netloc
+        if response_host != self._expected_host:
+            raise OpenLibraryError(
+                f"Response came from unexpected host {response_host!r}; "
+                f"expected {self._expected_host!r}"
+            )
+        if not resp.ok:
+            raise OpenLibraryError(f"HTTP {resp.status_code} from Open Library")
+
+        try:
+            data = resp.json()
+        except ValueError as exc:
+            raise OpenLibraryError("Open Library returned invalid JSON") from exc
+        docs = data.get("docs") or []
+        return [self._parse_doc(doc) for doc in docs], data.get("numFound") or 0
+
+    def _parse_doc(self, doc):
+        """Map one search.json doc onto the search_books() dict shape."""
+        authors = doc.get("author_name") or []
+        subjects = doc.get("subject") or []
+        publishers = doc.get("publisher") or []
+        languages = doc.get("language") or []
+        isbns = doc.get("isbn") or []
+        key = doc.get("key") or ""
+        year = doc.get("first_publish_year")
+        cover = doc.get("cover_i")
+        return {
+            "title":         doc.get("title") or "Not Present",
+            "author1":       authors[0] if authors else "Not Present",
+            "author2":       authors[1] if len(authors) > 1 else None,
+            "publisher":     publishers[0] if publishers else "Not Present",
+            "published_date": str(year) if year else "Not Present",
+            "description":   "Not Present",
+            "genre1":        subjects[0] if subjects else None,
+            "genre2":        subjects[1] if len(subjects) > 1 else None,
+            "language":      _MARC_LANGUAGES.get(languages[0], languages[0]) if languages else "en",
+            "preview_link":  f"https://openlibrary.org{key}" if key else None,
+            "image_link":    f"https://covers.openlibrary.org/b/id/{cover}-M.jpg" if cover else None,
+            "volume_id":     f"openlibrary:{key}",
+            "isbn_10":       next((i for i in isbns if len(i) == 10), None),
+            "isbn_13":       next((i for i in isbns if len(i) == 13), None),
+            "is_owned":      False,
+        }
+
+
+PROVIDERS = {
+    GoogleBooksProvider.name: GoogleBooksProvider,
+    OpenLibraryProvider.name: OpenLibraryProvider,
+}
+
+
+def get_providers(names=None):
+    """Return provider instances for names (default: BOOK_METADATA_PROVIDERS)."""
+    if names is None:
+        names = getattr(settings, "BOOK_METADATA_PROVIDERS", ["google"])
+    return [PROVIDERS[name]() for name in names]
+
+
+def _isbn10_to_13(isbn):
+    """Convert an ISBN-10 to its ISBN-13 form so both editions compare equal."""
+    core = "978" + isbn[:9]
+    total = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(core))
+    return core + str((10 - total % 10) % 10)
+
+
+def _dedupe_key(book):
+    """Return an identity for book: its ISBN-13 if known, else title + first author."""
+    if book.get("isbn_13"):
+        return book["isbn_13"]
+    isbn_10 = book.get("isbn_10")
+    if isbn_10 and isbn_10[:9].isdigit():
+        return _isbn10_to_13(isbn_10)
+    title = " ".join((book.get("title") or "").lower().split())
+    author = " ".join((book.get("author1") or "").lower().split())
+    return ("title", title, author)
+
+
+def _search_one(provider, query, max_results, start_index):
+    """Run one provider search on a worker thread."""
+    try:
+        return provider.search(query, max_results=max_results, start_index=start_index)
+    finally:
+        # GoogleBooksProvider stores volumes in the database from this thread.
+        connections.close_all()
+
+
+def fan_out_search(providers, query, max_results=10, start_index=0, deadline=None):
+    """
+    Query providers concurrently; return merged (list of volume dicts, total).
+
+    Each dict gains a ``source`` key naming its provider.  Results keep
+    provider order, and a volume already seen (same ISBN, or same title and
+    first author when no ISBN is known) is dropped.  Providers still running
+    when ``deadline`` seconds have passed are abandoned, and failing providers
+    are logged and skipped.  ProviderError is raised only if no provider
+    produced a result set at all.
+    """
+    deadline = DEADLINE if deadline is None else deadline
+    executor = ThreadPoolExecutor(max_workers=len(providers),
+                                  thread_name_prefix="metadata-provider")
+    # Each call runs in a copy of this context, so utils/timing.py counts it
+    # towards the current request.
+    futures = [
+        executor.submit(contextvars.copy_context().run,
+                        _search_one, provider, query, max_results, start_index)
+        for provider in providers
+    ]
+    wait(futures, timeout=deadline)
+    # Late providers finish on their own threads; their results are discarded.
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    books, total, seen, answered = [], 0, set(), 0
+    first_error = None
+    for provider, future in zip(providers, futures):
+        if not future.done():
+            logger.info("Metadata provider %s missed the %ss deadline", provider.name, deadline)
+            continue
+        try:
+            results, provider_total = future.result()
+        except (ProviderError, google_books.GoogleBooksError) as exc:
+            logger.warning("Metadata provider %s failed: %s", provider.name, exc)
+            first_error = first_error or exc
+            continue
+        answered += 1
+        total += provider_total
+        for book in results:
+            key = _dedupe_key(book)
+            if key in seen:
+                continue
+            seen.add(key)
+            books.append({**book, "source": provider.name})
+
+    if not answered:
+        raise ProviderError("No metadata provider answered in time") from first_error
+    return books, total
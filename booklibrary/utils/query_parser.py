@@ -0,0 +1,117 @@
+"""
+Structured search syntax for the book list.
+
+    author:tolkien genre:fantasy "ring" -series:silmarillion
+
+Each whitespace-separated term narrows the results (terms are ANDed):
+
+  word, "a phrase"      matched against the default field (title by default)
+  field:word            matched against that field; field:"a phrase" too
+  -term                 excludes books the term matches
+
+Fields: title (title or summary), author (first, last or full name), genre,
+keyword, series, language, publisher.  An unknown ``field:`` prefix is
+treated as part of a plain word, so titles such as "Dune: Messiah" still
+search as typed.
+
+The whole query compiles into one filter expression for a single query.
+Terms on many-valued relations (authors, genres, keywords) become
+correlated EXISTS subqueries, so they add no joins and need no DISTINCT
+however many terms there are; terms on single-valued relations (series,
+language) share one join, which Django reuses within a filter().
+
+Public interface
+----------------
+FIELDS
+    Field names accepted before a colon.
+parse(text)
+    Return [(field or None, value, negated)] terms.
+compile_query(text, default_field="title")
+    Return a Q/expression for Book.objects.filter(), or None if the text
+    has no terms.
+
+Configuration
+-------------
+BOOK_SEARCH_FULLTEXT  (optional) – on PostgreSQL, match title terms with the
+                      full-text search operator over title and summary (a
+                      GIN index on that vector makes them index lookups)
+                      instead of icontains.  Default False.
+BOOK_SEARCH_CONFIG    (optional) – PostgreSQL text search configuration
+                      ("english").
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Exists, OuterRef, Q
+
+from booklibrary.models import Author, Genre, Keywords
+
+FULLTEXT = getattr(settings, "BOOK_SEARCH_FULLTEXT", False)
+SEARCH_CONFIG = getattr(settings, "BOOK_SEARCH_CONFIG", "english")
+
+_TERM = re.compile(r'(-)?(?:(\w+):)?(?:"([^"]*)"?|(\S+))')
+
+
+def _title(value):
+    if FULLTEXT and connection.vendor == "postgresql":
+        from django.contrib.postgres.search import SearchQuery, SearchVector, SearchVectorExact
+        return SearchVectorExact(
+            SearchVector("title", "summary", config=SEARCH_CONFIG),
+            SearchQuery(value, config=SEARCH_CONFIG, search_type="phrase"),
+        )
+    return Q(title__icontains=value) | Q(summary__icontains=value)
+
+
+def _author(value):
+    return Exists(Author.objects.filter(
+        Q(last_name__icontains=value) | Q(first_name__icontains=value)
+        | Q(full_name__icontains=value),
+        books=OuterRef("pk"),
+    ))
+
+
+def _genre(value):
+    return Exists(Genre.objects.filter(book=OuterRef("pk"), name__icontains=value))
+
+
+def _keyword(value):
+    return Exists(Keywords.objects.filter(book=OuterRef("pk"), name__icontains=value))
+
+
+FIELDS = {
+    "title": _title,
+    "author": _author,
+    "genre": _genre,
+    "keyword": _keyword,
+    "series": lambda value: Q(series__name__icontains=value),
+    "language": lambda value: Q(language__name__icontains=value),
+    "publisher": lambda value: Q(publisher__icontains=value),
+}
+
+
+def parse(text):
+    """Split text into (field or None, value, negated) terms."""
+    terms = []
+    for match in _TERM.finditer(text):
+        negated, field, phrase, word = match.groups()
+        if field and field.lower() not in FIELDS:
+            # Not a field after all: keep the "prefix:" as part of the word.
+            word = f"{field}:{phrase if phrase is not None else word}"
+            field = phrase = None
+        value = (phrase if phrase is not None else word).strip()
+        if value:
+            terms.append((field.lower() if field else None, value, bool(negated)))
+    return terms
+
+
+def compile_query(text, default_field="title"):
+    """Compile text into one filter expression, or None if it has no terms."""
+    default = FIELDS.get(default_field, _title)
+    expression = None
+    for field, value, negated in parse(text):
+        term = FIELDS[field](value) if field else default(value)
+        if negated:
+            term = ~term
+        expression = term if expression is None else expression & term
+    return expression
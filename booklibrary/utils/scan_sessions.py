@@ -0,0 +1,199 @@
+"""
+Scan sessions: relocate many BookInstances by scanning their UUIDs.
+
+A client opens a session for a target Location, then streams the UUIDs it
+scans (barcodes or QR codes printed from BookInstance.id).  Scans are
+buffered in the cache and applied in batches: each flush is one SELECT to
+find which of the buffered ids exist (and belong to the user, unless staff)
+plus one UPDATE ... WHERE id IN (...) through services.update_instances().
+A shelf of 200 books is therefore moved in a handful of queries instead of
+200 form submissions.
+
+Public interface
+----------------
+start(user, location)
+    Open a session; returns its state dict (see below).
+add(session_id, user, ids)
+    Buffer scanned ids, flushing whenever SCAN_BATCH_SIZE are pending.
+flush(session_id, user)
+    Apply every pending id now.
+close(session_id, user)
+    Flush and discard the session; returns its final state.
+get(session_id, user)
+    Return the session's state without changing it.
+
+Every function returns the session state: {"id", "location_id",
+"pending" (ids waiting for the next flush), "moved" (count), "unknown"
+(scanned values that are not valid UUIDs, or not copies the user may
+move; the first SCAN_UNKNOWN_LIMIT of them)}.  ScanSessionNotFound is
+raised for an unknown or expired session, or one that belongs to another
+user.
+
+Sessions live in the default cache, so in a multi-process deployment the
+cache backend must be shared between workers, as for search_cache.  add(),
+flush() and close() read, change and write back the whole session, so each
+holds a per-session lock claimed with cache.add() while it does; a call
+that cannot claim it within SCAN_LOCK_TIMEOUT seconds raises
+ScanSessionBusy.
+
+Configuration
+-------------
+SCAN_BATCH_SIZE        (optional) – pending ids that trigger a flush (50).
+SCAN_SESSION_TIMEOUT   (optional) – seconds an idle session is kept (3600).
+SCAN_UNKNOWN_LIMIT     (optional) – unknown values kept per session (200).
+SCAN_LOCK_TIMEOUT      (optional) – seconds a session lock is held or
+                                    waited for at most (10).
+"""
+import contextlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from booklibrary.models import BookInstance, Location
+from booklibrary.services import update_instances
+from booklibrary.utils import lookup_cache
+
+BATCH_SIZE = getattr(settings, "SCAN_BATCH_SIZE", 50)
+SESSION_TIMEOUT = getattr(settings, "SCAN_SESSION_TIMEOUT", 3600)
+UNKNOWN_LIMIT = getattr(settings, "SCAN_UNKNOWN_LIMIT", 200)
+LOCK_TIMEOUT = getattr(settings, "SCAN_LOCK_TIMEOUT", 10)
+
+
+class ScanSessionNotFound(Exception):
+    """The scan session does not exist, has expired, or is not the user's."""
+
+
+class ScanSessionBusy(Exception):
+    """Another request held the session's lock for longer than SCAN_LOCK_TIMEOUT."""
+
+
+def _key(session_id):
+    return f"booklibrary:scan:{session_id}"
+
+
+def _public(state):
+    """Return the client-facing part of a stored session."""
+    return {k: v for k, v in state.items() if k != "owner_id"}
+
+
+def _load(session_id, user):
+    state = cache.get(_key(session_id))
+    if state is None or state["owner_id"] != user.pk:
+        raise ScanSessionNotFound(session_id)
+    return state
+
+
+def _save(state):
+    cache.set(_key(state["id"]), state, SESSION_TIMEOUT)
+
+
+@contextlib.contextmanager
+def _locked(session_id):
+    """Hold the session's lock, so concurrent updates cannot overwrite each other."""
+    key, token = f"{_key(session_id)}:lock", uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while not cache.add(key, token, LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            raise ScanSessionBusy(session_id)
+        time.sleep(0.01)
+    try:
+        yield
+    finally:
+        # The lock may have expired and been claimed by someone else.
+        if cache.get(key) == token:
+            cache.delete(key)
+
+
+def _note_unknown(state, values):
+    """Record values that matched no copy, up to SCAN_UNKNOWN_LIMIT."""
+    room = UNKNOWN_LIMIT - len(state["unknown"])
+    if room > 0:
+        state["unknown"].extend(list(values)[:room])
+
+
+def _normalise(value):
+    """Return value as a canonical UUID string, or None if it is not one."""
+    try:
+        return str(uuid.UUID(str(value).strip()))
+    except ValueError:
+        return None
+
+
+def _flush(state, user):
+    """Move the pending ids to the session's location; updates state in place."""
+    pending = state["pending"]
+    if not pending:
+        return
+    location = lookup_cache.get(Location, state["location_id"])
+    if location is None:
+        location = Location.objects.filter(pk=state["location_id"]).first()
+    if location is None:
+        raise ScanSessionNotFound(state["id"])
+
+    copies = BookInstance.objects.filter(pk__in=pending)
+    if not user.is_staff:
+        copies = copies.filter(owner=user)
+    known = {str(pk) for pk in copies.values_list("pk", flat=True)}
+    if known:
+        update_instances(BookInstance.objects.filter(pk__in=known), location=location)
+    state["moved"] += len(known)
+    _note_unknown(state, [i for i in pending if i not in known])
+    state["pending"] = []
+
+
+def start(user, location):
+    """Open a scan session moving copies to location."""
+    state = {
+        "id": uuid.uuid4().hex,
+        "owner_id": user.pk,
+        "location_id": location.pk,
+        "pending": [],
+        "moved": 0,
+        "unknown": [],
+    }
+    _save(state)
+    return _public(state)
+
+
+def get(session_id, user):
+    """Return the current state of a session."""
+    return _public(_load(session_id, user))
+
+
+def add(session_id, user, ids):
+    """Buffer scanned ids; flush once SCAN_BATCH_SIZE are pending."""
+    with _locked(session_id):
+        state = _load(session_id, user)
+        pending = set(state["pending"])
+        for value in ids:
+            scanned = _normalise(value)
+            if scanned is None:
+                _note_unknown(state, [str(value)])
+            elif scanned not in pending:
+                pending.add(scanned)
+                state["pending"].append(scanned)
+            if len(state["pending"]) >= BATCH_SIZE:
+                _flush(state, user)
+                pending = set()
+        _save(state)
+    return _public(state)
+
+
+def flush(session_id, user):
+    """Apply every pending id now."""
+    with _locked(session_id):
+        state = _load(session_id, user)
+        _flush(state, user)
+        _save(state)
+    return _public(state)
+
+
+def close(session_id, user):
+    """Flush the session and discard it; returns the final state."""
+    with _locked(session_id):
+        state = _load(session_id, user)
+        _flush(state, user)
+        cache.delete(_key(session_id))
+    return _public(state)
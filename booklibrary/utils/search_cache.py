@@ -0,0 +1,104 @@
+"""
+Result cache and background prefetch for Google Books searches.
+
+Public interface
+----------------
+get_results(query, max_results, start_index)
+    Return a cached (list[dict], total_items) for this page, or None.
+    Hits and misses are counted in utils/metrics.py.
+set_results(query, max_results, start_index, results)
+    Cache a (list[dict], total_items) page.
+prefetch(fetch, query, max_results, start_index)
+    Warm the cache for one page in a background thread by calling
+    fetch(query, max_results=..., start_index=...).  Returns the Future, or
+    None when the page is already cached or the rate limit says not now.
+note_quota_error()
+    Suspend prefetching for GOOGLE_BOOKS_PREFETCH_BACKOFF seconds.
+
+Rate limiting
+-------------
+Prefetches are background work competing with real searches for the same
+API quota, so at most one is started per GOOGLE_BOOKS_PREFETCH_INTERVAL
+seconds, none are started while a quota error backoff is in force, and a
+single worker thread runs them one at a time.  The interval and backoff are
+claimed with cache.add(), so they hold across worker processes whenever the
+cache backend is shared.
+
+Configuration
+-------------
+GOOGLE_BOOKS_CACHE_TIMEOUT        (optional) – seconds a page stays cached (600).
+GOOGLE_BOOKS_PREFETCH             (optional) – set False to disable prefetch.
+GOOGLE_BOOKS_PREFETCH_INTERVAL    (optional) – min seconds between prefetches (1).
+GOOGLE_BOOKS_PREFETCH_BACKOFF     (optional) – seconds to pause after a 429 (60).
+"""
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from .google_books import CACHE_LOOKUPS, GoogleBooksError, GoogleBooksQuotaError
+from .providers import ProviderError
+
+logger = logging.getLogger(__name__)
+
+CACHE_TIMEOUT = getattr(settings, "GOOGLE_BOOKS_CACHE_TIMEOUT", 600)
+PREFETCH_ENABLED = getattr(settings, "GOOGLE_BOOKS_PREFETCH", True)
+PREFETCH_INTERVAL = getattr(settings, "GOOGLE_BOOKS_PREFETCH_INTERVAL", 1)
+PREFETCH_BACKOFF = getattr(settings, "GOOGLE_BOOKS_PREFETCH_BACKOFF", 60)
+
+_SLOT_KEY = "google_books:prefetch:slot"
+_BACKOFF_KEY = "google_books:prefetch:backoff"
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="google-books-prefetch")
+
+
+def _results_key(query, max_results, start_index):
+    """Return a cache key for one page of results; the query is hashed."""
+    digest = hashlib.sha256(" ".join(query.lower().split()).encode()).hexdigest()
+    return f"google_books:results:{digest}:{max_results}:{start_index}"
+
+
+def get_results(query, max_results, start_index):
+    """Return the cached (books, total) for this page, or None."""
+    results = cache.get(_results_key(query, max_results, start_index))
+    CACHE_LOOKUPS.inc(cache="search", result="miss" if results is None else "hit")
+    return results
+
+
+def set_results(query, max_results, start_index, results):
+    """Cache (books, total) for this page."""
+    cache.set(_results_key(query, max_results, start_index), results, CACHE_TIMEOUT)
+
+
+def note_quota_error():
+    """Stop prefetching for a while after Google reports a quota problem."""
+    cache.set(_BACKOFF_KEY, True, PREFETCH_BACKOFF)
+
+
+def _prefetch_task(fetch, query, max_results, start_index):
+    """Fetch one page and cache it.  Runs on the prefetch worker thread."""
+    try:
+        results = fetch(query, max_results=max_results, start_index=start_index)
+    except GoogleBooksQuotaError:
+        note_quota_error()
+    except (GoogleBooksError, ProviderError) as exc:
+        logger.info("Google Books prefetch failed: %s", exc)
+    else:
+        set_results(query, max_results, start_index, results)
+    finally:
+        # fetch() stores volumes in the database from this thread.
+        connections.close_all()
+
+
+def prefetch(fetch, query, max_results, start_index):
+    """Schedule a background fetch of one page unless cached or rate limited."""
+    if not PREFETCH_ENABLED or cache.get(_BACKOFF_KEY):
+        return None
+    if cache.get(_results_key(query, max_results, start_index)) is not None:
+        return None
+    if not cache.add(_SLOT_KEY, True, PREFETCH_INTERVAL):
+        return None
+    return _executor.submit(_prefetch_task, fetch, query, max_results, start_index)
@@ -0,0 +1,252 @@
+"""
+Slow-query log with EXPLAIN capture.
+
+Every query that takes longer than SLOW_QUERY_MS is recorded with its call
+site: the view (URL name, set by SlowQueryMiddleware), the templates being
+rendered ("booklibrary/book_list.html > booklibrary/base_menu.html": a
+child's blocks render inside its parent), and the innermost booklibrary
+line that ran it.
+Records are appended as JSON lines to SLOW_QUERY_LOG, where
+``manage.py slow_queries`` ranks the query shapes by total time.
+
+Queries are grouped by shape: the SQL with literals and parameters replaced
+by ? and IN lists collapsed, so "WHERE id IN (1, 2)" and "WHERE id IN (3)"
+are one shape.  The first slow occurrence of a shape in each
+SLOW_QUERY_EXPLAIN_INTERVAL also carries the normalised SQL and the
+database's EXPLAIN plan (SELECTs only, run in a savepoint on the same
+connection) and is logged as a warning on "booklibrary.utils.slow_queries";
+later occurrences are one short line each, so a hot slow query costs
+little more than the query itself.  The interval is claimed with
+cache.add(), so it holds across processes sharing the cache.
+
+BooklibraryConfig.ready() calls install() when SLOW_QUERY_MS is set, which
+attaches the wrapper to every database connection as it opens, so
+management commands and background threads are covered as well as
+requests.
+
+Public interface
+----------------
+normalise(sql) / shape(sql)
+    The normalised SQL, and a short hash of it identifying the shape.
+wrapper(execute, sql, params, many, context)
+    The connection.execute_wrapper() that does the timing and logging.
+install()
+    Attach wrapper to every connection, now and as they open.
+read(path)
+    Yield the records of a log file.
+summarise(records, top=10)
+    Return the top shapes by total time: [{shape, count, total_ms, max_ms,
+    sql, explain, views, templates, callers}].
+
+Configuration
+-------------
+SLOW_QUERY_MS                (optional) – threshold in milliseconds; unset
+                             (the default) disables the log.
+SLOW_QUERY_LOG               (optional) – JSON-lines file to append records
+                             to; unset logs the warnings only.
+SLOW_QUERY_EXPLAIN_INTERVAL  (optional) – seconds between full records of
+                             one shape (3600).
+"""
+import contextvars
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+THRESHOLD_MS = getattr(settings, "SLOW_QUERY_MS", None)
+LOG_PATH = getattr(settings, "SLOW_QUERY_LOG", None)
+EXPLAIN_INTERVAL = getattr(settings, "SLOW_QUERY_EXPLAIN_INTERVAL", 3600)
+
+# URL name of the view being served, and the stack of templates rendering.
+view = contextvars.ContextVar("booklibrary_slow_query_view", default=None)
+_templates = contextvars.ContextVar("booklibrary_slow_query_templates", default=())
+# Set while the wrapper runs its own queries (EXPLAIN, cache), which are not timed.
+_busy = threading.local()
+_write_lock = threading.Lock()
+
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Frames in these files wrap queries rather than make them.
+_SKIPPED_FILES = {
+    os.path.abspath(__file__),
+    os.path.join(_PACKAGE_DIR, "middleware.py"),
+    os.path.join(_PACKAGE_DIR, "utils", "timing.py"),
+}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w\"`.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_IN_LIST = re.compile(r"\bIN \(\?(?:, \?)*\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def normalise(sql):
+    """Return sql with literals replaced by ? and IN lists collapsed."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _SPACE.sub(" ", sql).strip()
+    return _IN_LIST.sub("IN (...)", sql)
+
+
+def shape(sql):
+    """Return a short identifier for the shape of sql."""
+    return hashlib.sha1(normalise(sql).encode()).hexdigest()[:12]
+
+
+# ── Recording ─────────────────────────────────────────────────────────────────
+
+def _caller():
+    """Return "path:line in function" for the innermost booklibrary frame."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(_PACKAGE_DIR) and filename not in _SKIPPED_FILES:
+            relative = os.path.relpath(filename, os.path.dirname(_PACKAGE_DIR))
+            return f"{relative}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def _explain(connection, sql, params):
+    if not sql.lstrip()[:6].upper() == "SELECT":
+        return None
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+                return [" ".join(str(column) for column in row) for row in cursor.fetchall()]
+    except Exception as exc:
+        # A broken transaction or an unexplainable statement; the record is
+        # still worth having without a plan.
+        return [f"EXPLAIN failed: {exc}"]
+
+
+def _write(record):
+    if not LOG_PATH:
+        return
+    line = json.dumps(record, default=str) + "\n"
+    with _write_lock, open(LOG_PATH, "a") as f:
+        f.write(line)
+
+
+def _record(connection, sql, params, many, ms):
+    templates = _templates.get()
+    record = {
+        "at": timezone.now().isoformat(),
+        "shape": shape(sql),
+        "ms": round(ms, 1),
+        "view": view.get(),
+        "template": " > ".join(templates) or None,
+        "caller": _caller(),
+    }
+    if cache.add(f"booklibrary:slow_query:{record['shape']}", True, EXPLAIN_INTERVAL):
+        record["sql"] = normalise(sql)
+        record["explain"] = None if many else _explain(connection, sql, params)
+        logger.warning(
+            "Slow query (%.1f ms) in %s, %s, %s: %s\n%s", ms, record["view"] or "-",
+            record["template"] or "-", record["caller"] or "-", record["sql"],
+            "\n".join(record["explain"] or []),
+        )
+    _write(record)
+
+
+def wrapper(execute, sql, params, many, context):
+    """Time a query and record it when it is slower than SLOW_QUERY_MS."""
+    if getattr(_busy, "active", False):
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        if THRESHOLD_MS is not None and ms >= THRESHOLD_MS:
+            _busy.active = True
+            try:
+                _record(context["connection"], sql, params, many, ms)
+            except Exception:
+                logger.exception("Could not record a slow query")
+            finally:
+                _busy.active = False
+
+
+# ── Installation ──────────────────────────────────────────────────────────────
+
+def _attach(connection, **kwargs):
+    # First, not last: a connection can open inside connection.execute_wrapper()
+    # blocks (timing.request_timer()), which pop the last wrapper when they end.
+    if wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, wrapper)
+
+
+def _instrument_templates():
+    """Keep the stack of templates being rendered, {% include %} and {% extends %} too."""
+    from django.template.base import Template
+
+    render = Template._render
+    if getattr(render, "_booklibrary_slow_queries", False):
+        return
+
+    @functools.wraps(render)
+    def tracked_render(self, context):
+        token = _templates.set((*_templates.get(), self.origin.template_name or self.name))
+        try:
+            return render(self, context)
+        finally:
+            _templates.reset(token)
+
+    tracked_render._booklibrary_slow_queries = True
+    Template._render = tracked_render
+
+
+def install():
+    """Attach the wrapper to every database connection, now and as they open."""
+    connection_created.connect(_attach, dispatch_uid="booklibrary_slow_queries")
+    for connection in connections.all(initialized_only=True):
+        _attach(connection)
+    _instrument_templates()
+
+
+# ── Reporting ─────────────────────────────────────────────────────────────────
+
+def read(path):
+    """Yield the records in a slow-query log, skipping damaged lines."""
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def summarise(records, top=10):
+    """Return the top shapes by total time, most expensive first."""
+    shapes = {}
+    for record in records:
+        entry = shapes.setdefault(record["shape"], {
+            "shape": record["shape"], "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+            "sql": None, "explain": None,
+            "views": Counter(), "templates": Counter(), "callers": Counter(),
+        })
+        entry["count"] += 1
+        entry["total_ms"] += record["ms"]
+        entry["max_ms"] = max(entry["max_ms"], record["ms"])
+        if record.get("sql"):
+            entry["sql"], entry["explain"] = record["sql"], record.get("explain")
+        for key, field in (("views", "view"), ("templates", "template"), ("callers", "caller")):
+            if record.get(field):
+                entry[key][record[field]] += 1
+    return sorted(shapes.values(), key=lambda entry: -entry["total_ms"])[:top]
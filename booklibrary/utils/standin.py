@@ -0,0 +1,121 @@
+"""
+Local stand-in HTTP servers for the metadata providers.
+
+Serves canned JSON on 127.0.0.1 so provider code, fan-out timing and load
+tests can run without touching Google or Open Library.
+
+Public interface
+----------------
+StandInServer(payload, delay=0, status=200, port=0)
+    Context manager running a threaded HTTP server in the background, on
+    ``port`` or (0) any free port.
+    Every GET is answered with ``payload`` (a dict, or a callable taking the
+    parsed query dict and returning one) after sleeping ``delay`` seconds.
+    ``url`` is the base URL; ``requests`` records each request's path and
+    query dict.
+google_payload(titles, total=None)
+    A volumes.list response body with one volume per title.
+open_library_payload(titles, total=None)
+    A search.json response body with one doc per title.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StandInServer:
+    """Threaded local HTTP server that answers every GET with canned JSON."""
+
+    def __init__(self, payload, delay=0, status=200, port=0):
+        self.payload = payload
+        self.delay = delay
+        self.status = status
+        self.port = port
+        self.requests = []
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                stand_in.requests.append((parsed.path, query))
+                if stand_in.delay:
+                    time.sleep(stand_in.delay)
+                payload = stand_in.payload
+                if callable(payload):
+                    payload = payload(query)
+                body = json.dumps(payload).encode()
+                self.send_response(stand_in.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def google_payload(titles, total=None):
+    """Return a Google Books volumes.list body with one volume per title."""
+    items = [
+        {
+            "id": f"standin-{i}",
+            "volumeInfo": {
+                "title": title,
+                "authors": [f"Author {i}"],
+                "publishedDate": "2001",
+                "language": "en",
+                "industryIdentifiers": [
+                    {"type": "ISBN_13", "identifier": f"978{i:010d}"},
+                ],
+            },
+        }
+        for i, title in enumerate(titles)
+    ]
+    return {"totalItems": len(items) if total is None else total, "items": items}
+
+
+def open_library_payload(titles, total=None):
+    """Return an Open Library search.json body with one doc per title."""
+    docs = [
+        {
+            "key": f"/works/OL{i}W",
+            "title": title,
+            "author_name": [f"Author {i}"],
+            "first_publish_year": 1950 + i,
+            "language": ["eng"],
+            "isbn": [f"978{i:010d}"],
+        }
+        for i, title in enumerate(titles)
+    ]
+    return {"numFound": len(docs) if total is None else total, "docs": docs}
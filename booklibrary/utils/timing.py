@@ -0,0 +1,177 @@
+"""
+Per-request accounting of where time goes: database, templates, Google Books.
+
+ServerTimingMiddleware (booklibrary/middleware.py) starts a RequestTimer for
+each request; the code being measured adds to whichever timer is current.
+When no request is being timed, timed() costs one ContextVar lookup, so the
+instrumentation can stay in place with the middleware switched off.
+
+The current timer is held in a ContextVar: it follows the request through
+async code, and work handed to a thread pool is counted when submitted with
+contextvars.copy_context().run (as fan_out_search does).  Time spent in
+parallel calls is summed, so a span can exceed the request's total, and
+spans overlap: a query run while a template renders counts towards both
+"db" and "tpl".
+
+Public interface
+----------------
+RequestTimer
+    spans ({name: [milliseconds, calls]}), queries, elapsed_ms();
+    execute(...) is a connection.execute_wrapper() that adds to the "db"
+    span and counts queries.
+start() / stop(token)
+    Make a new RequestTimer current and return (timer, token); stop(token)
+    restores the previous one.
+request_timer()
+    Context manager yielding the current timer, or a new one that also
+    counts queries on every database connection for the duration of the
+    block.  Lets several middleware share one timer.
+current()
+    The current RequestTimer, or None.
+timed(name)
+    Context manager / decorator adding the time spent to the current
+    timer's span name.
+instrument_templates()
+    Time every Django template render under the "tpl" span.  Patches the
+    template backend once; called by the middleware only when it is on.
+"""
+import contextvars
+import functools
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+_current = contextvars.ContextVar("booklibrary_request_timer", default=None)
+_patch_lock = threading.Lock()
+
+
+class RequestTimer:
+    """Time spent per span, and query count, for one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.queries = 0
+        self.rendering = False
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            span = self.spans.setdefault(name, [0.0, 0])
+            span[0] += seconds * 1000
+            span[1] += 1
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add("db", time.perf_counter() - start)
+            self.queries += 1
+
+
+def start():
+    """Make a fresh RequestTimer current; return (timer, token)."""
+    timer = RequestTimer()
+    return timer, _current.set(timer)
+
+
+def stop(token):
+    """Restore the timer that was current before start()."""
+    _current.reset(token)
+
+
+def current():
+    """Return the current RequestTimer, or None."""
+    return _current.get()
+
+
+@contextmanager
+def request_timer():
+    """Yield the current timer, or a new one counting queries until the block ends."""
+    timer = _current.get()
+    if timer is not None:
+        yield timer
+        return
+    timer, token = start()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(_wrapping(connection, timer.execute))
+            yield timer
+    finally:
+        stop(token)
+
+
+@contextmanager
+def _wrapping(connection, wrapper):
+    # Unlike connection.execute_wrapper(), which pops the last wrapper, remove
+    # this one: slow_queries attaches its own when a connection opens.
+    connection.execute_wrappers.append(wrapper)
+    try:
+        yield
+    finally:
+        connection.execute_wrappers.remove(wrapper)
+
+
+class timed:
+    """Add the time spent in a block or function to the current timer's span."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self._timer = _current.get()
+        if self._timer is not None:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._timer is not None:
+            self._timer.add(self.name, time.perf_counter() - self._start)
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timer = _current.get()
+            if timer is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timer.add(self.name, time.perf_counter() - start)
+        return wrapper
+
+
+def instrument_templates():
+    """Count Django template rendering under the "tpl" span (idempotent)."""
+    from django.template.backends.django import Template
+
+    with _patch_lock:
+        render = Template.render
+        if getattr(render, "_booklibrary_timed", False):
+            return
+
+        @functools.wraps(render)
+        def timed_render(self, *args, **kwargs):
+            timer = _current.get()
+            # Widgets and included forms render templates of their own
+            # inside the page's: only the outermost render is counted.
+            if timer is None or timer.rendering:
+                return render(self, *args, **kwargs)
+            timer.rendering = True
+            start = time.perf_counter()
+            try:
+                return render(self, *args, **kwargs)
+            finally:
+                timer.rendering = False
+                timer.add("tpl", time.perf_counter() - start)
+
+        timed_render._booklibrary_timed = True
+        Template.render = timed_render
@@ -0,0 +1,225 @@
+"""
+Per-process prefix index behind the typeahead search boxes.
+
+Book titles, author names (last and full), series and genres are held in
+memory as one sorted list of (key, kind, pk, text) entries, where key is the
+normalised text (transliterated to ASCII, lower-cased, whitespace
+collapsed).  A prefix lookup is a bisect to the first key not below the
+prefix followed by a scan while keys still start with it, so answering a
+keystroke costs no query and microseconds however large the catalogue is.
+Titles are also keyed without a leading article, so "hob" finds "The
+Hobbit".
+
+The index is loaded on first use (one query per kind) and kept current
+incrementally: signals.py and the batch add path in services.py hand
+changed rows to update_later()/remove_later(), which re-key just those rows
+once the transaction commits.  Other processes' changes reach this one when
+the index is reloaded, TYPEAHEAD_TIMEOUT seconds after it was built.  As in
+lookup_cache, an index loaded inside a transaction that changed one of
+these rows is used for that lookup only, never shared.
+
+Public interface
+----------------
+KINDS
+    The kinds of suggestion, in the order they are listed for equal keys.
+suggest(prefix, kinds=None, limit=TYPEAHEAD_LIMIT)
+    Return [{"kind", "id", "text"}] whose key starts with the normalised
+    prefix, shortest keys first; kinds narrows the result to some KINDS.
+update_later(objects)
+    Re-key Books, Authors, Series or Genres once the current transaction
+    commits.  Other objects are ignored.
+remove_later(objects)
+    Drop them from the index once the current transaction commits.
+reload_later()
+    Drop the whole index once the current transaction commits, to be
+    reloaded on next use; for bulk loads too large to re-key row by row.
+clear()
+    Forget the index.  For tests.
+
+Configuration
+-------------
+TYPEAHEAD_LIMIT    (optional) – most suggestions returned (10).
+TYPEAHEAD_TIMEOUT  (optional) – seconds before the index is rebuilt (900).
+"""
+import bisect
+import threading
+import time
+
+import unidecode
+from django.conf import settings
+from django.db import connection, transaction
+
+from booklibrary.models import Author, Book, Genre, Series
+
+TYPEAHEAD_LIMIT = getattr(settings, "TYPEAHEAD_LIMIT", 10)
+CACHE_TIMEOUT = getattr(settings, "TYPEAHEAD_TIMEOUT", 900)
+
+KINDS = ("book", "author", "series", "genre")
+_MODEL_KINDS = {Book: "book", Author: "author", Series: "series", Genre: "genre"}
+
+_ARTICLES = ("the ", "a ", "an ")
+
+# Scan at most this many entries per lookup, so a one-letter prefix stays cheap.
+_SCAN = 500
+
+# {"expires": monotonic time, "entries": sorted [(key, kind, pk, text)],
+#  "keys": {(kind, pk): [key]}}, or None before the first lookup.
+_index = None
+# Serialises rebuilds and incremental changes; lookups do not take it.
+_lock = threading.Lock()
+# Per-thread flag: the open transaction changed indexed rows.
+_local = threading.local()
+
+
+def _normalise(text):
+    return " ".join(unidecode.unidecode(text or "").lower().split())
+
+
+def _keys(kind, text, *other_names):
+    """Return the distinct keys an object of kind is found under."""
+    keys = [_normalise(text)]
+    if kind == "book":
+        for article in _ARTICLES:
+            if keys[0].startswith(article):
+                keys.append(keys[0][len(article):])
+    keys.extend(_normalise(name) for name in other_names)
+    return [key for key in dict.fromkeys(keys) if key]
+
+
+def _rows(kind, objects):
+    """Yield (kind, pk, text, keys) for model instances of kind."""
+    for obj in objects:
+        if kind == "author":
+            yield kind, obj.pk, str(obj), _keys(kind, obj.last_name, obj.full_name, str(obj))
+        else:
+            text = obj.title if kind == "book" else obj.name
+            yield kind, obj.pk, text, _keys(kind, text)
+
+
+def _load():
+    sources = {
+        "book": Book.objects.only("pk", "title"),
+        "author": Author.objects.only("pk", "first_name", "last_name", "full_name"),
+        "series": Series.objects.all(),
+        "genre": Genre.objects.all(),
+    }
+    entries, keys = [], {}
+    for kind, queryset in sources.items():
+        for kind, pk, text, object_keys in _rows(kind, queryset.iterator(chunk_size=5000)):
+            entries.extend((key, kind, pk, text) for key in object_keys)
+            keys[(kind, pk)] = object_keys
+    entries.sort()
+    return {"expires": time.monotonic() + CACHE_TIMEOUT, "entries": entries, "keys": keys}
+
+
+def _current():
+    """Return the index, rebuilding it when missing or expired."""
+    global _index
+    index = _index
+    if index is not None and index["expires"] > time.monotonic():
+        return index
+    if connection.in_atomic_block and getattr(_local, "dirty", False):
+        return _load()
+    _local.dirty = False
+    with _lock:
+        if _index is None or _index["expires"] <= time.monotonic():
+            _index = _load()
+        return _index
+
+
+def suggest(prefix, kinds=None, limit=None):
+    """Return up to limit suggestions whose key starts with prefix."""
+    prefix = _normalise(prefix)
+    if not prefix:
+        return []
+    limit = limit or TYPEAHEAD_LIMIT
+    entries = _current()["entries"]
+    found, seen = [], set()
+    start = bisect.bisect_left(entries, (prefix,))
+    for key, kind, pk, text in entries[start:start + _SCAN]:
+        if not key.startswith(prefix):
+            break
+        if (kinds and kind not in kinds) or (kind, pk) in seen:
+            continue
+        seen.add((kind, pk))
+        found.append((len(key), KINDS.index(kind), key, kind, pk, text))
+    found.sort()
+    return [{"kind": kind, "id": pk, "text": text} for *_, kind, pk, text in found[:limit]]
+
+
+# ── Incremental updates ───────────────────────────────────────────────────────
+
+def _remove(index, kind, pk):
+    # Entries are replaced by a single list insert or delete each, which
+    # lookups running without the lock can never observe half-done.
+    entries = index["entries"]
+    for key in index["keys"].pop((kind, pk), ()):
+        i = bisect.bisect_left(entries, (key, kind, pk))
+        if i < len(entries) and entries[i][:3] == (key, kind, pk):
+            del entries[i]
+
+
+def _update(objects):
+    with _lock:
+        index = _index
+        if index is None:
+            return
+        for model, kind in _MODEL_KINDS.items():
+            matching = [obj for obj in objects if isinstance(obj, model)]
+            for obj in matching:
+                _remove(index, kind, obj.pk)
+            for kind, pk, text, object_keys in _rows(kind, matching):
+                for key in object_keys:
+                    bisect.insort(index["entries"], (key, kind, pk, text))
+                index["keys"][(kind, pk)] = object_keys
+
+
+def _discard(kind_pks):
+    with _lock:
+        if _index is not None:
+            for kind, pk in kind_pks:
+                _remove(_index, kind, pk)
+
+
+def _on_commit(func):
+    if connection.in_atomic_block:
+        _local.dirty = True
+
+    def committed():
+        _local.dirty = False
+        func()
+
+    transaction.on_commit(committed)
+
+
+def update_later(objects):
+    """Re-key objects in the index once the current transaction commits."""
+    objects = [obj for obj in objects if type(obj) in _MODEL_KINDS and obj.pk is not None]
+    if objects:
+        _on_commit(lambda: _update(objects))
+
+
+def remove_later(objects):
+    """Drop objects from the index once the current transaction commits."""
+    # Primary keys are read now: delete() clears them before commit.
+    kind_pks = [(_MODEL_KINDS[type(obj)], obj.pk) for obj in objects if type(obj) in _MODEL_KINDS]
+    if kind_pks:
+        _on_commit(lambda: _discard(kind_pks))
+
+
+def reload_later():
+    """Forget the whole index once the current transaction commits."""
+    _on_commit(_forget)
+
+
+def _forget():
+    global _index
+    with _lock:
+        _index = None
+
+
+def clear():
+    """Forget the index and any pending change."""
+    global _index
+    _index = None
+    _local.dirty = False
@@ -4,9 +4,13 @@ Views for the booklibrary app.
 Browse / search
 ---------------
 index               Home page with aggregate counts and a per-session visit counter.
-BookListView        Paginated book catalogue with multi-field search and duplicate detection.
+BookListView        Paginated book catalogue with structured search (field:value,
+                    "phrases", -negation), typo-tolerant fuzzy search, facet counts
+                    and filters, and duplicate detection.
 BookDetailView      Single-book detail page with a paginated list of physical copies.
+MyLibraryView       The current user's books with cached counts by status and location.
 BookSearchView      Google Books search form; stores results server-side and renders AddForm.
+                    Pages are cached and the next page is prefetched in the background.
 AuthorListView      Paginated author directory with last-name search.
 AuthorDetailView    Single-author detail page.
 GenreListView       Paginated genre directory with name search.
@@ -16,14 +20,30 @@ LocationDetailView  Location detail page listing all BookInstances held there.
 Add / edit / delete  (login or permission required)
 ----------------------------------------------------
 add_book                    Save a book chosen from Google Books results (login required).
+add_books                   Save several selected results with shared choices (login required).
 AuthorCreate/Update/Delete  Author CRUD.
 LocationCreate/Update/Delete Location CRUD.
 BookUpdate/Delete           Book CRUD; non-superusers restricted to books they own.
 BookInstanceUpdate/Delete   BookInstance CRUD; restricted to the instance owner.
+inventory                   Staff-only bulk move / status / owner changes for copies.
+scan_start / scan_session   Move copies to a location by scanning their ids (login required).
+bookinstance_lend/_return   Lend a copy / record its return; owner only.
+loans                       Open loans of the user's copies (all for staff); overdue and
+                            per-borrower filters.
+
+JSON
+----
+autocomplete        Prefix-matched, paginated options for the autocomplete widgets.
+metrics_endpoint    Request, query and Google Books metrics in Prometheus text format
+                    (staff, or a METRICS_TOKEN bearer token).
+suggest             Typeahead suggestions (titles, authors, series, genres) for the
+                    book and author search boxes, from an in-memory prefix index.
 
 Internal helpers
 ----------------
+search_metadata         Search the configured metadata providers (Google, or a parallel fan-out).
 SearchableListView      Reusable ListView base with single-field search and pagination.
+owned_by                EXISTS filter: books with a copy owned by a given user.
 BookOwnerQuerysetMixin  Limits book querysets to the current owner (or all for superusers).
 
 Security note
@@ -33,26 +53,47 @@ add_book reads all book data (title, authors, etc.) from the server-side session
 prevent client-side tampering.  The AddForm controls only user choices: genre,
 location, keywords, and series.
 """
-from django.db.models import Q
-from django.http import HttpResponse
-from django.shortcuts import render, redirect
-from django.urls import reverse_lazy
-from booklibrary.models import Book, Author, BookInstance, Genre, Keywords, Location, Series
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.db.models import Case, Count, Exists, OuterRef, Prefetch, Q, Value, When
+from django.db.models.functions import Lower
+from django.forms.utils import pretty_name
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse
+from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import reverse, reverse_lazy
+from django.utils.crypto import constant_time_compare
+from django.utils.http import url_has_allowed_host_and_scheme
+from booklibrary.models import Book, Author, BookInstance, Genre, Keywords, Loan, Location, Series
 from booklibrary.owner import OwnerUpdateView, OwnerDeleteView
 from django.views import generic
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.contrib import messages
-from .services import create_book_from_google_data
+from .services import (
+    LOAN_PERIOD_DAYS, LoanError, create_book_from_google_data, create_books_from_google_data,
+    lend_copy, return_copy, update_instances,
+)
 from django.views.generic import TemplateView
 from django.template.response import TemplateResponse
-from .forms import SearchForm, AddForm
+from .forms import (
+    SearchForm, AddForm, BookForm, BulkAddForm, InventoryChangeForm, InventoryFilterForm,
+    LoanForm, ScanForm, ScanStartForm,
+)
 from django.core.paginator import Paginator
 import logging
+import uuid
 from django.conf import settings
+from .utils import (
+    facets, fuzzy, lookup_cache, metrics, owner_counts, query_parser, scan_sessions, search_cache,
+    typeahead,
+)
+from .utils.providers import ProviderError, fan_out_search, get_providers
 from .utils.google_books import (
     search_books,
+    search_cached_volumes,
+    get_volume,
     GoogleBooksError,
     GoogleBooksQuotaError,
     GoogleBooksAuthError,
@@ -66,6 +107,24 @@ logger = logging.getLogger(__name__)
 
 PAGE_SIZE = getattr(settings, "PAGE_SIZE", 24)
 
+# Results per Google Books page.  Each page is also stored in the session.
+GOOGLE_PAGE_SIZE = 10
+
+
+def search_metadata(query, max_results=GOOGLE_PAGE_SIZE, start_index=0):
+    """
+    Search the configured metadata providers; return (list of dicts, total).
+
+    With the default BOOK_METADATA_PROVIDERS (Google only) this is a plain
+    search_books() call.  With several providers they are queried in
+    parallel by fan_out_search() and the merged results are returned.
+    """
+    providers = get_providers()
+    if [p.name for p in providers] == ["google"]:
+        return search_books(query, max_results=max_results, start_index=start_index)
+    return fan_out_search(providers, query, max_results=max_results, start_index=start_index)
+
+
 def index(request):
     """Home page: aggregate book/instance/author counts and a per-session visit counter."""
     num_books = Book.objects.count()
@@ -88,50 +147,116 @@ class BookListView(generic.ListView):
     Paginated catalogue of all books.
 
     Accepts optional GET parameters:
-      search  – text to search for.
-      fields  – field to search: title (default, also searches summary), author,
-                genre, series, or keyword.
+      search  – text to search for, in the syntax of utils/query_parser.py:
+                field:value terms, "phrases" and -negation, compiled into a
+                single query.
+      fields  – field searched by terms without a field: title (default,
+                also searches summary), author, genre, series, or keyword.
+      fuzzy   – if present, search titles and author names tolerating typos
+                (utils/fuzzy.py) and list the best matches first.
       dups    – if present, shows only books that have more than one copy.
+      genre, language, series, location, status, decade
+              – facet filters (utils/facets.py); the page shows facet counts
+                for the current results, each linking to its filter.
     """
 
     model = Book
     template_name = "booklibrary/book_list.html"
     paginate_by = PAGE_SIZE
 
-    _FIELD_QUERIES = {
-        "title": lambda s: Q(title__icontains=s) | Q(summary__icontains=s),
-        "author": lambda s: (
-            Q(authors__last_name__icontains=s)
-            | Q(authors__first_name__icontains=s)
-            | Q(authors__full_name__icontains=s)
-        ),
-        "genre": lambda s: Q(genre__name__icontains=s),
-        "series": lambda s: Q(series__name__icontains=s),
-        "keyword": lambda s: Q(keywords__name__icontains=s),
-    }
-
     def get_queryset(self):
+        self.selected_facets = {}
         if self.request.GET.get("dups"):
-            return Book.objects.with_counts().filter(num_copies__gt=1).order_by("title")
-
-        qs = Book.objects.select_related().order_by("title")
-        search = self.request.GET.get("search", "").strip()
-        if not search:
+            return (Book.objects.with_counts().filter(num_copies__gt=1)
+                    .prefetch_related("authors").order_by("title"))
+
+        qs = Book.objects.select_related().prefetch_related("authors").order_by("title")
+        text = self.request.GET.get("search", "")
+        if self.request.GET.get("fuzzy") and text.strip():
+            ranked = [pk for pk, _ in fuzzy.search_books(text)]
+            qs = qs.filter(pk__in=ranked).order_by(
+                Case(*[When(pk=pk, then=Value(rank)) for rank, pk in enumerate(ranked)],
+                     default=Value(len(ranked))), "title")
+            qs, self.selected_facets = facets.apply(qs, self.request.GET)
             return qs
+        search = query_parser.compile_query(text, self.request.GET.get("fields") or "title")
+        if search is not None:
+            qs = qs.filter(search)
+        qs, self.selected_facets = facets.apply(qs, self.request.GET)
+        return qs
 
-        field = self.request.GET.get("fields") or "title"
-        build_query = self._FIELD_QUERIES.get(field)
-        if build_query is None:
-            return qs
-        return qs.filter(build_query(search)).distinct()
+    def _facet_links(self, counts):
+        """Pair each facet bucket with a link that selects (or clears) it."""
+        links = []
+        for name, buckets in counts.items():
+            items = []
+            for value, label, count in buckets:
+                params = self.request.GET.copy()
+                params.pop("page", None)
+                active = self.selected_facets.get(name) == str(value)
+                if active:
+                    params.pop(name, None)
+                else:
+                    params[name] = value
+                items.append({"label": label, "count": count, "active": active,
+                              "url": f"?{params.urlencode()}"})
+            if items:
+                links.append((name, items))
+        return links
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         ctx["search"] = self.request.GET.get("search", "").strip() or None
         ctx["fields"] = self.request.GET.get("fields", "")
         ctx["dups"] = self.request.GET.get("dups", "")
+        ctx["fuzzy"] = bool(self.request.GET.get("fuzzy"))
+        ctx["selected_facets"] = self.selected_facets
+        if not ctx["dups"]:
+            ctx["facets"] = self._facet_links(facets.compute(self.object_list))
+        return ctx
+
+def owned_by(user):
+    """
+    Filter expression: the Book has a copy owned by user.
+
+    An EXISTS subquery on BookInstance(owner, book) rather than a join, so
+    books with several copies need no DISTINCT.
+    """
+    return Exists(BookInstance.objects.filter(owner=user, book=OuterRef('pk')))
+
+
+class MyLibraryView(LoginRequiredMixin, generic.ListView):
+    """
+    The current user's books, with counts of their copies.
+
+    Accepts an optional ``search`` GET parameter matched against the title.
+    The counts (copies and books, by status and by location) come from
+    utils/owner_counts.py, cached until one of the user's copies changes.
+    """
+
+    model = Book
+    template_name = "booklibrary/my_library.html"
+    paginate_by = PAGE_SIZE
+
+    def get_queryset(self):
+        qs = Book.objects.filter(owned_by(self.request.user)).order_by("title")
+        search = self.request.GET.get("search", "").strip()
+        if search:
+            qs = qs.filter(title__icontains=search)
+        return qs
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        counts = owner_counts.get(self.request.user.pk)
+        ctx["counts"] = counts
+        ctx["by_location"] = [
+            (lookup_cache.get(Location, location_id) if location_id else None, n)
+            for location_id, n in counts["by_location"]
+        ]
+        ctx["search"] = self.request.GET.get("search", "").strip() or None
         return ctx
 
+
 class SearchableListView(generic.ListView):
     """
     Base ListView with optional single-field case-insensitive search and pagination.
@@ -174,7 +299,7 @@ class BookDetailView(generic.DetailView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        instances = self.object.bookinstance_set.order_by('location')
+        instances = self.object.bookinstance_set.select_related('owner', 'location').order_by('location')
         ctx['page_obj'] = Paginator(instances, PAGE_SIZE).get_page(self.request.GET.get("page"))
         return ctx
 
@@ -187,8 +312,13 @@ class BookSearchView(TemplateView):
     POST – submits the query to the Google Books API.  On success, results are
            stored in ``request.session['google_books_results']`` and the results
            template is rendered with an AddForm pre-populated from the user's
-           last-used genre.  On failure, an appropriate error message is shown
-           and the search form is re-rendered.
+           last-used genre.  The optional ``page`` field selects a page of
+           GOOGLE_PAGE_SIZE results; pages are cached, and serving page N
+           prefetches page N+1 in the background so "Next" is usually a cache
+           hit.  If Google is unavailable, volumes stored locally
+           by earlier searches are searched instead.  On failure, an
+           appropriate error message is shown and the search form is
+           re-rendered.
     """
 
     template_name = 'booklibrary/book_search.html'
@@ -205,44 +335,71 @@ class BookSearchView(TemplateView):
         if not form.is_valid():
             return self.render_to_response(self.get_context_data(form=form))
 
-        books, total = self._fetch_books(request, form.cleaned_data['search'])
+        query = form.cleaned_data['search']
+        page = form.cleaned_data.get('page') or 1
+        books, total = self._fetch_books(request, query, page)
         if not books:
             messages.info(request, 'Google did not return anything, try again')
             return self.render_to_response(self.get_context_data(form=form))
 
+        has_next = page * GOOGLE_PAGE_SIZE < total
+        if has_next:
+            search_cache.prefetch(search_metadata, query, GOOGLE_PAGE_SIZE, page * GOOGLE_PAGE_SIZE)
+
         request.session['google_books_results'] = books
+        add_form = self._build_add_form(request)
         return TemplateResponse(request, 'booklibrary/book_results.html', {
-            'form': self._build_add_form(request),
+            'form': add_form,
+            'bulk_form': BulkAddForm(
+                prefix='bulk', initial=add_form.initial, num_results=len(books)),
             'books': books,
             'total': total,
+            'query': query,
+            'page': page,
+            'has_next': has_next,
+            'first_index': (page - 1) * GOOGLE_PAGE_SIZE + 1,
+            'last_index': (page - 1) * GOOGLE_PAGE_SIZE + len(books),
         })
 
-    def _fetch_books(self, request, query):
-        """Call Google Books API, message any errors, and return (books, total).
+    def _fetch_books(self, request, query, page=1):
+        """Call the metadata providers, message any errors, and return (books, total).
+
+        If Google fails for any reason other than a bad query, the local
+        GoogleVolume table is searched instead and a warning is shown.
+
+        Successful Google pages are read from and written to search_cache.
 
         Results are stored in the session (see post()).  Each result is a
         ~12-key dict from _parse_volume; descriptions can be several hundred
-        bytes each.  Keep max_results modest to avoid inflating session size.
+        bytes each.  Keep GOOGLE_PAGE_SIZE modest to avoid inflating session size.
         """
+        start_index = (page - 1) * GOOGLE_PAGE_SIZE
         try:
-            books, total = search_books(query, max_results=10)
-        except GoogleBooksQuotaError:
-            messages.error(request,
-                "Google Books is receiving too many requests right now. "
-                "Please wait a bit and try again.")
-            return [], 0
-        except GoogleBooksAuthError:
-            messages.error(request,
-                "Search is temporarily unavailable due to a configuration problem.")
-            return [], 0
+            cached = search_cache.get_results(query, GOOGLE_PAGE_SIZE, start_index)
+            if cached is not None:
+                books, total = cached
+            else:
+                books, total = search_metadata(
+                    query, max_results=GOOGLE_PAGE_SIZE, start_index=start_index)
+                search_cache.set_results(
+                    query, GOOGLE_PAGE_SIZE, start_index, (books, total))
         except GoogleBooksBadRequest:
             messages.error(request,
                 "That search could not be sent to Google. Try a simpler query.")
             return [], 0
-        except GoogleBooksError:
-            messages.error(request,
-                "There was an unexpected error talking to Google Books. Please try again.")
-            return [], 0
+        except (GoogleBooksError, ProviderError) as exc:
+            if isinstance(exc, GoogleBooksQuotaError):
+                search_cache.note_quota_error()
+            # Google is unreachable or refusing us; volumes seen in earlier
+            # searches are still stored locally and may answer the query.
+            books, total = search_cached_volumes(
+                query, max_results=GOOGLE_PAGE_SIZE, start_index=start_index)
+            if not books:
+                messages.error(request, self._unavailable_message(exc))
+                return [], 0
+            messages.warning(request,
+                "Google Books is unavailable right now, so these results come "
+                "from books seen in earlier searches.")
         owned_ids = set(
             Book.objects.filter(
                 uniqueID__in=[b["volume_id"] for b in books]
@@ -252,13 +409,26 @@ class BookSearchView(TemplateView):
             book["is_owned"] = book["volume_id"] in owned_ids
         return books, total
 
+    @staticmethod
+    def _unavailable_message(exc):
+        """Return the user-facing message for a Google Books failure."""
+        if isinstance(exc, GoogleBooksQuotaError):
+            return ("Google Books is receiving too many requests right now. "
+                    "Please wait a bit and try again.")
+        if isinstance(exc, GoogleBooksAuthError):
+            return "Search is temporarily unavailable due to a configuration problem."
+        return "There was an unexpected error talking to Google Books. Please try again."
+
     def _build_add_form(self, request):
-        """Return an AddForm pre-populated with the user's last-used genre and location."""
+        """Return an AddForm pre-populated with the user's last-used genre and location.
+
+        Both are read from lookup_cache, as are the form's choices.
+        """
         saved_genre = request.session.get('repeat_genre')
-        genre_obj = Genre.objects.filter(name=saved_genre).first() if saved_genre else None
+        genre_obj = lookup_cache.get_by_name(Genre, saved_genre) if saved_genre else None
 
         saved_location_pk = request.session.get('repeat_location')
-        location_obj = Location.objects.filter(pk=saved_location_pk).first() if saved_location_pk else None
+        location_obj = lookup_cache.get(Location, saved_location_pk) if saved_location_pk else None
 
         return AddForm(initial={
             'book_genre': [genre_obj.pk] if genre_obj else [],
@@ -284,10 +454,21 @@ class AuthorListView(SearchableListView):
 
 
 class AuthorDetailView(generic.DetailView):
-    """Single-author detail page."""
+    """Single-author detail page. Adds the author's books, with their copies, to context."""
 
     model = Author
 
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        books = self.object.books.all()
+        if self.request.session.get("location"):
+            books = books.prefetch_related(Prefetch(
+                'bookinstance_set', queryset=BookInstance.objects.select_related('location')))
+        else:
+            books = books.annotate(copies=Count('bookinstance'))
+        ctx['books'] = books
+        return ctx
+
 
 class LocationListView(SearchableListView):
     """Paginated, searchable list of locations."""
@@ -304,7 +485,8 @@ class LocationDetailView(generic.DetailView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        instances = BookInstance.objects.filter(location=self.object).order_by('book')
+        instances = (BookInstance.objects.filter(location=self.object)
+                     .select_related('book').prefetch_related('book__authors').order_by('book'))
         ctx['page_obj'] = Paginator(instances, PAGE_SIZE).get_page(self.request.GET.get("page"))
         return ctx
 
@@ -339,6 +521,17 @@ def add_book(request):
         book_index = int(request.POST.get('book_index', ''))
         book_data = request.session['google_books_results'][book_index]
     except (ValueError, TypeError, KeyError, IndexError):
+        book_data = None
+
+    if book_data is None and cd.get('uniqueID'):
+        # The session may have expired since the search; the volume itself is
+        # normally still in the local GoogleVolume table.
+        try:
+            book_data = get_volume(cd['uniqueID'])
+        except GoogleBooksError:
+            book_data = None
+
+    if book_data is None:
         messages.error(request, "Invalid book selection. Please search again.")
         return redirect('booklibrary:book-search')
 
@@ -357,6 +550,13 @@ def add_book(request):
     if not created:
         messages.info(request, 'Duplicate book')
 
+    _remember_shelving_choices(request, cd)
+
+    return redirect('booklibrary:book-detail', pk=book.pk)
+
+
+def _remember_shelving_choices(request, cd):
+    """Store the chosen genre and location in the session for the next search."""
     if cd['book_genre']:
         first_genre = cd['book_genre'].first()
         if first_genre:
@@ -365,7 +565,305 @@ def add_book(request):
     if cd['book_location']:
         request.session['repeat_location'] = cd['book_location'].pk
 
-    return redirect('booklibrary:book-detail', pk=book.pk)
+
+@login_required
+def add_books(request):
+    """
+    Save several books selected from Google Books search results (login required).
+
+    Expects a POST of BulkAddForm (prefix ``bulk``): ``bulk-book_indices``
+    (one or more indices into ``request.session['google_books_results']``)
+    plus the genre, location, keyword and series choices shared by all of
+    them.  As with add_book, book data is read from the session only.
+
+    Everything is saved in one transaction by create_books_from_google_data(),
+    then the user is redirected to the book list.
+    """
+    if request.method != 'POST':
+        return redirect('booklibrary:book-search')
+
+    results = request.session.get('google_books_results') or []
+    form = BulkAddForm(request.POST, prefix='bulk', num_results=len(results))
+    if not form.is_valid():
+        logger.warning("add_books: form invalid: %s", form.errors)
+        for name, errors in form.errors.items():
+            if name == 'book_indices':
+                if not results:
+                    errors = ["Invalid book selection. Please search again."]
+            elif name != NON_FIELD_ERRORS:
+                label = form.fields[name].label or pretty_name(name)
+                errors = [f"{label}: {error}" for error in errors]
+            for error in errors:
+                messages.error(request, error)
+        return redirect('booklibrary:book-search')
+
+    cd = form.cleaned_data
+    selected = [results[i] for i in cd['book_indices']]
+    saved = create_books_from_google_data(selected, cd, request.user)
+
+    duplicates = sum(1 for _, created in saved if not created)
+    messages.success(request, f"Added {len(saved)} book{'s' if len(saved) != 1 else ''}.")
+    if duplicates:
+        messages.info(request, f"{duplicates} of them were already in the library.")
+
+    _remember_shelving_choices(request, cd)
+    return redirect('booklibrary:books')
+
+
+INVENTORY_PAGE_SIZE = 50
+
+
+@staff_member_required
+def inventory(request):
+    """
+    Staff page for moving, re-statusing and reassigning copies in bulk.
+
+    GET lists the BookInstances matching InventoryFilterForm (``q``,
+    ``location``, ``status``, ``owner``), INVENTORY_PAGE_SIZE per page.
+    POST (to the same URL, filters in the query string) applies
+    InventoryChangeForm to the ticked ``instances`` on the page, or to every
+    match when ``apply_to=all``, with one UPDATE via update_instances().
+    """
+    filter_form = InventoryFilterForm(request.GET or None)
+    matching = filter_form.filter(
+        BookInstance.objects.select_related('book', 'location', 'owner').order_by('book__title'))
+
+    if request.method == 'POST':
+        change_form = InventoryChangeForm(request.POST)
+        changes = change_form.changes() if change_form.is_valid() else {}
+        apply_to_all = request.POST.get('apply_to') == 'all'
+        try:
+            ticked = [uuid.UUID(pk) for pk in request.POST.getlist('instances')]
+        except ValueError:
+            ticked = None
+        if filter_form.is_bound and not filter_form.is_valid():
+            # filter() ignores invalid filters, which would widen "all matches"
+            # to every copy in the library.
+            messages.error(request, "Fix the filters before changing copies.")
+        elif ticked is None and not apply_to_all:
+            messages.error(request, "Invalid copy selection.")
+        elif not changes:
+            messages.error(request, "Choose a new location, status or owner.")
+        elif not apply_to_all and not ticked:
+            messages.error(request, "Tick the copies to change, or apply to all matches.")
+        else:
+            targets = matching if apply_to_all else matching.filter(pk__in=ticked)
+            count = update_instances(targets, **changes)
+            messages.success(request, f"Updated {count} cop{'y' if count == 1 else 'ies'}.")
+        return redirect(f"{request.path}?{request.GET.urlencode()}")
+
+    return render(request, 'booklibrary/inventory.html', {
+        'filter_form': filter_form,
+        'change_form': InventoryChangeForm(),
+        'page_obj': Paginator(matching, INVENTORY_PAGE_SIZE).get_page(request.GET.get('page')),
+    })
+
+
+@login_required
+def scan_start(request):
+    """Choose the target location and open a scan session."""
+    form = ScanStartForm(request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        session = scan_sessions.start(request.user, form.cleaned_data['location'])
+        return redirect('booklibrary:scan-session', session_id=session['id'])
+    return render(request, 'booklibrary/scan_start.html', {'form': form})
+
+
+@login_required
+def scan_session(request, session_id):
+    """
+    Scan copies into the session's location.
+
+    Each POST of ``codes`` buffers the scanned ids; they are moved in batches
+    by utils/scan_sessions.py.  POST ``finish`` moves whatever is pending,
+    reports the totals and ids that matched no copy of the user's, and ends
+    the session.  Non-staff users can only move copies they own.
+    """
+    try:
+        if request.method == 'POST' and 'finish' in request.POST:
+            session = scan_sessions.close(session_id, request.user)
+            location = lookup_cache.get(Location, session['location_id'])
+            moved = session['moved']
+            messages.success(request, f"Moved {moved} cop{'y' if moved == 1 else 'ies'} to {location}.")
+            if session['unknown']:
+                messages.warning(request, "Not found: " + ", ".join(session['unknown']))
+            return redirect('booklibrary:scan')
+
+        form = ScanForm(request.POST or None)
+        if request.method == 'POST':
+            if form.is_valid():
+                scan_sessions.add(session_id, request.user, form.cleaned_data['codes'])
+            return redirect('booklibrary:scan-session', session_id=session_id)
+        session = scan_sessions.get(session_id, request.user)
+    except scan_sessions.ScanSessionNotFound:
+        raise Http404("Scan session not found or expired")
+    except scan_sessions.ScanSessionBusy:
+        messages.error(request, "The scan session is busy. Please try again.")
+        return redirect('booklibrary:scan-session', session_id=session_id)
+
+    return render(request, 'booklibrary/scan_session.html', {
+        'form': form,
+        'session': session,
+        'location': lookup_cache.get(Location, session['location_id']),
+    })
+
+
+@login_required
+def bookinstance_lend(request, pk):
+    """Lend one of the user's available copies (LoanForm)."""
+    instance = get_object_or_404(
+        BookInstance.objects.select_related('book'), pk=pk, owner=request.user)
+    form = LoanForm(request.POST or None, loan_period_days=LOAN_PERIOD_DAYS)
+    if request.method == 'POST' and form.is_valid():
+        cd = form.cleaned_data
+        try:
+            lend_copy(instance, cd['borrower'], cd['due_back'], cd['borrower_email'])
+        except LoanError as e:
+            form.add_error(None, str(e))
+        else:
+            messages.success(
+                request, f"Lent {instance.book} to {cd['borrower']} until {cd['due_back']:%d %b %Y}.")
+            return redirect('booklibrary:loans')
+    return render(request, 'booklibrary/loan_form.html', {'form': form, 'instance': instance})
+
+
+@login_required
+def bookinstance_return(request, pk):
+    """Record the return of one of the user's copies (POST only), then go to ``next``."""
+    instance = get_object_or_404(BookInstance, pk=pk, owner=request.user)
+    if request.method != 'POST':
+        return redirect('booklibrary:loans')
+    try:
+        return_copy(instance)
+    except LoanError as e:
+        messages.error(request, str(e))
+    else:
+        messages.success(request, "Copy returned.")
+    next_url = request.POST.get('next', '')
+    if url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        return redirect(next_url)
+    return redirect('booklibrary:loans')
+
+
+@login_required
+def loans(request):
+    """
+    Open loans, soonest due first: of the user's copies, or of all copies
+    for staff.
+
+    ``?overdue=1`` keeps only loans past their due date and ``?borrower=``
+    only one borrower's.  Both filter open loans only, which the
+    (returned_at, due_back) and (returned_at, borrower) indexes cover.
+    """
+    overdue = bool(request.GET.get('overdue'))
+    borrower = request.GET.get('borrower', '').strip()
+    qs = Loan.objects.overdue() if overdue else Loan.objects.open()
+    if not request.user.is_staff:
+        qs = qs.filter(instance__owner=request.user)
+    if borrower:
+        qs = qs.filter(borrower=borrower)
+    qs = qs.select_related('instance__book').order_by('due_back', 'pk')
+    return render(request, 'booklibrary/loan_list.html', {
+        'page_obj': Paginator(qs, PAGE_SIZE).get_page(request.GET.get('page')),
+        'overdue': overdue,
+        'borrower': borrower,
+    })
+
+
+AUTOCOMPLETE_PAGE_SIZE = 20
+
+# kind -> (model, lower-cased fields matched by prefix, ordering)
+AUTOCOMPLETE_SOURCES = {
+    'author': (Author, ['last_name', 'full_name'], ['last_name', 'first_name']),
+    'genre': (Genre, ['name'], ['name']),
+    'keywords': (Keywords, ['name'], ['name']),
+    'location': (Location, ['name'], ['name']),
+    'series': (Series, ['name'], ['name']),
+}
+
+
+@login_required
+def autocomplete(request, kind):
+    """
+    JSON options for the autocomplete widgets in forms.py.
+
+    Returns rows whose name (for authors: last or full name) starts with
+    ``?q=``, ignoring case, AUTOCOMPLETE_PAGE_SIZE per ``?page=``, in the
+    Select2 shape ``{"results": [{"id", "text"}], "pagination": {"more"}}``.
+    The prefix match is on Lower(field), which the lookup tables' unique
+    constraints and Author's indexes cover; one extra row is fetched instead
+    of counting to decide whether there is another page.
+    """
+    try:
+        model, fields, ordering = AUTOCOMPLETE_SOURCES[kind]
+    except KeyError:
+        raise Http404(f"No autocomplete for {kind!r}")
+
+    term = request.GET.get('q', '').strip().lower()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+
+    qs = model.objects.order_by(*ordering)
+    if term:
+        qs = qs.alias(**{f'lower_{f}': Lower(f) for f in fields})
+        match = Q()
+        for field in fields:
+            match |= Q(**{f'lower_{field}__startswith': term})
+        qs = qs.filter(match)
+
+    offset = (page - 1) * AUTOCOMPLETE_PAGE_SIZE
+    rows = list(qs[offset:offset + AUTOCOMPLETE_PAGE_SIZE + 1])
+    return JsonResponse({
+        'results': [{'id': obj.pk, 'text': str(obj)} for obj in rows[:AUTOCOMPLETE_PAGE_SIZE]],
+        'pagination': {'more': len(rows) > AUTOCOMPLETE_PAGE_SIZE},
+    })
+
+
+_SUGGESTION_URLS = {
+    'book': lambda pk: reverse('booklibrary:book-detail', args=[pk]),
+    'author': lambda pk: reverse('booklibrary:author-detail', args=[pk]),
+    'series': lambda pk: f"{reverse('booklibrary:books')}?series={pk}",
+    'genre': lambda pk: f"{reverse('booklibrary:books')}?genre={pk}",
+}
+
+
+def suggest(request):
+    """
+    JSON typeahead suggestions for the book and author search boxes.
+
+    Returns titles, author names, series and genres starting with ``?q=``
+    (see utils/typeahead.py) as ``{"results": [{"kind", "id", "text",
+    "url"}]}``; ``?kinds=book,author`` limits the kinds.  Answered from a
+    per-process prefix index, so it costs no query and can run on every
+    keystroke.
+    """
+    kinds = [k for k in request.GET.get('kinds', '').split(',') if k in typeahead.KINDS]
+    results = typeahead.suggest(request.GET.get('q', ''), kinds=kinds or None)
+    for row in results:
+        row['url'] = _SUGGESTION_URLS[row['kind']](row['id'])
+    return JsonResponse({'results': results})
+
+
+def metrics_endpoint(request):
+    """
+    Metrics from utils/metrics.py in the Prometheus text format.
+
+    Open to staff users, and to scrapers that send ``Authorization: Bearer
+    <METRICS_TOKEN>`` when that setting is configured.  Anonymous users are
+    sent to the login page; other users get 403.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    authorised = request.user.is_active and request.user.is_staff
+    if not authorised and token:
+        authorised = constant_time_compare(
+            request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not authorised:
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 class AuthorCreate(LoginRequiredMixin, CreateView):
@@ -426,14 +924,14 @@ class BookOwnerQuerysetMixin:
         qs = super().get_queryset()
         if self.request.user.is_superuser:
             return qs
-        return qs.filter(bookinstance__owner=self.request.user).distinct()
+        return qs.filter(owned_by(self.request.user))
 
 
 class BookUpdate(BookOwnerQuerysetMixin, PermissionRequiredMixin, UpdateView):
     """Update book metadata. Non-superusers may only edit books they own."""
 
     model = Book
-    fields = ['title', 'authors', 'summary', 'genre', 'language', 'publisher', 'publishedDate', 'keywords', 'series']
+    form_class = BookForm
     permission_required = 'booklibrary.change_book'
 
 
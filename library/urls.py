@@ -6,6 +6,7 @@ Routes:
   /admin/          Django admin
   /accounts/       Auth views (login, logout, password reset, …)
   /booklibrary/    Main app (namespace: booklibrary)
+  /metrics         Prometheus metrics (staff or METRICS_TOKEN; booklibrary.views.metrics_endpoint)
   /site/<path>     Static HTML site browser
   /favicon.ico     Favicon
   /__debug__/      Django Debug Toolbar (DEBUG only)
@@ -18,6 +19,8 @@ from django.urls import include, path
 from django.views.generic import RedirectView
 from django.views.static import serve
 
+from booklibrary.views import metrics_endpoint
+
 urlpatterns = [
     path('', RedirectView.as_view(pattern_name='booklibrary:index', permanent=False)),
 
@@ -29,6 +32,7 @@ urlpatterns = [
     path('accounts/', include('django.contrib.auth.urls')),
 
     path('booklibrary/', include(('booklibrary.urls', 'booklibrary'), namespace='booklibrary')),
+    path('metrics', metrics_endpoint, name='metrics'),
 
     # Static HTML site browser
     path('site/<path:path>', serve,